@@ -0,0 +1,223 @@
+import math
+import time
+import heapq
+import asyncio
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from .metrics import ADMISSION_QUEUED, ADMISSION_REJECTED
+
+
+class AdmissionRejected(Exception):
+    """系统饱和，拒绝接收任务（接口返回 429，retry_after 为建议的重试等待秒数）"""
+
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(f"Server is saturated ({reason}), retry after {math.ceil(retry_after)}s")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+@dataclass
+class _Ticket:
+    task_id: str
+    pages: int
+    size: int
+    started_at: Optional[float] = None
+    waiter: Optional[asyncio.Future] = None
+
+
+class AdmissionController:
+    """
+    任务准入控制
+
+    - 已接收（运行中 + 排队中）任务的总页数不超过 max_pages、上传文件总字节数不超过 max_bytes，
+      超出时拒绝；没有已接收的任务时总是接收，避免超大文档永远无法处理
+    - 同时运行的任务不超过 max_tasks，其余按接收顺序排队；排队任务数达到 max_queued 时拒绝
+      （max_queued=0 即不排队，饱和时直接拒绝）
+    - 按已完成任务的每页耗时（指数移动平均）估计排队任务的开始时间和被拒绝时的重试等待时间
+
+    Args:
+        max_tasks: 同时运行的任务数
+        max_pages: 已接收任务的总页数上限，None 为不限
+        max_bytes: 已接收任务的上传文件总字节数上限，None 为不限
+        max_queued: 排队任务数上限，None 为不限
+        seconds_per_page: 每页耗时的初始估计（秒）
+        smoothing: 每页耗时移动平均中新样本的权重
+    """
+
+    def __init__(self,
+                 max_tasks: int = 4,
+                 max_pages: Optional[int] = None,
+                 max_bytes: Optional[int] = None,
+                 max_queued: Optional[int] = None,
+                 seconds_per_page: float = 2.0,
+                 smoothing: float = 0.2):
+        self.max_tasks = max_tasks
+        self.max_pages = max_pages
+        self.max_bytes = max_bytes
+        self.max_queued = max_queued
+        self.seconds_per_page = seconds_per_page
+        self.smoothing = smoothing
+        # 按接收顺序排列；started_at 非空的为运行中
+        self._tickets: "OrderedDict[str, _Ticket]" = OrderedDict()
+
+    @property
+    def running(self) -> int:
+        return sum(1 for t in self._tickets.values() if t.started_at is not None)
+
+    @property
+    def queued(self) -> int:
+        """等待运行名额的任务数（不含空出名额后即将开始的任务）"""
+        return max(0, len(self._tickets) - self.max_tasks)
+
+    @property
+    def saturated(self) -> bool:
+        """运行名额已全部占用（含即将开始的任务），新任务需要排队"""
+        return len(self._tickets) >= self.max_tasks
+
+    def stats(self) -> Dict:
+        """已接收任务的数量、页数和字节数"""
+        return {
+            "running": self.running,
+            "queued": self.queued,
+            "pages": sum(t.pages for t in self._tickets.values()),
+            "bytes": sum(t.size for t in self._tickets.values())
+        }
+
+    def admit(self, task_id: str, pages: int, size: int = 0, force: bool = False) -> Optional[int]:
+        """
+        接收任务，超出限制时抛出 AdmissionRejected
+
+        Args:
+            task_id: 任务ID
+            pages: 页数
+            size: 上传文件字节数
+            force: 不检查限制（已接收的任务直接处理，例如命令行和 worker）
+
+        Returns:
+            排在前面的任务数，可以立即开始时返回 None
+        """
+        if task_id in self._tickets:
+            return self.position(task_id)
+
+        if self._tickets and not force:
+            stats = self.stats()
+            reason = None
+            if self.max_queued is not None and self.saturated and stats["queued"] >= self.max_queued:
+                reason = "queue_full"
+            elif self.max_pages is not None and stats["pages"] + pages > self.max_pages:
+                reason = "pages"
+            elif self.max_bytes is not None and stats["bytes"] + size > self.max_bytes:
+                reason = "bytes"
+            if reason:
+                ADMISSION_REJECTED.labels(reason).inc()
+                raise AdmissionRejected(reason, self.retry_after())
+
+        self._tickets[task_id] = _Ticket(task_id, max(pages, 1), size)
+        ADMISSION_QUEUED.set(self.queued)
+        return self.position(task_id)
+
+    def position(self, task_id: str) -> Optional[int]:
+        """排在前面等待的任务数；任务未接收、已开始或空出名额后可以立即开始时返回 None"""
+        ticket = self._tickets.get(task_id)
+        if ticket is None or ticket.started_at is not None:
+            return None
+        ahead = 0
+        for other in self._tickets.values():
+            if other is ticket:
+                break
+            if other.started_at is None:
+                ahead += 1
+        free = self.max_tasks - self.running
+        return ahead - free if ahead >= free else None
+
+    def estimated_wait(self, task_id: Optional[str] = None) -> float:
+        """
+        估计任务的等待时间（秒），task_id 为 None 时估计新接收任务的等待时间
+
+        运行中的任务按页数和已运行时间估计剩余时间，排队任务按顺序依次占用最早空出的名额
+        """
+        now = time.monotonic()
+        slots = []
+        waiting = []
+        for ticket in self._tickets.values():
+            if ticket.started_at is not None:
+                slots.append(max(0.0, ticket.pages * self.seconds_per_page - (now - ticket.started_at)))
+            else:
+                waiting.append(ticket)
+        slots.extend([0.0] * max(0, self.max_tasks - len(slots)))
+        heapq.heapify(slots)
+
+        for ticket in waiting:
+            start = heapq.heappop(slots)
+            if ticket.task_id == task_id:
+                return start
+            heapq.heappush(slots, start + ticket.pages * self.seconds_per_page)
+        return slots[0]
+
+    def estimated_start(self, task_id: str) -> Optional[datetime]:
+        """排队任务的预计开始时间，不在排队时返回 None"""
+        if self.position(task_id) is None:
+            return None
+        return datetime.now() + timedelta(seconds=round(self.estimated_wait(task_id), 1))
+
+    def retry_after(self) -> float:
+        """被拒绝时建议的重试等待时间：最早一个运行中任务的预计剩余时间，至少 1 秒"""
+        now = time.monotonic()
+        remaining = [
+            t.pages * self.seconds_per_page - (now - t.started_at)
+            for t in self._tickets.values() if t.started_at is not None
+        ]
+        return max(1.0, min(remaining, default=self.seconds_per_page))
+
+    async def acquire(self, task_id: str, pages: int = 1, size: int = 0):
+        """等待运行名额；任务未经 admit 接收时直接接收（不检查限制）"""
+        self.admit(task_id, pages, size, force=True)
+        ticket = self._tickets[task_id]
+        ticket.waiter = asyncio.get_running_loop().create_future()
+        self._dispatch()
+        try:
+            await ticket.waiter
+        except asyncio.CancelledError:
+            # 等待中被取消（或刚获得名额时被取消）都要交还，唤醒后面的任务
+            self._tickets.pop(task_id, None)
+            self._dispatch()
+            raise
+
+    def release(self, task_id: str):
+        """任务结束，交还名额并更新每页耗时估计"""
+        ticket = self._tickets.pop(task_id, None)
+        if ticket is not None and ticket.started_at is not None:
+            per_page = (time.monotonic() - ticket.started_at) / ticket.pages
+            self.seconds_per_page += self.smoothing * (per_page - self.seconds_per_page)
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, task_id: str, pages: int = 1, size: int = 0):
+        """
+        在运行名额内执行代码块
+
+        用法：
+            async with admission.slot(task_id, pages, size):
+                await ...
+        """
+        await self.acquire(task_id, pages, size)
+        try:
+            yield
+        finally:
+            self.release(task_id)
+
+    def _dispatch(self):
+        """按接收顺序给已在等待的任务分配空出的名额"""
+        free = self.max_tasks - self.running
+        for ticket in self._tickets.values():
+            if free <= 0:
+                break
+            if ticket.started_at is None and ticket.waiter is not None and not ticket.waiter.done():
+                ticket.started_at = time.monotonic()
+                ticket.waiter.set_result(None)
+                free -= 1
+        ADMISSION_QUEUED.set(self.queued)
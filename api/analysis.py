@@ -0,0 +1,167 @@
+import json
+import time
+import asyncio
+import hashlib
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from vertexai.generative_models import GenerationConfig, Part
+
+from .model_client import ModelClient
+from .scheduler import PageScheduler
+from .metrics import MODEL_CALL_SECONDS, MODEL_RETRIES, RATE_LIMIT_HITS, is_rate_limited
+from .tracing import tracer
+
+
+class PageAnalyzer:
+    """
+    页面分析执行器（PDF 页面和 PPT 幻灯片共用）
+
+    - 并发上限：同时进行的模型调用不超过 max_concurrent，按优先级、租户公平和剩余工作量调度（见 PageScheduler）
+    - 结果缓存：相同的图片 + 提示词 + 生成配置直接返回缓存的响应
+    - 重试：失败后按指数退避重试，最多 max_retries 次
+    - 指标：按提示词类型和结果记录调用耗时、重试和限流次数（见 api.metrics）
+    """
+
+    def __init__(self,
+                 model: ModelClient,
+                 max_concurrent: int = 4,
+                 max_retries: int = 3,
+                 cache_size: int = 1024,
+                 scheduler: Optional[PageScheduler] = None):
+        self.model = model
+        self.max_retries = max_retries
+        self.cache_size = cache_size
+        self.scheduler = scheduler or PageScheduler(max_concurrent)
+        self.max_concurrent = self.scheduler.max_concurrent
+        self._cache: "OrderedDict[str, Any]" = OrderedDict()
+
+    @staticmethod
+    def cache_key(prompt: str, image_bytes: bytes, generation_config: Dict) -> str:
+        """根据提示词、图片和生成配置计算缓存键"""
+        digest = hashlib.sha256()
+        digest.update(prompt.encode("utf-8"))
+        digest.update(image_bytes)
+        digest.update(json.dumps(generation_config, sort_keys=True, default=str).encode("utf-8"))
+        return digest.hexdigest()
+
+    def _cache_get(self, key: str):
+        response = self._cache.get(key)
+        if response is not None:
+            self._cache.move_to_end(key)
+        return response
+
+    def _cache_put(self, key: str, response: Any):
+        self._cache[key] = response
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    @staticmethod
+    def _generation_config(generation_config: Dict) -> Any:
+        """响应 schema 需要由 GenerationConfig 转换为 API 格式，其余配置直接传字典"""
+        if "response_schema" in generation_config:
+            return GenerationConfig(**generation_config)
+        return generation_config
+
+    async def generate(self,
+                       prompt: str,
+                       image_bytes: bytes,
+                       generation_config: Dict,
+                       mime_type: str = "image/png",
+                       prompt_type: str = "default") -> Any:
+        """
+        调用模型分析图片
+
+        Args:
+            prompt: 提示词
+            image_bytes: 图片字节
+            generation_config: 生成配置
+            mime_type: 图片类型
+            prompt_type: 提示词类型，用作指标标签
+
+        Returns:
+            模型响应（带 text 属性）
+        """
+        response, _ = await self.generate_with_cache_info(
+            prompt, image_bytes, generation_config, mime_type, prompt_type
+        )
+        return response
+
+    async def generate_with_cache_info(self,
+                                       prompt: str,
+                                       image_bytes: bytes,
+                                       generation_config: Dict,
+                                       mime_type: str = "image/png",
+                                       prompt_type: str = "default",
+                                       call_stats: Optional[Dict] = None) -> Tuple[Any, bool]:
+        """
+        调用模型分析图片，同时返回是否命中结果缓存（命中时没有产生新的 token 用量）
+
+        Args:
+            call_stats: 可选，写入本次调用的统计：cache_hit、latency（成功调用的耗时，秒）、
+                retries（重试次数）和 bytes_uploaded（各次尝试上传的提示词和图片字节数）
+
+        Returns:
+            (模型响应, 是否命中缓存)
+        """
+        stats = call_stats if call_stats is not None else {}
+        with tracer.span("model_call", prompt_type=prompt_type) as span:
+            try:
+                return await self._generate(
+                    prompt, image_bytes, generation_config, mime_type, prompt_type, stats
+                )
+            finally:
+                span.set_attributes(
+                    cache_hit=stats["cache_hit"],
+                    retries=stats["retries"],
+                    payload_bytes=stats["bytes_uploaded"]
+                )
+
+    async def _generate(self,
+                        prompt: str,
+                        image_bytes: bytes,
+                        generation_config: Dict,
+                        mime_type: str,
+                        prompt_type: str,
+                        stats: Dict) -> Tuple[Any, bool]:
+        stats.update(cache_hit=False, latency=None, retries=0, bytes_uploaded=0)
+
+        key = self.cache_key(prompt, image_bytes, generation_config)
+        cached = self._cache_get(key)
+        if cached is not None:
+            stats["cache_hit"] = True
+            return cached, True
+
+        request_bytes = len(prompt.encode("utf-8")) + len(image_bytes)
+        for attempt in range(self.max_retries):
+            try:
+                async with self.scheduler.slot():
+                    with tracer.span("model_attempt", attempt=attempt + 1, payload_bytes=request_bytes) as span:
+                        image_part = Part.from_data(image_bytes, mime_type=mime_type)
+                        stats["bytes_uploaded"] += request_bytes
+                        start = time.perf_counter()
+                        try:
+                            response = await self.model.generate_content_async(
+                                [prompt, image_part] if prompt else [image_part],
+                                generation_config=self._generation_config(generation_config)
+                            )
+                        except Exception as e:
+                            outcome = "rate_limited" if is_rate_limited(e) else "error"
+                            span.set_attribute("outcome", outcome)
+                            MODEL_CALL_SECONDS.labels(prompt_type, outcome).observe(time.perf_counter() - start)
+                            raise
+                        stats["latency"] = time.perf_counter() - start
+                        span.set_attribute("outcome", "success")
+                        MODEL_CALL_SECONDS.labels(prompt_type, "success").observe(stats["latency"])
+                self._cache_put(key, response)
+                return response, False
+
+            except Exception as e:
+                if is_rate_limited(e):
+                    RATE_LIMIT_HITS.labels(prompt_type).inc()
+                if attempt == self.max_retries - 1:
+                    raise
+                stats["retries"] += 1
+                MODEL_RETRIES.labels(prompt_type).inc()
+                await asyncio.sleep(2 ** attempt)
@@ -0,0 +1,116 @@
+import os
+import json
+from typing import Dict, Optional
+from datetime import datetime
+from pathlib import Path
+
+from .metrics import RESULT_WRITE_SECONDS, timed
+
+
+class CheckpointStore:
+    """任务检查点存储
+
+    每个任务在 ``{root_dir}/{task_id}/checkpoints`` 下保存：
+    - ``task.json``: 任务清单（状态、文件名、总页数等）
+    - ``page_{n}.json``: 每一页完成（或失败）后立即落盘的结果
+    - ``cancel``: 取消标记（任务由其他进程处理时，处理进程据此停止）
+    """
+
+    MANIFEST_NAME = "task.json"
+    CANCEL_NAME = "cancel"
+
+    def __init__(self, root_dir: str = "outputs"):
+        self.root_dir = root_dir
+
+    def _checkpoint_dir(self, task_id: str) -> str:
+        return os.path.join(self.root_dir, task_id, "checkpoints")
+
+    def _page_path(self, task_id: str, page_number: int) -> str:
+        return os.path.join(self._checkpoint_dir(task_id), f"page_{page_number}.json")
+
+    @staticmethod
+    def _json_default(value):
+        if isinstance(value, datetime):
+            return value.isoformat()
+        return str(value)
+
+    def _write_json(self, path: str, data: Dict):
+        """先写临时文件再原子替换，避免进程中断时留下半个文件"""
+        Path(os.path.dirname(path)).mkdir(parents=True, exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, default=self._json_default)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def _read_json(path: str) -> Optional[Dict]:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def save_task(self, task_id: str, info: Dict):
+        """保存任务清单"""
+        self._write_json(
+            os.path.join(self._checkpoint_dir(task_id), self.MANIFEST_NAME),
+            info
+        )
+
+    def load_task(self, task_id: str) -> Optional[Dict]:
+        """读取任务清单，不存在时返回 None"""
+        return self._read_json(
+            os.path.join(self._checkpoint_dir(task_id), self.MANIFEST_NAME)
+        )
+
+    def save_page(self, task_id: str, page_number: int, result: Dict):
+        """保存已完成页面的结果"""
+        with timed(RESULT_WRITE_SECONDS):
+            self._write_json(self._page_path(task_id, page_number), {
+                "page_number": page_number,
+                "status": "completed",
+                "result": result
+            })
+
+    def save_page_error(self, task_id: str, page_number: int, error: str):
+        """记录失败页面，续跑时会重新处理"""
+        self._write_json(self._page_path(task_id, page_number), {
+            "page_number": page_number,
+            "status": "failed",
+            "error": error
+        })
+
+    def load_pages(self, task_id: str) -> Dict[int, Dict]:
+        """读取所有已完成页面的结果，按页码索引"""
+        checkpoint_dir = self._checkpoint_dir(task_id)
+        if not os.path.isdir(checkpoint_dir):
+            return {}
+
+        pages = {}
+        for name in os.listdir(checkpoint_dir):
+            if not (name.startswith("page_") and name.endswith(".json")):
+                continue
+            data = self._read_json(os.path.join(checkpoint_dir, name))
+            if data and data.get("status") == "completed":
+                pages[data["page_number"]] = data["result"]
+        return pages
+
+    def clear_pages(self, task_id: str):
+        """删除所有逐页结果（保留任务清单）"""
+        checkpoint_dir = self._checkpoint_dir(task_id)
+        if not os.path.isdir(checkpoint_dir):
+            return
+        for name in os.listdir(checkpoint_dir):
+            if name.startswith("page_"):
+                os.remove(os.path.join(checkpoint_dir, name))
+
+    def request_cancel(self, task_id: str):
+        """写入取消标记"""
+        self._write_json(
+            os.path.join(self._checkpoint_dir(task_id), self.CANCEL_NAME),
+            {"requested_at": datetime.now()}
+        )
+
+    def cancel_requested(self, task_id: str) -> bool:
+        """是否已请求取消"""
+        return os.path.exists(os.path.join(self._checkpoint_dir(task_id), self.CANCEL_NAME))
@@ -0,0 +1,484 @@
+import os
+import json
+import time
+import uuid
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from enum import Enum
+from typing import Any, Dict, Optional
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+
+class JobStatus(str, Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+
+@dataclass
+class Job:
+    job_id: str
+    kind: str
+    payload: Dict[str, Any]
+    attempts: int  # 包括本次在内的领取次数
+    lease_owner: Optional[str] = None
+
+
+class JobQueue(ABC):
+    """
+    持久化任务队列
+
+    API 进程入队，worker 进程（python -m api.worker）领取并执行。领取的任务带租约（visibility_timeout）：
+    worker 处理期间定期续约，完成后确认；worker 崩溃或失联导致租约过期时，任务重新对其他 worker 可见。
+    每次领取计一次尝试，超过 max_attempts 次仍未完成的任务标记为失败。
+    """
+
+    def __init__(self, visibility_timeout: float = 300.0, max_attempts: int = 3):
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+
+    @abstractmethod
+    def enqueue(self, kind: str, payload: Dict[str, Any], job_id: Optional[str] = None) -> str:
+        """入队，返回任务ID（同一 job_id 已在队列中时覆盖为新的待处理任务）"""
+        pass
+
+    @abstractmethod
+    def claim(self, worker_id: str) -> Optional[Job]:
+        """领取最早入队的可见任务，没有时返回 None"""
+        pass
+
+    @abstractmethod
+    def extend(self, job: Job) -> bool:
+        """续约，租约已被其他 worker 接管时返回 False"""
+        pass
+
+    @abstractmethod
+    def complete(self, job: Job):
+        """确认完成"""
+        pass
+
+    @abstractmethod
+    def fail(self, job: Job, error: str, retry_delay: float = 0.0):
+        """处理失败：未超过 max_attempts 时 retry_delay 秒后重新可见，否则标记为失败"""
+        pass
+
+    @abstractmethod
+    def cancel(self, job_id: str) -> bool:
+        """
+        取消任务：等待中（含等待重试）的任务移出队列并返回 True；
+        正在被 worker 处理（租约有效）时返回 False，由 worker 检查任务的取消标记后停止；
+        已结束或不存在时返回 True
+        """
+        pass
+
+    @abstractmethod
+    def depth(self) -> int:
+        """等待处理的任务数"""
+        pass
+
+    @abstractmethod
+    def position(self, job_id: str) -> Optional[int]:
+        """任务在等待队列中的位置（0 为下一个被领取），不在等待中时返回 None"""
+        pass
+
+    @abstractmethod
+    def status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """任务的队列状态（status、attempts、error），不存在时返回 None"""
+        pass
+
+    def close(self):
+        pass
+
+
+class SQLiteJobQueue(JobQueue):
+    """
+    基于 SQLite 的队列（WAL 模式），同一主机上的多个进程共享一个数据库文件
+
+    领取时用 BEGIN IMMEDIATE 加写锁，保证同一任务只被一个 worker 领取。
+    跨主机共享请使用 RedisJobQueue（SQLite 不适合放在网络文件系统上）。
+
+    Args:
+        path: 数据库文件路径
+        visibility_timeout: 租约时长（秒）
+        max_attempts: 最大尝试次数
+    """
+
+    def __init__(self, path: str, visibility_timeout: float = 300.0, max_attempts: int = 3):
+        super().__init__(visibility_timeout, max_attempts)
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._local = threading.local()
+        self._connection().execute("PRAGMA journal_mode=WAL")
+        with self._transaction() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "job_id TEXT PRIMARY KEY, kind TEXT NOT NULL, payload TEXT NOT NULL, "
+                "status TEXT NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, "
+                "enqueued_at REAL NOT NULL, available_at REAL NOT NULL, "
+                "lease_owner TEXT, lease_expires REAL, error TEXT)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (status, available_at)")
+
+    def _connection(self) -> sqlite3.Connection:
+        # 每个线程一个连接（sqlite3 连接不能跨线程使用），自动提交模式，写操作显式开启事务
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30.0, isolation_level=None)
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+        return conn
+
+    def _transaction(self) -> "_Transaction":
+        return _Transaction(self._connection())
+
+    def enqueue(self, kind: str, payload: Dict[str, Any], job_id: Optional[str] = None) -> str:
+        job_id = job_id or str(uuid.uuid4())
+        now = time.time()
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO jobs (job_id, kind, payload, status, attempts, enqueued_at, available_at) "
+                "VALUES (?, ?, ?, ?, 0, ?, ?)",
+                (job_id, kind, json.dumps(payload, ensure_ascii=False), JobStatus.QUEUED, now, now)
+            )
+        return job_id
+
+    def claim(self, worker_id: str) -> Optional[Job]:
+        now = time.time()
+        with self._transaction() as conn:
+            while True:
+                row = conn.execute(
+                    "SELECT job_id, kind, payload, status, attempts FROM jobs "
+                    "WHERE (status = ? AND available_at <= ?) OR (status = ? AND lease_expires < ?) "
+                    "ORDER BY available_at LIMIT 1",
+                    (JobStatus.QUEUED, now, JobStatus.RUNNING, now)
+                ).fetchone()
+                if row is None:
+                    return None
+                job_id, kind, payload, status, attempts = row
+                if attempts >= self.max_attempts:
+                    # 租约过期（worker 崩溃）且已用完尝试次数
+                    conn.execute(
+                        "UPDATE jobs SET status = ?, lease_owner = NULL, error = ? WHERE job_id = ?",
+                        (JobStatus.FAILED, "Lease expired after the last attempt", job_id)
+                    )
+                    continue
+                conn.execute(
+                    "UPDATE jobs SET status = ?, attempts = ?, lease_owner = ?, lease_expires = ? WHERE job_id = ?",
+                    (JobStatus.RUNNING, attempts + 1, worker_id, now + self.visibility_timeout, job_id)
+                )
+                return Job(job_id, kind, json.loads(payload), attempts + 1, worker_id)
+
+    def extend(self, job: Job) -> bool:
+        with self._transaction() as conn:
+            updated = conn.execute(
+                "UPDATE jobs SET lease_expires = ? WHERE job_id = ? AND status = ? AND lease_owner = ? AND attempts = ?",
+                (time.time() + self.visibility_timeout, job.job_id, JobStatus.RUNNING, job.lease_owner, job.attempts)
+            ).rowcount
+        return updated == 1
+
+    def complete(self, job: Job):
+        with self._transaction() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, lease_owner = NULL, error = NULL "
+                "WHERE job_id = ? AND lease_owner = ? AND attempts = ?",
+                (JobStatus.DONE, job.job_id, job.lease_owner, job.attempts)
+            )
+
+    def fail(self, job: Job, error: str, retry_delay: float = 0.0):
+        retry = job.attempts < self.max_attempts
+        with self._transaction() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, available_at = ?, lease_owner = NULL, error = ? "
+                "WHERE job_id = ? AND lease_owner = ? AND attempts = ?",
+                (JobStatus.QUEUED if retry else JobStatus.FAILED, time.time() + retry_delay, error,
+                 job.job_id, job.lease_owner, job.attempts)
+            )
+
+    def cancel(self, job_id: str) -> bool:
+        with self._transaction() as conn:
+            row = conn.execute("SELECT status, lease_expires FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+            if row is None:
+                return True
+            status, lease_expires = row
+            if status == JobStatus.RUNNING and lease_expires >= time.time():
+                return False
+            if status in (JobStatus.QUEUED, JobStatus.RUNNING):
+                conn.execute(
+                    "UPDATE jobs SET status = ?, lease_owner = NULL WHERE job_id = ?", (JobStatus.CANCELLED, job_id)
+                )
+            return True
+
+    def depth(self) -> int:
+        conn = self._connection()
+        return conn.execute("SELECT COUNT(*) FROM jobs WHERE status = ?", (JobStatus.QUEUED,)).fetchone()[0]
+
+    def position(self, job_id: str) -> Optional[int]:
+        conn = self._connection()
+        row = conn.execute(
+            "SELECT available_at FROM jobs WHERE job_id = ? AND status = ?", (job_id, JobStatus.QUEUED)
+        ).fetchone()
+        if row is None:
+            return None
+        return conn.execute(
+            "SELECT COUNT(*) FROM jobs WHERE status = ? AND available_at < ?", (JobStatus.QUEUED, row[0])
+        ).fetchone()[0]
+
+    def status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        row = self._connection().execute(
+            "SELECT status, attempts, error FROM jobs WHERE job_id = ?", (job_id,)
+        ).fetchone()
+        return {"status": row[0], "attempts": row[1], "error": row[2]} if row else None
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+class _Transaction:
+    """BEGIN IMMEDIATE ... COMMIT，异常时回滚"""
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+
+    def __enter__(self) -> sqlite3.Connection:
+        self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+
+
+class RedisJobQueue(JobQueue):
+    """
+    基于 Redis 的队列，多台主机上的 worker 共享（兼容 Redis 协议的服务均可，如 Valkey、KeyDB）
+
+    - {prefix}:queue：等待处理的任务ID（LIST，左进右出）
+    - {prefix}:leases：处理中的任务ID，分值为租约到期时间（ZSET）
+    - {prefix}:delayed：等待重试的任务ID，分值为重新可见的时间（ZSET）
+    - {prefix}:job:{job_id}：任务内容和状态（HASH）
+
+    出队和登记租约在同一个 Lua 脚本中完成，worker 在两者之间崩溃也不会丢失任务。
+    领取前把到期的租约（Lua 脚本）和重试（ZREM 成功的一方负责移动）移回等待队列，多个 worker 同时检查时不会重复入队。
+    续租、确认和失败的租约检查与写入在同一个 Lua 脚本中完成，租约过期被移回队列后原 worker 不能再修改任务。
+
+    Args:
+        url: Redis 地址，如 redis://localhost:6379/0
+        prefix: 键前缀
+        visibility_timeout: 租约时长（秒）
+        max_attempts: 最大尝试次数
+        client: 已创建的客户端（需 decode_responses=True，如测试中的 fakeredis），指定时忽略 url
+    """
+
+    # KEYS: 等待队列、租约；ARGV: 租约到期时间、worker ID、任务键前缀
+    CLAIM_SCRIPT = """
+    local job_id = redis.call('RPOP', KEYS[1])
+    if not job_id then
+        return nil
+    end
+    redis.call('ZADD', KEYS[2], ARGV[1], job_id)
+    local key = ARGV[3] .. job_id
+    local attempts = redis.call('HINCRBY', key, 'attempts', 1)
+    redis.call('HSET', key, 'status', 'running', 'lease_owner', ARGV[2])
+    local fields = redis.call('HMGET', key, 'kind', 'payload')
+    return {job_id, attempts, fields[1], fields[2]}
+    """
+
+    # KEYS: 租约、等待队列；ARGV: 当前时间、最大尝试次数、任务键前缀。返回过期的租约数
+    EXPIRE_SCRIPT = """
+    local expired = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1])
+    for _, job_id in ipairs(expired) do
+        redis.call('ZREM', KEYS[1], job_id)
+        local key = ARGV[3] .. job_id
+        if tonumber(redis.call('HGET', key, 'attempts') or 0) >= tonumber(ARGV[2]) then
+            redis.call('HSET', key, 'status', 'failed', 'lease_owner', '', 'error', 'Lease expired after the last attempt')
+        else
+            redis.call('HSET', key, 'status', 'queued')
+            redis.call('LPUSH', KEYS[2], job_id)
+        end
+    end
+    return #expired
+    """
+
+    # 续租、确认和失败脚本共用的租约检查。KEYS[1]: 任务键；ARGV[1..3]: 任务ID、worker ID、尝试次数
+    OWNS_CHECK = """
+    local fields = redis.call('HMGET', KEYS[1], 'lease_owner', 'attempts', 'status')
+    if fields[1] ~= ARGV[2] or tonumber(fields[2] or 0) ~= tonumber(ARGV[3]) or fields[3] ~= 'running' then
+        return 0
+    end
+    """
+
+    # KEYS: 任务键、租约；ARGV: 任务ID、worker ID、尝试次数、新的租约到期时间。不再持有租约时返回 0
+    EXTEND_SCRIPT = OWNS_CHECK + """
+    redis.call('ZADD', KEYS[2], 'XX', ARGV[4], ARGV[1])
+    return 1
+    """
+
+    # KEYS: 任务键、租约、重试；ARGV: 任务ID、worker ID、尝试次数、状态、错误、重试时间（空字符串表示不重试）
+    FINISH_SCRIPT = OWNS_CHECK + """
+    redis.call('ZREM', KEYS[2], ARGV[1])
+    redis.call('HSET', KEYS[1], 'status', ARGV[4], 'lease_owner', '', 'error', ARGV[5])
+    if ARGV[6] ~= '' then
+        redis.call('ZADD', KEYS[3], ARGV[6], ARGV[1])
+    end
+    return 1
+    """
+
+    # KEYS: 等待队列、重试、任务键；ARGV: 任务ID。处理中返回 0，否则移出队列并返回 1
+    CANCEL_SCRIPT = """
+    local status = redis.call('HGET', KEYS[3], 'status')
+    if status == 'running' then
+        return 0
+    end
+    if status == 'queued' then
+        redis.call('LREM', KEYS[1], 0, ARGV[1])
+        redis.call('ZREM', KEYS[2], ARGV[1])
+        redis.call('HSET', KEYS[3], 'status', 'cancelled')
+    end
+    return 1
+    """
+
+    def __init__(self,
+                 url: Optional[str] = None,
+                 prefix: str = "docproc:jobs",
+                 visibility_timeout: float = 300.0,
+                 max_attempts: int = 3,
+                 client: Optional[Any] = None):
+        if client is None and redis is None:
+            raise RuntimeError("The redis package is required for a redis:// job queue: pip install redis")
+        super().__init__(visibility_timeout, max_attempts)
+        self.client = client if client is not None else redis.Redis.from_url(url, decode_responses=True)
+        self.prefix = prefix
+        self._claim_script = self.client.register_script(self.CLAIM_SCRIPT)
+        self._cancel_script = self.client.register_script(self.CANCEL_SCRIPT)
+        self._expire_script = self.client.register_script(self.EXPIRE_SCRIPT)
+        self._extend_script = self.client.register_script(self.EXTEND_SCRIPT)
+        self._finish_script = self.client.register_script(self.FINISH_SCRIPT)
+
+    def _key(self, name: str) -> str:
+        return f"{self.prefix}:{name}"
+
+    def _job_key(self, job_id: str) -> str:
+        return f"{self.prefix}:job:{job_id}"
+
+    def enqueue(self, kind: str, payload: Dict[str, Any], job_id: Optional[str] = None) -> str:
+        job_id = job_id or str(uuid.uuid4())
+        pipe = self.client.pipeline()
+        pipe.hset(self._job_key(job_id), mapping={
+            "kind": kind, "payload": json.dumps(payload, ensure_ascii=False),
+            "status": JobStatus.QUEUED, "attempts": 0, "enqueued_at": time.time(), "error": "", "lease_owner": ""
+        })
+        pipe.zrem(self._key("leases"), job_id)
+        pipe.zrem(self._key("delayed"), job_id)
+        pipe.lrem(self._key("queue"), 0, job_id)
+        pipe.lpush(self._key("queue"), job_id)
+        pipe.execute()
+        return job_id
+
+    def _requeue_due(self):
+        now = time.time()
+        for job_id in self.client.zrangebyscore(self._key("delayed"), "-inf", now):
+            if self.client.zrem(self._key("delayed"), job_id):
+                self.client.lpush(self._key("queue"), job_id)
+        self._expire_script(
+            keys=[self._key("leases"), self._key("queue")],
+            args=[now, self.max_attempts, self._job_key("")]
+        )
+
+    def claim(self, worker_id: str) -> Optional[Job]:
+        self._requeue_due()
+        claimed = self._claim_script(
+            keys=[self._key("queue"), self._key("leases")],
+            args=[time.time() + self.visibility_timeout, worker_id, self._job_key("")]
+        )
+        if claimed is None:
+            return None
+        job_id, attempts, kind, payload = claimed
+        return Job(job_id, kind, json.loads(payload), int(attempts), worker_id)
+
+    def extend(self, job: Job) -> bool:
+        extended = self._extend_script(
+            keys=[self._job_key(job.job_id), self._key("leases")],
+            args=[job.job_id, job.lease_owner, job.attempts, time.time() + self.visibility_timeout]
+        )
+        return bool(extended)
+
+    def _finish(self, job: Job, status: JobStatus, error: str, retry_at: Any = ""):
+        self._finish_script(
+            keys=[self._job_key(job.job_id), self._key("leases"), self._key("delayed")],
+            args=[job.job_id, job.lease_owner, job.attempts, status.value, error, retry_at]
+        )
+
+    def complete(self, job: Job):
+        self._finish(job, JobStatus.DONE, "")
+
+    def fail(self, job: Job, error: str, retry_delay: float = 0.0):
+        if job.attempts < self.max_attempts:
+            self._finish(job, JobStatus.QUEUED, error, time.time() + retry_delay)
+        else:
+            self._finish(job, JobStatus.FAILED, error)
+
+    def cancel(self, job_id: str) -> bool:
+        # 租约已过期的任务先移回等待队列，再按等待中的任务取消
+        self._requeue_due()
+        cancelled = self._cancel_script(
+            keys=[self._key("queue"), self._key("delayed"), self._job_key(job_id)], args=[job_id]
+        )
+        return bool(cancelled)
+
+    def depth(self) -> int:
+        return self.client.llen(self._key("queue")) + self.client.zcard(self._key("delayed"))
+
+    def position(self, job_id: str) -> Optional[int]:
+        # 右端先出队，位置为右侧剩余的任务数
+        queue = self.client.lrange(self._key("queue"), 0, -1)
+        if job_id not in queue:
+            return None
+        return len(queue) - 1 - queue.index(job_id)
+
+    def status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        status, attempts, error = self.client.hmget(self._job_key(job_id), "status", "attempts", "error")
+        if status is None:
+            return None
+        return {"status": status, "attempts": int(attempts or 0), "error": error or None}
+
+    def close(self):
+        self.client.close()
+
+
+def create_job_queue(url: str, visibility_timeout: float = 300.0, max_attempts: int = 3) -> JobQueue:
+    """
+    按地址创建队列
+
+    Args:
+        url: ``sqlite:///path/to/jobs.db``（相对路径）、``sqlite:////abs/jobs.db`` 或 ``redis://host:port/db``
+    """
+    if url.startswith("sqlite:///"):
+        return SQLiteJobQueue(url[len("sqlite:///"):], visibility_timeout, max_attempts)
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisJobQueue(url, visibility_timeout=visibility_timeout, max_attempts=max_attempts)
+    raise ValueError(f"Unsupported job queue URL: {url}")
+
+
+def job_queue_from_env() -> Optional[JobQueue]:
+    """
+    按环境变量创建队列：JOB_QUEUE_URL（未设置时返回 None，API 在本进程内处理任务）、
+    JOB_VISIBILITY_TIMEOUT（秒，默认 300）和 JOB_MAX_ATTEMPTS（默认 3）
+    """
+    url = os.getenv("JOB_QUEUE_URL")
+    if not url:
+        return None
+    return create_job_queue(
+        url,
+        visibility_timeout=float(os.getenv("JOB_VISIBILITY_TIMEOUT", "300")),
+        max_attempts=int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+    )
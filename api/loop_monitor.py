@@ -0,0 +1,134 @@
+import sys
+import time
+import asyncio
+import logging
+import threading
+import traceback
+from collections import Counter, deque
+from typing import Deque, Dict, List, Optional
+
+from .metrics import EVENT_LOOP_BLOCKED, EVENT_LOOP_LAG_SECONDS
+
+logger = logging.getLogger(__name__)
+
+
+class LoopMonitor:
+    """
+    事件循环延迟监控和阻塞调用检测
+
+    - 心跳协程每 interval 秒唤醒一次，实际唤醒时间与预期的差值记入
+      docproc_event_loop_lag_seconds
+    - 看门狗线程发现心跳超时 threshold 秒时，按 sample_interval 采样事件循环线程的调用栈；
+      循环恢复后记录阻塞时长、当时运行的协程和出现次数最多的调用栈（logger 为 api.loop_monitor），
+      并累加 docproc_event_loop_blocked_total
+
+    在协程中阻塞运行的同步调用（渲染、PIL 编码、解析 PPTX、复制文件）会在报告中显示为栈顶。
+
+    Args:
+        threshold: 阻塞判定阈值（秒）
+        interval: 心跳间隔（秒）
+        sample_interval: 看门狗检查和调用栈采样的间隔（秒）
+        stack_limit: 每个调用栈保留的最内层帧数
+        max_reports: 保留的最近阻塞报告数
+    """
+
+    def __init__(self,
+                 threshold: float = 0.1,
+                 interval: float = 0.05,
+                 sample_interval: float = 0.01,
+                 stack_limit: int = 20,
+                 max_reports: int = 100):
+        self.threshold = threshold
+        self.interval = interval
+        self.sample_interval = sample_interval
+        self.stack_limit = stack_limit
+        self.reports: Deque[Dict] = deque(maxlen=max_reports)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._last_beat = time.monotonic()
+        self._heartbeat_task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+    def start(self):
+        """在当前事件循环上启动心跳协程和看门狗线程（需在协程中调用）"""
+        if self._heartbeat_task is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._stopped.clear()
+        self._heartbeat_task = self._loop.create_task(self._heartbeat())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-monitor", daemon=True)
+        self._watchdog.start()
+
+    def stop(self):
+        """停止监控"""
+        self._stopped.set()
+        if self._heartbeat_task is not None:
+            self._heartbeat_task.cancel()
+            self._heartbeat_task = None
+        if self._watchdog is not None:
+            self._watchdog.join(timeout=1.0)
+            self._watchdog = None
+
+    async def _heartbeat(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            EVENT_LOOP_LAG_SECONDS.observe(max(0.0, loop.time() - expected))
+            self._last_beat = time.monotonic()
+
+    def _running_task(self) -> Optional[str]:
+        task = asyncio.current_task(self._loop)
+        if task is None:
+            return None
+        coro = task.get_coro()
+        return f"{task.get_name()} ({getattr(coro, '__qualname__', coro)})"
+
+    def _sample_stack(self) -> Optional[str]:
+        frame = sys._current_frames().get(self._loop_thread_id)
+        if frame is None:
+            return None
+        return "".join(traceback.format_list(traceback.extract_stack(frame, limit=self.stack_limit)))
+
+    def _watch(self):
+        blocked: Optional[Dict] = None
+        while not self._stopped.wait(self.sample_interval):
+            beat = self._last_beat
+            overdue = time.monotonic() - beat - self.interval
+            if blocked is not None and (overdue < self.threshold or blocked["beat"] != beat):
+                self._report(blocked)
+                blocked = None
+            if overdue < self.threshold:
+                continue
+            if blocked is None:
+                blocked = {"beat": beat, "task": self._running_task(), "stacks": Counter()}
+            stack = self._sample_stack()
+            if stack:
+                blocked["stacks"][stack] += 1
+            blocked["seconds"] = overdue
+        if blocked is not None:
+            self._report(blocked)
+
+    def _report(self, blocked: Dict):
+        stacks: Counter = blocked["stacks"]
+        stack, samples = stacks.most_common(1)[0] if stacks else ("", 0)
+        report = {
+            "seconds": round(blocked["seconds"], 4),
+            "task": blocked["task"],
+            "stack": stack,
+            "samples": samples,
+            "total_samples": sum(stacks.values())
+        }
+        self.reports.append(report)
+        EVENT_LOOP_BLOCKED.inc()
+        logger.warning(
+            f"事件循环被阻塞至少 {report['seconds'] * 1000:.0f}ms，协程: {report['task']}，"
+            f"调用栈（{samples}/{report['total_samples']} 次采样）:\n{stack}"
+        )
+
+    def recent_reports(self) -> List[Dict]:
+        """最近的阻塞报告（时长、协程、调用栈），按发生顺序"""
+        return list(self.reports)
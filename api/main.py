@@ -1,13 +1,25 @@
+import os
+from typing import Dict, Optional
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi import File, UploadFile, HTTPException, Path
-from fastapi.responses import JSONResponse, FileResponse
+from fastapi import File, Form, Header, Query, UploadFile, HTTPException, Path
+from fastapi.responses import JSONResponse, FileResponse, Response
 import asyncio
-from pathlib import Path
+import math
+import uuid
 
-from .models import TaskResponse, TaskResult, TaskStatus
+from .models import TaskResponse, TaskResult, TaskStatus, TokenUsage
 from .services import PDFProcessingService
-from .routes import pdf, pptx
+from .admission import AdmissionController, AdmissionRejected
+from .scheduler import PageScheduler, Priority, scheduling
+from .usage import UsageTracker, tenant_id
+from .metrics import JOB_QUEUE_DEPTH, UPLOAD_SECONDS, render_latest, set_task_counts, timed
+from .tracing import configure_tracing, tracer
+from .loop_monitor import LoopMonitor
+from .model_client import model_client_from_env
+from .job_queue import job_queue_from_env
+from .routes import pptx
 
 app = FastAPI(title="Document Processing API")
 
@@ -21,35 +33,193 @@ app.add_middleware(
 )
 
 # 注册路由
-app.include_router(pdf.router)
 app.include_router(pptx.router)
 
+# 链路追踪导出器（console / json:<path>，逗号分隔；未设置时不记录）
+configure_tracing(os.getenv("TRACE_EXPORTER"))
+
+@app.on_event("shutdown")
+async def shutdown_tracing():
+    tracer.shutdown()
+
+# 事件循环阻塞监控（LOOP_MONITOR=1 开启，阻塞超过 LOOP_MONITOR_THRESHOLD_MS 毫秒时记录调用栈）
+loop_monitor = LoopMonitor(
+    threshold=float(os.getenv("LOOP_MONITOR_THRESHOLD_MS", "100")) / 1000
+) if os.getenv("LOOP_MONITOR", "").lower() in ("1", "true", "yes") else None
+
+@app.on_event("startup")
+async def start_loop_monitor():
+    if loop_monitor:
+        loop_monitor.start()
+
+@app.on_event("shutdown")
+async def stop_loop_monitor():
+    if loop_monitor:
+        loop_monitor.stop()
+
 # 初始化服务
-pdf_service = PDFProcessingService()
+usage_quota = os.getenv("USAGE_QUOTA_TOKENS")
+max_task_tokens = os.getenv("MAX_TASK_TOKENS")
+max_task_tokens = int(max_task_tokens) if max_task_tokens else None
+# 管理选项：允许按请求开启任务采样剖析
+profiling_enabled = os.getenv("TASK_PROFILING_ENABLED", "").lower() in ("1", "true", "yes")
+
+# 准入控制：同时运行的任务数、已接收任务的总页数和上传字节数、排队任务数（未设置的不限制）
+def _env_int(name: str, default: Optional[int] = None) -> Optional[int]:
+    value = os.getenv(name)
+    return int(value) if value else default
+
+admission = AdmissionController(
+    max_tasks=_env_int("ADMISSION_MAX_TASKS", 4),
+    max_pages=_env_int("ADMISSION_MAX_PAGES"),
+    max_bytes=_env_int("ADMISSION_MAX_BYTES"),
+    max_queued=_env_int("ADMISSION_MAX_QUEUED")
+)
+
+def saturated(e: AdmissionRejected) -> HTTPException:
+    return HTTPException(
+        status_code=429, detail=str(e), headers={"Retry-After": str(math.ceil(e.retry_after))}
+    )
+
+# 模型调用调度：为交互请求（单页分析）保留的名额数，租户权重（"租户ID=权重"，逗号分隔，租户ID 见 /metrics/usage）
+def _tenant_weights(value: str) -> Dict[str, float]:
+    weights = {}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        tenant, weight = item.rsplit("=", 1)
+        weights[tenant.strip()] = float(weight)
+    return weights
+
+scheduler = PageScheduler(
+    max_concurrent=_env_int("MODEL_MAX_CONCURRENT", 4),
+    reserved_interactive=_env_int("SCHEDULER_INTERACTIVE_RESERVED", 0),
+    weights=_tenant_weights(os.getenv("SCHEDULER_TENANT_WEIGHTS", ""))
+)
+# PPT 幻灯片的模型调用与 PDF 页面共用同一个调度器（分析器在首次分析时创建）
+pptx.pptx_service.scheduler = scheduler
+
+# 任务队列（JOB_QUEUE_URL）：配置后任务交给独立的 worker 进程处理（python -m api.worker），
+# 未配置时在 API 进程内后台处理
+job_queue = job_queue_from_env()
+
+@app.on_event("shutdown")
+async def close_job_queue():
+    if job_queue:
+        job_queue.close()
+
+pdf_service = PDFProcessingService(
+    structured_output=os.getenv("PDF_STRUCTURED_OUTPUT", "").lower() in ("1", "true", "yes"),
+    usage_tracker=UsageTracker(
+        "outputs",
+        quota_tokens=int(usage_quota) if usage_quota else None
+    ),
+    model_client=model_client_from_env(),
+    shared_state=job_queue is not None,
+    admission=admission,
+    scheduler=scheduler
+)
+
+async def start_processing(task_id: str, file_path: str, resume: bool = False):
+    """入队交给 worker 处理；未配置任务队列时在本进程后台处理"""
+    if job_queue:
+        payload = {"task_id": task_id, "file_path": file_path, "resume": resume}
+        await asyncio.to_thread(job_queue.enqueue, "pdf", payload, task_id)
+    else:
+        pdf_service.runner.start(task_id, pdf_service.process_pdf(task_id, file_path, resume=resume))
+
+def abandon_task(task_id: str, file_path: str):
+    """任务未能开始处理：交还准入名额并删除上传的文件"""
+    admission.release(task_id)
+    if os.path.exists(file_path):
+        os.remove(file_path)
 
 @app.post("/tasks/", response_model=TaskResponse)
-async def create_task(file: UploadFile = File(...)):
+async def create_task(
+    file: UploadFile = File(...),
+    revision_of: Optional[str] = Form(None, description="上一版本的任务ID"),
+    x_api_key: Optional[str] = Header(None, description="API key，用于按租户统计用量和配额"),
+    profile: bool = Query(False, description="对任务处理过程做采样剖析"),
+    x_profile: Optional[str] = Header(None, description="非空时与 profile=true 相同")
+):
     """
     创建新的PDF处理任务
     
     - **file**: PDF文件
+    - **revision_of**: 上一版本的任务ID（可选），未修改的页面直接复用其结果；
+      未指定时按页面哈希自动匹配
+    - **profile**: 管理选项（需设置 TASK_PROFILING_ENABLED），对任务处理过程做采样剖析，
+      结果通过 `GET /tasks/{task_id}/profile` 下载；也可以用 X-Profile 请求头开启
+    
+    任务开始前预估 token 用量：超过单任务上限（MAX_TASK_TOKENS）返回 413，
+    超过租户剩余配额（USAGE_QUOTA_TOKENS）返回 429。
+    系统饱和（超过 ADMISSION_* 限制）时返回 429 和 Retry-After；
+    运行名额已满时任务排队，状态中给出 queue_position 和 estimated_start。
     
     返回任务ID和初始状态
     """
     if not file.filename.lower().endswith('.pdf'):
         raise HTTPException(status_code=400, detail="Only PDF files are allowed")
     
-    # 创建任务
-    task = pdf_service.create_task(file.filename)
+    if revision_of and not pdf_service.get_task_status(revision_of):
+        raise HTTPException(status_code=404, detail="Base task not found")
+    
+    profile = profile or bool(x_profile)
+    if profile and not profiling_enabled:
+        raise HTTPException(status_code=403, detail="Task profiling is not enabled")
     
-    # 保存文件
-    file_path = os.path.join(pdf_service.upload_dir, f"{task.task_id}.pdf")
-    with open(file_path, "wb") as buffer:
-        content = await file.read()
-        buffer.write(content)
+    with tracer.span("create_task", file_name=file.filename) as span:
+        # 先保存到临时文件，预估通过后再创建任务
+        upload_path = os.path.join(pdf_service.upload_dir, f"upload-{uuid.uuid4()}.pdf")
+        with timed(UPLOAD_SECONDS.labels("pdf")):
+            with open(upload_path, "wb") as buffer:
+                content = await file.read()
+                buffer.write(content)
+        
+        try:
+            estimate = await pdf_service.estimate_task(upload_path)
+        except Exception:
+            os.remove(upload_path)
+            raise HTTPException(status_code=400, detail="Invalid PDF file")
+        
+        if max_task_tokens is not None and estimate["estimated_tokens"] > max_task_tokens:
+            os.remove(upload_path)
+            raise HTTPException(
+                status_code=413,
+                detail=f"Estimated {estimate['estimated_tokens']} tokens exceeds the per-task limit of {max_task_tokens}"
+            )
+        
+        remaining = pdf_service.usage.remaining(tenant_id(x_api_key))
+        if remaining is not None and estimate["estimated_tokens"] > remaining:
+            os.remove(upload_path)
+            raise HTTPException(
+                status_code=429,
+                detail=f"Estimated {estimate['estimated_tokens']} tokens exceeds the remaining quota of {remaining}"
+            )
+        
+        # 创建任务
+        try:
+            task = pdf_service.create_task(
+                file.filename, revision_of=revision_of, api_key=x_api_key, estimate=estimate,
+                profile=profile, upload_bytes=len(content)
+            )
+        except AdmissionRejected as e:
+            os.remove(upload_path)
+            span.set_attribute("rejected", e.reason)
+            raise saturated(e)
+        file_path = os.path.join(pdf_service.upload_dir, f"{task.task_id}.pdf")
+        try:
+            os.replace(upload_path, file_path)
+        except OSError:
+            abandon_task(task.task_id, upload_path)
+            raise
+        
+        span.set_attributes(task_id=task.task_id, upload_bytes=len(content), pages=estimate["total_pages"])
     
     # 异步处理PDF
-    asyncio.create_task(pdf_service.process_pdf(task.task_id, file_path))
+    try:
+        await start_processing(task.task_id, file_path)
+    except Exception:
+        abandon_task(task.task_id, file_path)
+        raise
     
     return task
 
@@ -65,6 +235,8 @@ async def get_task_status(task_id: str):
     task = pdf_service.get_task_status(task_id)
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
+    if job_queue and task.status == TaskStatus.PENDING:
+        task.queue_position = await asyncio.to_thread(job_queue.position, task_id)
     return task
 
 @app.get("/tasks/{task_id}/result", response_model=Optional[TaskResult])
@@ -81,6 +253,89 @@ async def get_task_result(task_id: str):
         raise HTTPException(status_code=404, detail="Result not found or task not completed")
     return result
 
+@app.get("/tasks/{task_id}/profile", response_class=FileResponse)
+async def get_task_profile(task_id: str):
+    """
+    获取任务的采样剖析结果
+    
+    - **task_id**: 任务ID
+    
+    返回 folded stacks 文本（每行 `线程;外层帧;...;内层帧 次数`），
+    可用 flamegraph.pl、speedscope 或 inferno 生成火焰图；任务结束后生成
+    """
+    task = pdf_service.get_task_status(task_id)
+    if not task:
+        raise HTTPException(status_code=404, detail="Task not found")
+    
+    profile_path = pdf_service.profile_path(task_id)
+    if not task.profile or not os.path.exists(profile_path):
+        raise HTTPException(status_code=404, detail="Profile not found")
+    
+    return FileResponse(profile_path, media_type="text/plain", filename=f"{task_id}.folded")
+
+@app.post("/tasks/{task_id}/resume", response_model=TaskResponse)
+async def resume_task(task_id: str):
+    """
+    从检查点续跑任务
+
+    - **task_id**: 任务ID
+
+    只重新处理缺失或失败的页面，返回任务状态
+    """
+    task = pdf_service.get_task_status(task_id)
+    if not task:
+        raise HTTPException(status_code=404, detail="Task not found")
+
+    if task.status in [TaskStatus.CONVERTING, TaskStatus.ANALYZING]:
+        raise HTTPException(status_code=409, detail="Task is still running")
+
+    if task.status == TaskStatus.COMPLETED:
+        return task
+
+    if task.status == TaskStatus.CANCELLED:
+        raise HTTPException(status_code=409, detail="Task was cancelled")
+
+    file_path = os.path.join(pdf_service.upload_dir, f"{task_id}.pdf")
+    if not os.path.exists(file_path):
+        raise HTTPException(status_code=404, detail="PDF file not found")
+
+    try:
+        task = pdf_service.resume_task(task_id)
+    except AdmissionRejected as e:
+        raise saturated(e)
+    await start_processing(task_id, file_path, resume=True)
+
+    return task
+
+@app.delete("/tasks/{task_id}", response_model=TaskResponse)
+async def cancel_task(task_id: str):
+    """
+    取消任务
+
+    - **task_id**: 任务ID
+
+    停止渲染和进行中的模型调用，丢弃排队的页面，标记为 cancelled，并删除上传文件、页面图片和逐页结果。
+    任务由 worker 处理时写入取消标记，worker 在 1 秒内停止并清理，期间返回的状态可能仍为处理中。
+    已完成的任务返回 409。
+    """
+    task = pdf_service.get_task_status(task_id)
+    if not task:
+        raise HTTPException(status_code=404, detail="Task not found")
+
+    if task.status == TaskStatus.COMPLETED:
+        raise HTTPException(status_code=409, detail="Task is already completed")
+
+    if task.status == TaskStatus.CANCELLED:
+        return task
+
+    if job_queue:
+        pdf_service.checkpoints.request_cancel(task_id)
+        if not await asyncio.to_thread(job_queue.cancel, task_id):
+            # worker 正在处理，由其停止并清理
+            return task
+
+    return await pdf_service.cancel_task(task_id)
+
 @app.post("/convert/{task_id}", response_model=TaskResponse)
 async def convert_pdf(task_id: str = Path(..., description="任务ID")):
     """
@@ -125,13 +380,15 @@ async def get_page_image(task_id: str, page: int):
     return FileResponse(image_path)
 
 @app.post("/analyze/{task_id}/{page}", response_model=Dict)
-async def analyze_page(task_id: str, page: int):
+async def analyze_page(task_id: str, page: int, x_api_key: Optional[str] = Header(None)):
     """
     分析指定页面的内容
     
     - **task_id**: 任务ID
     - **page**: 页码
     
+    作为交互请求调度：模型调用优先于后台处理中的文档页面
+    
     返回分析结果
     """
     task = pdf_service.get_task_status(task_id)
@@ -145,9 +402,37 @@ async def analyze_page(task_id: str, page: int):
     if not os.path.exists(image_path):
         raise HTTPException(status_code=404, detail="Image not found")
     
-    result = await pdf_service.analyze_image(task_id, image_path, page - 1)
+    with scheduling(Priority.INTERACTIVE, tenant_id(x_api_key)):
+        result = await pdf_service.analyze_image(task_id, image_path, page - 1)
     return result
 
+@app.get("/metrics/usage", response_model=Dict[str, TokenUsage])
+async def get_usage(x_api_key: Optional[str] = Header(None)):
+    """
+    获取 token 用量和费用
+    
+    携带 X-API-Key 时只返回该租户的累计用量，否则返回全部租户（按 API key 哈希标识）
+    """
+    if x_api_key:
+        tenant = tenant_id(x_api_key)
+        return {tenant: pdf_service.usage.get(tenant)}
+    return pdf_service.usage.all()
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """
+    Prometheus 指标
+    
+    各阶段耗时直方图（上传、渲染、编码、模型调用、结果写入）、处理中和排队的页面数、
+    各状态的任务数，以及重试和限流次数
+    """
+    set_task_counts("pdf", pdf_service.tasks.values())
+    set_task_counts("pptx", pptx.pptx_service.tasks.values())
+    if job_queue:
+        JOB_QUEUE_DEPTH.set(await asyncio.to_thread(job_queue.depth))
+    body, content_type = render_latest()
+    return Response(content=body, media_type=content_type)
+
 @app.get("/")
 async def root():
     return {
@@ -0,0 +1,144 @@
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, Tuple
+
+from .models import TaskStatus
+
+try:
+    from prometheus_client import (
+        CONTENT_TYPE_LATEST, REGISTRY, Counter, Gauge, Histogram, generate_latest
+    )
+    PROMETHEUS_AVAILABLE = True
+except ImportError:
+    PROMETHEUS_AVAILABLE = False
+    CONTENT_TYPE_LATEST = "text/plain; version=0.0.4; charset=utf-8"
+    REGISTRY = None
+
+
+class _NoopMetric:
+    """未安装 prometheus_client 时的空实现，接口与 Counter/Gauge/Histogram 一致"""
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def labels(self, *args, **kwargs) -> "_NoopMetric":
+        return self
+
+    def inc(self, amount: float = 1):
+        pass
+
+    def dec(self, amount: float = 1):
+        pass
+
+    def set(self, value: float):
+        pass
+
+    def observe(self, value: float):
+        pass
+
+
+if not PROMETHEUS_AVAILABLE:
+    Counter = Gauge = Histogram = _NoopMetric
+
+# 秒级操作（上传、渲染、编码、写结果）和模型调用（数秒到数十秒）使用不同的分桶
+_FAST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+_MODEL_BUCKETS = (0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 15.0, 30.0, 60.0, 120.0, 300.0)
+
+UPLOAD_SECONDS = Histogram(
+    "docproc_upload_seconds", "接收并保存上传文件的耗时",
+    ["service"], buckets=_FAST_BUCKETS
+)
+RENDER_SECONDS = Histogram(
+    "docproc_render_page_seconds", "单页渲染（poppler）耗时",
+    buckets=_FAST_BUCKETS
+)
+ENCODE_SECONDS = Histogram(
+    "docproc_encode_seconds", "页面图片编码耗时",
+    buckets=_FAST_BUCKETS
+)
+MODEL_CALL_SECONDS = Histogram(
+    "docproc_model_call_seconds", "单次模型调用耗时（不含排队等待）",
+    ["prompt_type", "outcome"], buckets=_MODEL_BUCKETS
+)
+RESULT_WRITE_SECONDS = Histogram(
+    "docproc_result_write_seconds", "逐页结果写入检查点的耗时",
+    buckets=_FAST_BUCKETS
+)
+PAGES_IN_FLIGHT = Gauge(
+    "docproc_pages_in_flight", "正在处理的页面数", ["service"]
+)
+QUEUE_DEPTH = Gauge(
+    "docproc_queue_depth", "等待处理名额的页面数", ["service"]
+)
+SCHEDULER_WAIT_SECONDS = Histogram(
+    "docproc_scheduler_wait_seconds", "模型调用等待调度名额的时间", ["priority"],
+    buckets=(0.01, 0.05, 0.1) + _MODEL_BUCKETS
+)
+JOB_QUEUE_DEPTH = Gauge(
+    "docproc_job_queue_depth", "任务队列中等待 worker 领取的任务数"
+)
+ADMISSION_QUEUED = Gauge(
+    "docproc_admission_queued_tasks", "已接收、等待运行名额的任务数"
+)
+ADMISSION_REJECTED = Counter(
+    "docproc_admission_rejected_total", "系统饱和时拒绝的任务数", ["reason"]
+)
+TASKS = Gauge(
+    "docproc_tasks", "各状态的任务数", ["service", "status"]
+)
+MODEL_RETRIES = Counter(
+    "docproc_model_retries_total", "模型调用重试次数", ["prompt_type"]
+)
+RATE_LIMIT_HITS = Counter(
+    "docproc_rate_limit_hits_total", "模型调用被限流（429 / ResourceExhausted）的次数", ["prompt_type"]
+)
+EVENT_LOOP_LAG_SECONDS = Histogram(
+    "docproc_event_loop_lag_seconds", "事件循环延迟（定时器实际唤醒时间与预期的差值）",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+)
+EVENT_LOOP_BLOCKED = Counter(
+    "docproc_event_loop_blocked_total", "事件循环被阻塞超过阈值的次数"
+)
+
+
+@contextmanager
+def timed(metric):
+    """记录代码块的耗时（metric 为已绑定标签的 Histogram）"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metric.observe(time.perf_counter() - start)
+
+
+def is_rate_limited(error: Exception) -> bool:
+    """判断异常是否为限流（HTTP 429 / ResourceExhausted）"""
+    if type(error).__name__ in ("ResourceExhausted", "TooManyRequests"):
+        return True
+    if getattr(error, "code", None) == 429 or getattr(error, "status_code", None) == 429:
+        return True
+    message = str(error).lower()
+    return "429" in message or "rate limit" in message or "quota exceeded" in message
+
+
+def set_task_counts(service: str, tasks: Iterable[Dict]):
+    """按任务状态更新任务数量（在抓取时调用，避免在状态变更的热路径上维护计数）"""
+    counts = {status: 0 for status in TaskStatus}
+    for task in tasks:
+        status = task.get("status")
+        if status in counts:
+            counts[status] += 1
+    for status, count in counts.items():
+        TASKS.labels(service=service, status=status.value).set(count)
+
+
+def render_latest() -> Tuple[bytes, str]:
+    """
+    导出 Prometheus 文本格式的指标
+
+    Returns:
+        (响应体, Content-Type)；未安装 prometheus_client 时响应体为空
+    """
+    if not PROMETHEUS_AVAILABLE:
+        return b"", CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
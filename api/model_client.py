@@ -0,0 +1,272 @@
+import os
+import json
+import time
+import random
+import asyncio
+import threading
+import weakref
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+
+from .usage import IMAGE_TOKENS, estimate_tokens
+
+
+class ModelClient(ABC):
+    """
+    视觉模型调用接口
+
+    与 vertexai GenerativeModel 的调用方式一致（contents 为提示词和图片 Part 的列表），
+    PageAnalyzer 和命令行工具只依赖这个接口，可以替换为本地的 FakeModelClient 做离线压测。
+    """
+
+    @abstractmethod
+    async def generate_content_async(self, contents: List[Any], generation_config: Any = None, **kwargs) -> Any:
+        """异步调用模型，返回带 text 和 usage_metadata 属性的响应"""
+        pass
+
+    @abstractmethod
+    def generate_content(self, contents: List[Any], generation_config: Any = None, **kwargs) -> Any:
+        """同步调用模型"""
+        pass
+
+
+class VertexModelClient(ModelClient):
+    """Vertex AI Gemini 模型"""
+
+    def __init__(self,
+                 model_name: str = "gemini-1.5-pro-002",
+                 project_id: Optional[str] = None,
+                 location: Optional[str] = None):
+        import vertexai
+        from vertexai.generative_models import GenerativeModel
+
+        if project_id:
+            vertexai.init(project=project_id, location=location)
+        self.model_name = model_name
+        self.model = GenerativeModel(model_name)
+
+    async def generate_content_async(self, contents: List[Any], generation_config: Any = None, **kwargs) -> Any:
+        return await self.model.generate_content_async(contents, generation_config=generation_config, **kwargs)
+
+    def generate_content(self, contents: List[Any], generation_config: Any = None, **kwargs) -> Any:
+        return self.model.generate_content(contents, generation_config=generation_config, **kwargs)
+
+
+class FakeRateLimitError(Exception):
+    """模拟的限流错误（与 Vertex AI 的 429 ResourceExhausted 一样会被识别为限流）"""
+
+    code = 429
+
+
+class FakeModelError(Exception):
+    """模拟的服务端错误"""
+
+    code = 503
+
+
+@dataclass
+class LatencyModel:
+    """
+    调用耗时分布（秒）
+
+    - constant：固定为 mean
+    - uniform：[mean - spread, mean + spread] 均匀分布
+    - lognormal：中位数为 mean、对数标准差为 spread 的对数正态分布，模拟长尾
+    """
+    distribution: str = "lognormal"
+    mean: float = 0.05
+    spread: float = 0.5
+
+    @classmethod
+    def parse(cls, spec: str) -> "LatencyModel":
+        """解析 ``分布:均值[,离散度]``，如 ``lognormal:1.5,0.6``、``constant:0.2``"""
+        distribution, _, params = spec.partition(":")
+        values = [float(v) for v in params.split(",") if v]
+        return cls(distribution, *values)
+
+    def sample(self, rng: random.Random) -> float:
+        if self.distribution == "constant":
+            return self.mean
+        if self.distribution == "uniform":
+            return max(0.0, rng.uniform(self.mean - self.spread, self.mean + self.spread))
+        if self.distribution == "lognormal":
+            return rng.lognormvariate(0, self.spread) * self.mean
+        raise ValueError(f"Unknown latency distribution: {self.distribution}")
+
+
+class FakeModelClient(ModelClient):
+    """
+    本地模拟模型（不产生 Vertex 费用，用于压测和集成测试）
+
+    - 耗时按 latency 分布采样，可模拟并发上限（max_concurrency，超出时排队）
+    - 按比例注入限流（429）和服务端错误
+    - 按提示词长度和图片数计算输入 token，输出 output_tokens 个 token，写入 usage_metadata
+    - 生成配置要求 JSON 输出时返回符合 blocks schema 的内容
+    """
+
+    def __init__(self,
+                 latency: Optional[LatencyModel] = None,
+                 rate_limit_rate: float = 0.0,
+                 error_rate: float = 0.0,
+                 output_tokens: int = 400,
+                 max_concurrency: Optional[int] = None,
+                 seed: Optional[int] = None):
+        self.latency = latency or LatencyModel()
+        self.rate_limit_rate = rate_limit_rate
+        self.error_rate = error_rate
+        self.output_tokens = output_tokens
+        self.max_concurrency = max_concurrency
+        self._rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_concurrency) if max_concurrency else None
+        self._async_slots: "weakref.WeakKeyDictionary[Any, asyncio.Semaphore]" = weakref.WeakKeyDictionary()
+        self.calls = 0
+        self.rate_limited = 0
+        self.errors = 0
+        self.prompt_tokens = 0
+        self.candidates_tokens = 0
+
+    def _plan(self) -> tuple:
+        with self._rng_lock:
+            self.calls += 1
+            delay = self.latency.sample(self._rng)
+            roll = self._rng.random()
+            if roll < self.rate_limit_rate:
+                self.rate_limited += 1
+                # 限流通常很快返回
+                return delay / 10, FakeRateLimitError("429 Resource exhausted (fake)")
+            if roll < self.rate_limit_rate + self.error_rate:
+                self.errors += 1
+                return delay, FakeModelError("503 Service unavailable (fake)")
+        return delay, None
+
+    @staticmethod
+    def _is_json(generation_config: Any) -> bool:
+        if generation_config is None:
+            return False
+        if isinstance(generation_config, dict):
+            return generation_config.get("response_mime_type") == "application/json"
+        to_dict = getattr(generation_config, "to_dict", None)
+        return bool(to_dict) and to_dict().get("response_mime_type") == "application/json"
+
+    def _response(self, contents: List[Any], generation_config: Any) -> Any:
+        prompt_tokens = sum(
+            estimate_tokens(part) if isinstance(part, str) else IMAGE_TOKENS for part in contents
+        )
+        text = " ".join(["lorem"] * self.output_tokens)
+        if self._is_json(generation_config):
+            text = json.dumps({"blocks": [{"type": "paragraph", "text": text}]})
+        with self._rng_lock:
+            self.prompt_tokens += prompt_tokens
+            self.candidates_tokens += self.output_tokens
+        return SimpleNamespace(text=text, usage_metadata=SimpleNamespace(
+            prompt_token_count=prompt_tokens,
+            candidates_token_count=self.output_tokens,
+            cached_content_token_count=0,
+            total_token_count=prompt_tokens + self.output_tokens
+        ))
+
+    async def generate_content_async(self, contents: List[Any], generation_config: Any = None, **kwargs) -> Any:
+        delay, error = self._plan()
+        if self.max_concurrency:
+            # 模拟服务端并发上限（每个事件循环一个信号量）
+            loop = asyncio.get_running_loop()
+            slots = self._async_slots.setdefault(loop, asyncio.Semaphore(self.max_concurrency))
+            async with slots:
+                await asyncio.sleep(delay)
+        else:
+            await asyncio.sleep(delay)
+        if error:
+            raise error
+        return self._response(contents, generation_config)
+
+    def generate_content(self, contents: List[Any], generation_config: Any = None, **kwargs) -> Any:
+        delay, error = self._plan()
+        if self._slots:
+            self._slots.acquire()
+        try:
+            time.sleep(delay)
+        finally:
+            if self._slots:
+                self._slots.release()
+        if error:
+            raise error
+        return self._response(contents, generation_config)
+
+    def stats(self) -> Dict[str, int]:
+        """调用次数、注入的错误数和 token 累计"""
+        return {
+            "calls": self.calls,
+            "rate_limited": self.rate_limited,
+            "errors": self.errors,
+            "prompt_tokens": self.prompt_tokens,
+            "candidates_tokens": self.candidates_tokens
+        }
+
+
+def create_model_client(backend: str = "vertex",
+                        model_name: str = "gemini-1.5-pro-002",
+                        project_id: Optional[str] = None,
+                        location: Optional[str] = None,
+                        archive_path: Optional[str] = None,
+                        time_scale: float = 1.0,
+                        **fake_options) -> ModelClient:
+    """
+    按后端名称创建模型客户端
+
+    Args:
+        backend: ``vertex``、``fake``、``record``（调用 Vertex AI 并录制到 archive_path）
+            或 ``replay``（从 archive_path 回放，耗时乘以 time_scale）
+        fake_options: FakeModelClient 的参数（latency 可以是 LatencyModel 或 ``分布:均值,离散度`` 字符串）
+    """
+    if backend == "vertex":
+        return VertexModelClient(model_name, project_id=project_id, location=location)
+    if backend == "fake":
+        latency = fake_options.get("latency")
+        if isinstance(latency, str):
+            fake_options["latency"] = LatencyModel.parse(latency)
+        return FakeModelClient(**fake_options)
+    if backend in ("record", "replay"):
+        from .recording import RecordingModelClient, ReplayModelClient
+
+        if not archive_path:
+            raise ValueError(f"The {backend} backend requires an archive path")
+        if backend == "record":
+            return RecordingModelClient(
+                VertexModelClient(model_name, project_id=project_id, location=location), archive_path
+            )
+        return ReplayModelClient(archive_path, time_scale=time_scale)
+    raise ValueError(f"Unknown model backend: {backend}")
+
+
+def model_client_from_env(backend: Optional[str] = None) -> Optional[ModelClient]:
+    """
+    按环境变量创建模型客户端
+
+    - MODEL_BACKEND=fake：FakeModelClient，参数来自 FAKE_MODEL_LATENCY（如 ``lognormal:1.5,0.5``）、
+      FAKE_MODEL_RATE_LIMIT_RATE、FAKE_MODEL_ERROR_RATE 和 FAKE_MODEL_OUTPUT_TOKENS
+    - MODEL_BACKEND=record：调用 Vertex AI（GOOGLE_CLOUD_PROJECT / GOOGLE_CLOUD_LOCATION），
+      每次调用录制到 MODEL_ARCHIVE
+    - MODEL_BACKEND=replay：从 MODEL_ARCHIVE 回放，耗时乘以 REPLAY_TIME_SCALE（默认 1，0 为不等待）
+    - 使用 Vertex AI（默认）时返回 None，由服务按自己的项目配置创建 VertexModelClient
+
+    Args:
+        backend: 可选，覆盖 MODEL_BACKEND
+    """
+    backend = backend or os.getenv("MODEL_BACKEND", "vertex")
+    if backend == "vertex":
+        return None
+    return create_model_client(
+        backend,
+        model_name=os.getenv("VERTEX_MODEL_NAME", "gemini-1.5-pro-002"),
+        project_id=os.getenv("GOOGLE_CLOUD_PROJECT"),
+        location=os.getenv("GOOGLE_CLOUD_LOCATION", "us-central1"),
+        archive_path=os.getenv("MODEL_ARCHIVE"),
+        time_scale=float(os.getenv("REPLAY_TIME_SCALE", "1")),
+        latency=os.getenv("FAKE_MODEL_LATENCY", "lognormal:1.5,0.5"),
+        rate_limit_rate=float(os.getenv("FAKE_MODEL_RATE_LIMIT_RATE", "0")),
+        error_rate=float(os.getenv("FAKE_MODEL_ERROR_RATE", "0")),
+        output_tokens=int(os.getenv("FAKE_MODEL_OUTPUT_TOKENS", "400"))
+    )
@@ -10,10 +10,48 @@ class TaskStatus(str, Enum):
     ANALYZING = "analyzing"
     COMPLETED = "completed"
     FAILED = "failed"
+    CANCELLED = "cancelled"
+
+class PageType(str, Enum):
+    TEXT = "text"
+    TABLE = "table"
+    CHART = "chart"
+    BLANK = "blank"
+    MIXED = "mixed"
 
 class TaskCreate(BaseModel):
     file_name: str
 
+class RevisionSummary(BaseModel):
+    base_task_id: str
+    reused_pages: List[int]
+    recomputed_pages: List[int]
+
+class DedupSummary(BaseModel):
+    blank_pages: List[int]
+    duplicate_pages: Dict[int, int]
+    saved_calls: int
+
+class TokenUsage(BaseModel):
+    prompt_tokens: int = 0
+    output_tokens: int = 0
+    cached_tokens: int = 0  # 命中模型端缓存的输入 token（cached_content_token_count）
+    total_tokens: int = 0
+    model_calls: int = 0
+    cost: float = 0.0  # 美元
+
+class TaskTimeline(BaseModel):
+    queued_seconds: Optional[float] = None  # 创建到开始处理
+    render_seconds: Optional[float] = None  # 渲染和页面分类
+    analysis_seconds: Optional[float] = None  # 逐页分析（墙钟时间）
+    model_calls: int = 0
+    model_latency_min: Optional[float] = None  # 单次模型调用耗时（秒）
+    model_latency_median: Optional[float] = None
+    model_latency_p95: Optional[float] = None
+    retries: int = 0
+    bytes_uploaded: int = 0  # 发送给模型的提示词和图片字节数（含重试）
+    cache_hits: int = 0  # 命中结果缓存、未调用模型的次数
+
 class TaskResponse(BaseModel):
     task_id: str
     status: TaskStatus
@@ -22,12 +60,80 @@ class TaskResponse(BaseModel):
     file_name: str
     total_pages: Optional[int] = None
     current_page: Optional[int] = None
+    total_slides: Optional[int] = None
     error: Optional[str] = None
+    revision_of: Optional[str] = None
+    revision: Optional[RevisionSummary] = None
+    dedup: Optional[DedupSummary] = None
+    usage: Optional[TokenUsage] = None
+    estimated_tokens: Optional[int] = None
+    timeline: Optional[TaskTimeline] = None
+    profile: bool = False  # 是否开启采样剖析
+    queue_position: Optional[int] = None  # 排在前面等待的任务数（排队中时）
+    estimated_start: Optional[datetime] = None  # 排队中时的预计开始时间
+
+class ChartSeries(BaseModel):
+    name: Optional[str] = None
+    values: List[Optional[float]]
+
+class ChartData(BaseModel):
+    chart_type: Optional[str] = None
+    title: Optional[str] = None
+    categories: List[str] = []
+    series: List[ChartSeries] = []
+
+class BlockType(str, Enum):
+    HEADING = "heading"
+    PARAGRAPH = "paragraph"
+    LIST_ITEM = "list_item"
+    TABLE = "table"
+    CHART = "chart"
+    FIGURE = "figure"
+    HEADER = "header"
+    FOOTER = "footer"
+
+class ContentBlock(BaseModel):
+    type: BlockType
+    text: Optional[str] = None
+    level: Optional[int] = None
+    cells: Optional[List[List[str]]] = None  # 表格单元格，第一行为表头
+    chart: Optional[ChartData] = None
+
+class StructuredPage(BaseModel):
+    blocks: List[ContentBlock] = []
+
+class PageRegion(BaseModel):
+    region_type: PageType
+    bbox: List[int]  # [x0, y0, x1, y1]，页面图片像素坐标
+    content: str
+    structured: Optional[StructuredPage] = None
 
 class PageResult(BaseModel):
     page_number: int
     content: str
     confidence: float
+    page_type: Optional[PageType] = None
+    regions: Optional[List[PageRegion]] = None
+    structured: Optional[StructuredPage] = None
+    usage: Optional[TokenUsage] = None  # 复用其他页面或修订版本结果时为空
+
+class SlideResult(BaseModel):
+    slide_number: int
+    content: str
+    source: str  # text: 直接使用幻灯片文字; model: 调用视觉模型; blank: 空白页
+
+class BulletItem(BaseModel):
+    text: str
+    level: int
+
+class SlideContent(BaseModel):
+    slide_number: int
+    title: Optional[str] = None
+    bullets: List[BulletItem] = []
+    tables: List[List[List[str]]] = []
+    charts: List[ChartData] = []
+    needs_vision: bool = False  # 含图片或 SmartArt，需要渲染后由视觉模型处理
+    vision_content: Optional[str] = None
 
 class TaskResult(BaseModel):
     task_id: str
@@ -38,3 +144,7 @@ class TaskResult(BaseModel):
     created_at: datetime
     completed_at: Optional[datetime]
     error: Optional[str] = None
+    revision: Optional[RevisionSummary] = None
+    dedup: Optional[DedupSummary] = None
+    usage: Optional[TokenUsage] = None
+    timeline: Optional[TaskTimeline] = None
@@ -0,0 +1,365 @@
+import xml.etree.ElementTree as ET
+from typing import Dict, List, Optional, Tuple
+
+from PIL import Image, ImageChops, ImageFilter
+
+from .models import PageType
+from .page_hash import is_blank_page
+
+# 分析用缩略图的最大边长
+ANALYSIS_SIZE = 800
+# 墨迹阈值（灰度低于此值视为前景）
+INK_THRESHOLD = 170
+
+
+def _binarize(image: Image.Image) -> Image.Image:
+    """缩小并二值化页面：前景为255，背景为0"""
+    gray = image.convert("L")
+    gray.thumbnail((ANALYSIS_SIZE, ANALYSIS_SIZE))
+    return gray.point(lambda v: 255 if v < INK_THRESHOLD else 0)
+
+
+def _erode_line(binary: Image.Image, length: int, horizontal: bool) -> Image.Image:
+    """
+    线形腐蚀：只保留长度不小于 length 的水平（或垂直）前景段
+
+    保留的像素位于线段末端 length - 1 个像素之后（左/上端被截去）。
+    通过平移取最小值实现，每一步覆盖的窗口长度翻倍，只需 O(log length) 次图像运算。
+    """
+    eroded = binary
+    span = 1
+    while span < length:
+        step = min(span, length - span)
+        # offset 会把移出边界的像素卷回另一侧，需清零
+        if horizontal:
+            shifted = ImageChops.offset(eroded, step, 0)
+            shifted.paste(0, (0, 0, step, eroded.height))
+        else:
+            shifted = ImageChops.offset(eroded, 0, step)
+            shifted.paste(0, (0, 0, eroded.width, step))
+        eroded = ImageChops.darker(eroded, shifted)
+        span += step
+    return eroded
+
+
+def _projection(image: Image.Image, horizontal: bool) -> List[int]:
+    """按行（horizontal=True）或按列求前景的平均值"""
+    width, height = image.size
+    size = (1, height) if horizontal else (width, 1)
+    return list(image.resize(size, Image.BOX).tobytes())
+
+
+def _runs(profile: List[int]) -> List[Tuple[int, int]]:
+    """返回投影中连续非零区段 [start, end)"""
+    runs = []
+    start = None
+    for i, value in enumerate(profile + [0]):
+        if value and start is None:
+            start = i
+        elif not value and start is not None:
+            runs.append((start, i))
+            start = None
+    return runs
+
+
+def _thin_lines(profile: List[int], max_thickness: int = 4) -> List[Tuple[int, int]]:
+    """返回细线所在区段（较粗的区段是色块而不是表格线）"""
+    return [(start, end) for start, end in _runs(profile) if end - start <= max_thickness]
+
+
+def _layout_masks(image: Image.Image) -> Tuple[Image.Image, Image.Image, Image.Image, Image.Image]:
+    """
+    计算版式分析用的掩码（缩略图尺寸）
+
+    Returns:
+        (前景, 水平表格线, 垂直表格线, 图形区域)
+    """
+    binary = _binarize(image)
+    width, height = binary.size
+
+    # 表格线：水平线至少占页宽 25%，垂直线至少占页高 5%（高于任何文字笔画）
+    h_line_img = _erode_line(binary, max(2, width // 4), horizontal=True)
+    v_line_img = _erode_line(binary, max(2, height // 20), horizontal=False)
+
+    # 图形区域：腐蚀后仍存在的实心块，以及高饱和度的彩色像素
+    solid = binary.filter(ImageFilter.MinFilter(5))
+    saturation = image.convert("HSV").getchannel("S")
+    saturation.thumbnail((width, height))
+    colored = saturation.point(lambda v: 255 if v > 80 else 0)
+    graphic = ImageChops.lighter(solid, colored)
+
+    return binary, h_line_img, v_line_img, graphic
+
+
+def page_features(image: Image.Image) -> Dict:
+    """
+    计算页面版式特征
+
+    - blank: 是否空白页
+    - h_lines / v_lines: 表格线（细长的水平/垂直线）数量
+    - table_rows: 表格线围成的区域在纵向上的覆盖比例
+    - graphic_ratio: 实心色块或彩色区域占页面的比例（图表、图片）
+    - graphic_rows: 图形区域在纵向上的覆盖比例
+    - ink_ratio: 前景像素比例
+    - text_rows: 图形区域之外含有前景的行所占比例（正文密度）
+    """
+    if is_blank_page(image):
+        return {
+            "blank": True, "h_lines": 0, "v_lines": 0, "table_rows": 0.0, "graphic_ratio": 0.0,
+            "graphic_rows": 0.0, "ink_ratio": 0.0, "text_rows": 0.0
+        }
+
+    binary, h_line_img, v_line_img, graphic = _layout_masks(image)
+    width, height = binary.size
+
+    h_lines = _thin_lines(_projection(h_line_img, horizontal=True))
+    v_lines = _thin_lines(_projection(v_line_img, horizontal=False))
+    # 表格区域：第一条到最后一条水平线之间的行
+    table_rows = (h_lines[-1][1] - h_lines[0][0]) / height if len(h_lines) >= 2 else 0.0
+
+    # 正文：图形区域（略微膨胀）之外的前景像素
+    text = ImageChops.subtract(binary, graphic.filter(ImageFilter.MaxFilter(3)))
+
+    graphic_profile = _projection(graphic, horizontal=True)
+    text_profile = _projection(text, horizontal=True)
+    graphic_ratio = sum(graphic_profile) / (255 * height)
+    graphic_rows = sum(1 for v in graphic_profile if v > 5) / height
+    text_rows = sum(1 for v in text_profile if v) / height
+    ink_ratio = sum(_projection(binary, horizontal=True)) / (255 * height)
+
+    return {
+        "blank": False,
+        "h_lines": len(h_lines),
+        "v_lines": len(v_lines),
+        "table_rows": round(table_rows, 4),
+        "graphic_ratio": round(graphic_ratio, 4),
+        "graphic_rows": round(graphic_rows, 4),
+        "ink_ratio": round(ink_ratio, 4),
+        "text_rows": round(text_rows, 4)
+    }
+
+
+def classify_page(features: Dict, text: Optional[str] = None) -> PageType:
+    """
+    根据版式特征（以及可选的文字层）判断页面类型
+
+    Args:
+        features: page_features 的返回值
+        text: 页面文字层（PDF 文字层或幻灯片文字），没有时只依据图像
+    """
+    if features["blank"]:
+        # 扫描件可能图像为空但有文字层，这里只信任图像
+        return PageType.BLANK
+
+    is_table = features["h_lines"] >= 3 and features["v_lines"] >= 2
+    # 图形覆盖大半页面时多为封面、背景图，交给通用提示词处理
+    is_chart = 0.03 <= features["graphic_ratio"] <= 0.6
+
+    if is_table and is_chart:
+        return PageType.MIXED
+    if is_table:
+        # 表格单元格也是文字，只统计表格区域之外的文字行
+        prose_rows = features["text_rows"] - features["table_rows"]
+        return PageType.MIXED if prose_rows >= 0.25 else PageType.TABLE
+
+    # 正文密度：优先使用文字层，否则使用图形区域之外的文字行比例
+    if text is not None:
+        has_prose = len(text.strip()) >= 400
+    else:
+        has_prose = features["text_rows"] >= 0.25
+
+    if is_chart:
+        return PageType.MIXED if has_prose else PageType.CHART
+    if features["graphic_ratio"] > 0.6:
+        return PageType.MIXED
+    return PageType.TEXT
+
+
+def _xy_cut(mask: Image.Image, box: Tuple[int, int, int, int], depth: int = 0) -> List[Tuple[int, int, int, int]]:
+    """
+    XY 切分：按行、列投影的空白间隙递归切分掩码，返回各连通块的边界框
+    """
+    x0, y0, x1, y1 = box
+    region = mask.crop(box)
+    rows = _runs(_projection(region, horizontal=True))
+    blocks = []
+    for top, bottom in rows:
+        band = region.crop((0, top, x1 - x0, bottom))
+        for left, right in _runs(_projection(band, horizontal=False)):
+            blocks.append((x0 + left, y0 + top, x0 + right, y0 + bottom))
+
+    if depth >= 4 or blocks == [box]:
+        return blocks
+    result = []
+    for block in blocks:
+        if block == box:
+            result.append(block)
+        else:
+            result.extend(_xy_cut(mask, block, depth + 1))
+    return result
+
+
+def _merge_boxes(boxes: List[Tuple[int, int, int, int]], gap: int) -> List[Tuple[int, int, int, int]]:
+    """合并相交或间距不超过 gap 的边界框（例如同一柱状图中分开的柱子）"""
+    boxes = list(boxes)
+    merged = True
+    while merged:
+        merged = False
+        for i in range(len(boxes)):
+            for j in range(i + 1, len(boxes)):
+                a, b = boxes[i], boxes[j]
+                if (a[0] - gap <= b[2] and b[0] - gap <= a[2]
+                        and a[1] - gap <= b[3] and b[1] - gap <= a[3]):
+                    boxes[i] = (min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3]))
+                    del boxes[j]
+                    merged = True
+                    break
+            if merged:
+                break
+    return boxes
+
+
+def _table_boxes(h_line_img: Image.Image, v_line_img: Image.Image) -> List[Tuple[int, int, int, int]]:
+    """根据表格线定位表格：相邻水平线间距较小的归为同一表格，且需有垂直线穿过"""
+    width, height = h_line_img.size
+    # 线形腐蚀截去了水平线左端，需要补回
+    h_trim = max(2, width // 4) - 1
+    h_lines = _thin_lines(_projection(h_line_img, horizontal=True))
+
+    groups: List[List[Tuple[int, int]]] = []
+    for line in h_lines:
+        if groups and line[0] - groups[-1][-1][1] <= height // 5:
+            groups[-1].append(line)
+        else:
+            groups.append([line])
+
+    boxes = []
+    for group in groups:
+        if len(group) < 2:
+            continue
+        top, bottom = group[0][0], group[-1][1]
+        v_lines = _thin_lines(_projection(v_line_img.crop((0, top, width, bottom)), horizontal=False))
+        if len(v_lines) < 2:
+            continue
+        columns = _runs(_projection(h_line_img.crop((0, top, width, bottom)), horizontal=False))
+        boxes.append((max(0, columns[0][0] - h_trim), top, columns[-1][1], bottom))
+    return boxes
+
+
+def detect_regions(image: Image.Image,
+                   min_area: float = 0.02,
+                   max_area: float = 0.6,
+                   margin: float = 0.02) -> List[Dict]:
+    """
+    检测页面中的表格和图表区域
+
+    表格由表格线围成；图表为表格之外的图形区域（膨胀后合并相邻的柱、扇区和图例），
+    边界框向外扩展 margin 以包含坐标轴标签。覆盖大半页面的背景、贯穿整页的侧边栏
+    和细长的标题栏视为装饰，不作为区域。
+
+    Args:
+        image: 页面图片
+        min_area: 图表区域的最小面积（占页面比例）
+        max_area: 图表区域的最大面积（占页面比例）
+        margin: 边界框外扩比例
+
+    Returns:
+        List[Dict]: [{"region_type": "table" | "chart", "bbox": [x0, y0, x1, y1]}]，
+        坐标为原图像素，按从上到下、从左到右排序
+    """
+    if is_blank_page(image):
+        return []
+
+    _, h_line_img, v_line_img, graphic = _layout_masks(image)
+    width, height = graphic.size
+    scale = image.width / width
+
+    regions = [("table", box) for box in _table_boxes(h_line_img, v_line_img)]
+
+    # 表格之外的图形区域，加上坐标轴等长线（用于连接同一图表中分开的柱子）
+    h_trim = max(2, width // 4) - 1
+    axes = h_line_img.filter(ImageFilter.MaxFilter(3))
+    axes = ImageChops.lighter(axes, ImageChops.offset(axes, -h_trim, 0))
+    charts = ImageChops.lighter(graphic, axes)
+    for _, box in regions:
+        charts.paste(0, box)
+    charts = charts.filter(ImageFilter.MaxFilter(9))
+
+    boxes = _merge_boxes(_xy_cut(charts, (0, 0, width, height)), gap=max(width, height) // 50)
+    for box in boxes:
+        box_width, box_height = box[2] - box[0], box[3] - box[1]
+        area = box_width * box_height / (width * height)
+        if not min_area <= area <= max_area:
+            continue
+        # 贯穿整页的侧边栏、细长的标题栏属于装饰
+        if box_width >= 0.9 * width or box_height >= 0.9 * height:
+            continue
+        if max(box_width / box_height, box_height / box_width) > 5:
+            continue
+        regions.append(("chart", box))
+
+    pad_x, pad_y = int(width * margin), int(height * margin)
+    result = []
+    for region_type, (x0, y0, x1, y1) in sorted(regions, key=lambda r: (r[1][1], r[1][0])):
+        bbox = (
+            max(0, x0 - pad_x), max(0, y0 - pad_y),
+            min(width, x1 + pad_x), min(height, y1 + pad_y)
+        )
+        result.append({
+            "region_type": region_type,
+            "bbox": [min(round(v * scale), limit) for v, limit in
+                     zip(bbox, (image.width, image.height, image.width, image.height))]
+        })
+    return result
+
+
+# 文字层的版式：段落 -> 行 -> 单词 (xMin, yMin, xMax, yMax, 文字)，坐标单位为 PDF 点
+TextLayout = List[List[List[Tuple[float, float, float, float, str]]]]
+
+
+def parse_text_layout(xhtml: str) -> TextLayout:
+    """解析 ``pdftotext -bbox-layout`` 输出的 XHTML"""
+    blocks = []
+    for block in ET.fromstring(xhtml).iter():
+        if not block.tag.endswith("block"):
+            continue
+        lines = []
+        for line in block:
+            if not line.tag.endswith("line"):
+                continue
+            words = [
+                (float(word.get("xMin")), float(word.get("yMin")),
+                 float(word.get("xMax")), float(word.get("yMax")), word.text or "")
+                for word in line if word.tag.endswith("word")
+            ]
+            if words:
+                lines.append(words)
+        if lines:
+            blocks.append(lines)
+    return blocks
+
+
+def text_outside_regions(layout: TextLayout, regions: List[Dict], scale: float) -> str:
+    """
+    文字层中位于各区域之外的文字（单词中心落在区域内的视为区域的文字）
+
+    Args:
+        layout: 文字层版式（见 parse_text_layout）
+        regions: 检测到的区域（见 detect_regions），坐标为页面图片像素
+        scale: 每个 PDF 点对应的图片像素数（渲染 dpi / 72）
+
+    Returns:
+        行内单词以空格连接、段落之间空一行的文字
+    """
+    def outside(word) -> bool:
+        x = (word[0] + word[2]) / 2 * scale
+        y = (word[1] + word[3]) / 2 * scale
+        return not any(x0 <= x <= x1 and y0 <= y <= y1 for x0, y0, x1, y1 in (r["bbox"] for r in regions))
+
+    paragraphs = []
+    for block in layout:
+        lines = [" ".join(word[4] for word in line if outside(word)) for line in block]
+        text = "\n".join(line for line in lines if line)
+        if text:
+            paragraphs.append(text)
+    return "\n\n".join(paragraphs)
@@ -0,0 +1,69 @@
+import hashlib
+from typing import Dict, Union
+
+from PIL import Image, ImageStat
+
+
+def content_hash(image: Image.Image) -> str:
+    """
+    计算页面图片的内容哈希（像素级精确）
+
+    同一渲染器对未修改的页面会输出完全相同的像素，
+    因此内容哈希相同即可安全复用该页的分析结果。
+    """
+    digest = hashlib.sha256()
+    digest.update(f"{image.mode}:{image.size[0]}x{image.size[1]}".encode())
+    digest.update(image.tobytes())
+    return digest.hexdigest()
+
+
+def perceptual_hash(image: Image.Image, hash_size: int = 8) -> str:
+    """
+    计算页面图片的感知哈希（dHash）
+
+    将图片缩小为 (hash_size + 1) x hash_size 的灰度图，比较相邻像素的明暗关系，
+    对轻微的渲染差异不敏感，用于相似页面的匹配。
+    """
+    small = image.convert("L").resize((hash_size + 1, hash_size), Image.LANCZOS)
+    pixels = small.tobytes()
+
+    value = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+
+    return f"{value:0{hash_size * hash_size // 4}x}"
+
+
+def hamming_distance(hash_a: str, hash_b: str) -> int:
+    """计算两个十六进制感知哈希之间的汉明距离"""
+    return bin(int(hash_a, 16) ^ int(hash_b, 16)).count("1")
+
+
+def is_blank_page(image: Image.Image, max_stddev: float = 3.0) -> bool:
+    """
+    判断是否为空白页
+
+    将页面缩小后计算灰度标准差，纯色页面（白页、纯色分隔页）的标准差接近0。
+    """
+    small = image.convert("L")
+    small.thumbnail((256, 256))
+    return ImageStat.Stat(small).stddev[0] <= max_stddev
+
+
+def fingerprint_page(image: Image.Image) -> Dict[str, Union[str, bool]]:
+    """
+    计算页面指纹
+
+    - content_hash: 内容哈希，用于跨版本精确复用
+    - perceptual_hash: 8x8 感知哈希，用于相似文档匹配
+    - dedup_hash: 16x16 感知哈希，用于文档内近似重复页检测
+    - blank: 是否为空白页
+    """
+    return {
+        "content_hash": content_hash(image),
+        "perceptual_hash": perceptual_hash(image),
+        "dedup_hash": perceptual_hash(image, hash_size=16),
+        "blank": is_blank_page(image)
+    }
@@ -0,0 +1,184 @@
+import os
+import sys
+import asyncio
+import threading
+import weakref
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import Callable, Dict, List, Optional
+
+# 当前上下文所属的任务剖析（由任务协程创建的子任务和提交给渲染线程池的调用继承）
+_active_profiler: ContextVar[Optional["TaskProfiler"]] = ContextVar("active_profiler", default=None)
+
+
+class TaskProfiler:
+    """
+    单个任务的采样剖析
+
+    后台线程每 interval 秒读取一次各线程的调用栈（sys._current_frames），只保留属于本任务的样本：
+    - 事件循环线程：正在运行的 asyncio 任务由本任务创建（经任务工厂登记）
+    - 渲染线程池：正在执行本任务提交的调用（经 bind_worker 登记）
+
+    等待模型响应等不占用线程的时间不会被采样。结果以 folded stacks 格式写入 output_path
+    （每行 ``线程;外层帧;...;内层帧 次数``），可直接用 flamegraph.pl、speedscope 或 inferno 生成火焰图。
+
+    Args:
+        output_path: 结果文件路径
+        interval: 采样间隔（秒）
+    """
+
+    def __init__(self, output_path: str, interval: float = 0.01):
+        self.output_path = output_path
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._tasks: "weakref.WeakSet[asyncio.Task]" = weakref.WeakSet()
+        self._worker_threads: Dict[int, int] = {}
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._sampler: Optional[threading.Thread] = None
+
+    def start(self):
+        """开始采样（需在任务的协程中调用，当前 asyncio 任务作为根任务登记）"""
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        _install_task_factory(self._loop)
+        self._tasks.add(asyncio.current_task())
+        self._sampler = threading.Thread(target=self._sample_loop, name="task-profiler", daemon=True)
+        self._sampler.start()
+
+    def stop(self):
+        """停止采样并写入结果"""
+        self._stopped.set()
+        if self._sampler is not None:
+            self._sampler.join(timeout=1.0)
+            self._sampler = None
+        self.write()
+
+    def register_task(self, task: asyncio.Task):
+        self._tasks.add(task)
+
+    def _enter_worker(self):
+        ident = threading.get_ident()
+        with self._lock:
+            self._worker_threads[ident] = self._worker_threads.get(ident, 0) + 1
+
+    def _exit_worker(self):
+        ident = threading.get_ident()
+        with self._lock:
+            remaining = self._worker_threads.get(ident, 1) - 1
+            if remaining:
+                self._worker_threads[ident] = remaining
+            else:
+                self._worker_threads.pop(ident, None)
+
+    def _sample_loop(self):
+        while not self._stopped.wait(self.interval):
+            self.sample()
+
+    def sample(self):
+        """采样一次"""
+        frames = sys._current_frames()
+        loop_frame = frames.get(self._loop_thread_id)
+        if loop_frame is not None:
+            task = asyncio.current_task(self._loop)
+            if task is not None and task in self._tasks:
+                self.samples[_fold("event-loop", loop_frame)] += 1
+        with self._lock:
+            worker_threads = list(self._worker_threads)
+        for ident in worker_threads:
+            frame = frames.get(ident)
+            if frame is not None:
+                self.samples[_fold("render-worker", frame)] += 1
+
+    def folded(self) -> List[str]:
+        """folded stacks 格式的样本，按次数降序"""
+        return [f"{stack} {count}" for stack, count in self.samples.most_common()]
+
+    def write(self):
+        os.makedirs(os.path.dirname(self.output_path) or ".", exist_ok=True)
+        with open(self.output_path, "w", encoding="utf-8") as f:
+            for line in self.folded():
+                f.write(line + "\n")
+
+
+def _fold(thread: str, frame) -> str:
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    names.append(thread)
+    return ";".join(reversed(names))
+
+
+def _install_task_factory(loop: asyncio.AbstractEventLoop):
+    """
+    在事件循环上安装任务工厂：剖析期间由任务协程创建的子任务（gather、create_task）登记到所属的剖析
+
+    保留已有的任务工厂；只安装一次，未开启剖析时只多一次 ContextVar 读取
+    """
+    previous = loop.get_task_factory()
+    if getattr(previous, "_profiling", False):
+        return
+
+    def factory(loop, coro, context=None, **kwargs):
+        if context is not None:
+            kwargs["context"] = context
+        if previous is not None:
+            task = previous(loop, coro, **kwargs)
+        else:
+            task = asyncio.Task(coro, loop=loop, **kwargs)
+        profiler = context.get(_active_profiler) if context is not None else _active_profiler.get()
+        if profiler is not None:
+            profiler.register_task(task)
+        return task
+
+    factory._profiling = True
+    loop.set_task_factory(factory)
+
+
+@contextmanager
+def profile_task(output_path: Optional[str], interval: float = 0.01):
+    """
+    在任务协程中剖析代码块，结束时写入 output_path；output_path 为 None 时不做任何事
+
+    用法：
+        with profile_task(os.path.join(output_dir, task_id, "profile.folded")):
+            await ...
+    """
+    if output_path is None:
+        yield None
+        return
+    profiler = TaskProfiler(output_path, interval)
+    token = _active_profiler.set(profiler)
+    profiler.start()
+    try:
+        yield profiler
+    finally:
+        _active_profiler.reset(token)
+        profiler.stop()
+
+
+def bind_worker(func: Callable) -> Callable:
+    """
+    提交给线程池的调用在剖析期间登记执行线程，使渲染、编码等线程中的耗时计入所属任务
+
+    在事件循环线程中（提交前）调用；当前上下文没有剖析时原样返回 func
+    """
+    profiler = _active_profiler.get()
+    if profiler is None:
+        return func
+
+    @wraps(func)
+    def run(*args, **kwargs):
+        profiler._enter_worker()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            profiler._exit_worker()
+
+    return run
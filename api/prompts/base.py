@@ -1,19 +1,95 @@
 from abc import ABC, abstractmethod
-from typing import Dict, Any, Optional
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
+
+def _freeze(value: Any) -> Any:
+    """将参数转换为可哈希的形式（列表转元组、字典转排序后的元组）"""
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    return value
 
 class BasePrompt(ABC):
-    """提示词基类"""
+    """
+    提示词基类
+    
+    提示词分为两部分：
+    - 静态前缀：任务说明和输出要求，只依赖任务级参数（语言、结构化输出等），
+      首次使用时构建并缓存
+    - 动态后缀：页码等逐页变化的参数（dynamic_params 中列出），拼接在前缀之后
+    
+    get_prompt 按参数缓存渲染结果，逐页调用几乎没有开销。
+    """
+    
+    # 逐页变化的参数，只影响动态后缀
+    dynamic_params: Tuple[str, ...] = ()
+    # 渲染结果缓存的条目上限
+    cache_size: int = 1024
     
     @abstractmethod
-    def get_prompt(self, **kwargs) -> str:
-        """获取提示词"""
+    def build_prefix(self, **kwargs) -> str:
+        """构建静态前缀（不会收到 dynamic_params 中的参数）"""
         pass
     
+    def build_suffix(self, **kwargs) -> str:
+        """构建动态后缀（只会收到 dynamic_params 中的参数）"""
+        return ""
+    
     @abstractmethod
     def get_generation_config(self) -> Dict[str, Any]:
         """获取生成配置"""
         pass
     
+    def _split_params(self, kwargs: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        static = {k: v for k, v in kwargs.items() if k not in self.dynamic_params}
+        dynamic = {k: v for k, v in kwargs.items() if k in self.dynamic_params}
+        return static, dynamic
+    
+    def _memoize(self, namespace: str, params: Dict[str, Any], build) -> Any:
+        cache = self.__dict__.setdefault("_render_cache", OrderedDict())
+        key = (namespace, _freeze(params))
+        value = cache.get(key)
+        if value is None:
+            value = build()
+            cache[key] = value
+            while len(cache) > self.cache_size:
+                cache.popitem(last=False)
+        else:
+            cache.move_to_end(key)
+        return value
+    
+    def get_prefix(self, **kwargs) -> str:
+        """获取静态前缀（按任务级参数缓存）"""
+        static, _ = self._split_params(kwargs)
+        return self._memoize("prefix", static, lambda: self.build_prefix(**static))
+    
+    def get_suffix(self, **kwargs) -> str:
+        """获取动态后缀"""
+        _, dynamic = self._split_params(kwargs)
+        return self._memoize("suffix", dynamic, lambda: self.build_suffix(**dynamic))
+    
+    def get_prompt(self, **kwargs) -> str:
+        """获取提示词（静态前缀 + 动态后缀，按参数缓存）"""
+        return self._memoize(
+            "prompt", kwargs, lambda: self.get_prefix(**kwargs) + self.get_suffix(**kwargs)
+        )
+    
+    def get_response_schema(self) -> Optional[Dict[str, Any]]:
+        """获取结构化输出的响应 schema，不支持结构化输出时返回 None"""
+        return None
+    
+    def get_structured_generation_config(self) -> Optional[Dict[str, Any]]:
+        """获取结构化输出（JSON + 响应 schema）的生成配置"""
+        schema = self.get_response_schema()
+        if schema is None:
+            return None
+        return {
+            **self.get_generation_config(),
+            "response_mime_type": "application/json",
+            "response_schema": schema
+        }
+    
     def get_stop_sequences(self) -> Optional[list]:
         """获取停止序列"""
         return None
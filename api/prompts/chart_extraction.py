@@ -1,92 +1,101 @@
-from typing import Dict, Any, Optional, List
+from functools import lru_cache
+from typing import Dict, Any, Optional, List, Tuple
 from .base import BasePrompt
+from .schema import blocks_schema
+
+@lru_cache(maxsize=256)
+def _parse_chart_types(chart_type: str) -> Tuple[str, ...]:
+    """解析图表类型字符串，复合图表（如“饼图+柱状图”）拆分为多个类型"""
+    if "+" in chart_type:
+        return tuple(t.strip() for t in chart_type.replace("（", "").replace("）", "").split("+"))
+    return (chart_type,)
+
+def _chart_specific_prompt(chart_type: str, chart_type_prompts: Dict[str, str]) -> str:
+    prompts = [chart_type_prompts[ct] for ct in _parse_chart_types(chart_type) if ct in chart_type_prompts]
+    return "\n".join(prompts)
 
 class ChartExtractionPrompt(BasePrompt):
     """复杂图表和数据提取提示词"""
     
-    def __init__(self):
-        # 预定义的图表类型及其特定提示词
-        self.chart_type_prompts = {
-            "饼图": """
-            - 提取各个扇区的具体数值和百分比
-            - 识别扇区的标签和说明
-            - 注意扇区的颜色编码
-            - 计算并验证总和是否为100%
-            """,
-            "时间线": """
-            - 按时间顺序提取所有事件
-            - 保留具体的日期和时间点
-            - 注意事件之间的间隔和关系
-            - 提取每个时间点的关键信息
-            """,
-            "柱状图": """
-            - 提取每个柱子的具体数值
-            - 识别X轴和Y轴的标签
-            - 注意数值单位和比例
-            - 对比不同柱子之间的关系
-            """
-        }
-        
-        # 预定义的结构化输出格式
-        self.output_formats = {
-            "json": """
-            以JSON格式输出，包含以下结构：
-            {
-                "title": "图表标题",
-                "type": "图表类型",
-                "data": {
-                    // 具体数据
-                },
-                "metadata": {
-                    // 额外信息
-                }
+    # 预定义的图表类型及其特定提示词
+    chart_type_prompts = {
+        "饼图": """
+        - 提取各个扇区的具体数值和百分比
+        - 识别扇区的标签和说明
+        - 注意扇区的颜色编码
+        - 计算并验证总和是否为100%
+        """,
+        "时间线": """
+        - 按时间顺序提取所有事件
+        - 保留具体的日期和时间点
+        - 注意事件之间的间隔和关系
+        - 提取每个时间点的关键信息
+        """,
+        "柱状图": """
+        - 提取每个柱子的具体数值
+        - 识别X轴和Y轴的标签
+        - 注意数值单位和比例
+        - 对比不同柱子之间的关系
+        """
+    }
+    
+    # 预定义的结构化输出格式
+    output_formats = {
+        "json": """
+        以JSON格式输出，包含以下结构：
+        {
+            "title": "图表标题",
+            "type": "图表类型",
+            "data": {
+                // 具体数据
+            },
+            "metadata": {
+                // 额外信息
             }
-            """,
-            "table": """
-            以表格形式输出，包含以下列：
-            - 类别/时间
-            - 数值
-            - 占比
-            - 说明
-            """
         }
+        """,
+        "table": """
+        以表格形式输出，包含以下列：
+        - 类别/时间
+        - 数值
+        - 占比
+        - 说明
+        """,
+        "schema": """
+        按阅读顺序输出内容块：
+        - 标题输出为 heading 块，文字说明输出为 paragraph 或 list_item 块
+        - 每个图表输出一个 chart 块，在 chart 中给出类型、标题、类别和各数据系列的数值
+        - 表格输出为 table 块，cells 第一行为表头
+        - 只填写与块类型相关的字段
+        """
+    }
+    
+    # 逐页变化的参数（如已提取的幻灯片文字）
+    dynamic_params = ('additional_instructions',)
     
     def _get_chart_specific_prompt(self, chart_type: str) -> str:
-        """获取特定图表类型的提示词"""
-        prompts = []
-        if "+" in chart_type:
-            # 处理复合图表
-            chart_types = [t.strip() for t in chart_type.replace("（", "").replace("）", "").split("+")]
-            for ct in chart_types:
-                if ct in self.chart_type_prompts:
-                    prompts.append(self.chart_type_prompts[ct])
-        else:
-            # 单一图表类型
-            if chart_type in self.chart_type_prompts:
-                prompts.append(self.chart_type_prompts[chart_type])
-        
-        return "\n".join(prompts) if prompts else ""
+        """获取特定图表类型的提示词（按图表类型缓存解析结果）"""
+        return _chart_specific_prompt(chart_type, self.chart_type_prompts)
     
     def _get_output_format_prompt(self, format_type: str) -> str:
         """获取输出格式的提示词"""
         return self.output_formats.get(format_type, self.output_formats["json"])
     
-    def get_prompt(self, **kwargs) -> str:
+    def build_prefix(self, **kwargs) -> str:
         """
-        获取图表提取的提示词
+        构建图表提取提示词的静态前缀
         
         参数:
             chart_type: 图表类型（如：饼图、时间线等）
             language: 语言（默认中文）
             structure_format: 输出结构格式（json, table等）
             focus_points: 需要特别关注的点（列表）
-            additional_instructions: 额外的具体说明
+            structured: 是否按响应 schema 输出内容块（覆盖 structure_format）
         """
         chart_type = kwargs.get('chart_type', '未指定')
         language = kwargs.get('language', '中文')
-        structure_format = kwargs.get('structure_format', 'json')
+        structure_format = 'schema' if kwargs.get('structured') else kwargs.get('structure_format', 'json')
         focus_points = kwargs.get('focus_points', [])
-        additional_instructions = kwargs.get('additional_instructions', '')
         
         # 获取图表特定的提示词
         chart_specific_prompt = self._get_chart_specific_prompt(chart_type)
@@ -124,12 +133,20 @@ class ChartExtractionPrompt(BasePrompt):
 
 {focus_points_prompt}
 
-{additional_instructions}
-
 语言要求：{language}"""
 
         return base_prompt
     
+    def build_suffix(self, **kwargs) -> str:
+        """
+        构建额外说明（如已提取的幻灯片文字）
+        
+        参数:
+            additional_instructions: 额外的具体说明
+        """
+        additional_instructions = kwargs.get('additional_instructions', '')
+        return f"\n\n{additional_instructions}" if additional_instructions else ""
+    
     def get_generation_config(self) -> Dict[str, Any]:
         """获取生成配置"""
         return {
@@ -139,6 +156,10 @@ class ChartExtractionPrompt(BasePrompt):
             "top_k": 40
         }
     
+    def get_response_schema(self) -> Optional[Dict[str, Any]]:
+        """获取响应 schema：图表块、表格块和文字说明"""
+        return blocks_schema(["heading", "paragraph", "list_item", "chart", "table"])
+    
     def get_stop_sequences(self) -> Optional[list]:
         """获取停止序列"""
         return None
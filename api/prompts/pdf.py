@@ -1,27 +1,12 @@
 from typing import Dict, Any, Optional
 from .base import BasePrompt
+from .schema import blocks_schema
 
 class PDFExtractionPrompt(BasePrompt):
     """PDF文本提取提示词"""
     
-    def get_prompt(self, **kwargs) -> str:
-        """
-        获取PDF文本提取的提示词
-        
-        参数:
-            page_number: 当前页码
-            total_pages: 总页数
-            document_type: 文档类型（可选）
-            language: 语言（可选）
-        """
-        page_info = ""
-        if 'page_number' in kwargs and 'total_pages' in kwargs:
-            page_info = f"\n当前是第 {kwargs['page_number']} 页，共 {kwargs['total_pages']} 页。"
-            
-        language_info = f"\n文档语言：{kwargs.get('language', '未指定')}"
-        doc_type_info = f"\n文档类型：{kwargs.get('document_type', '未指定')}"
-        
-        base_prompt = """请仔细分析这个图片，它是一个PDF文档的页面。请提取所有可见的文本内容，保持原有的格式和结构。
+    # 静态部分在类定义时构建一次
+    TEXT_INSTRUCTIONS = """请仔细分析这个图片，它是一个PDF文档的页面。请提取所有可见的文本内容，保持原有的格式和结构。
 
 任务要求：
 1. 保持段落的原有结构和格式
@@ -44,8 +29,47 @@ class PDFExtractionPrompt(BasePrompt):
 3. 图表：描述图表类型和主要内容
 4. 页眉页脚：单独一行标注
 5. 水印：忽略处理"""
+    
+    # 结构化输出模式（输出格式由响应 schema 约束）
+    STRUCTURED_INSTRUCTIONS = """请仔细分析这个图片，它是一个PDF文档的页面。按阅读顺序把页面内容拆分为内容块输出。
+
+内容块要求：
+1. heading：标题，level 表示层级（1 为最高）
+2. paragraph：段落正文，一个段落一个块
+3. list_item：列表项，level 表示缩进层级（0 为顶层）
+4. table：表格，cells 为单元格二维数组，第一行为表头，合并单元格在合并范围内重复内容
+5. chart：图表，chart 中给出类型、标题、类别和各数据系列的数值
+6. figure：图片，text 为简要描述
+7. header / footer：页眉、页脚、页码
+8. 只填写与块类型相关的字段，不要重复输出同一内容，忽略水印"""
+    
+    dynamic_params = ('page_number', 'total_pages')
+    
+    def build_prefix(self, **kwargs) -> str:
+        """
+        构建PDF文本提取提示词的静态前缀
         
-        return base_prompt + page_info + language_info + doc_type_info
+        参数:
+            document_type: 文档类型（可选）
+            language: 语言（可选）
+            structured: 是否按响应 schema 输出内容块（可选）
+        """
+        instructions = self.STRUCTURED_INSTRUCTIONS if kwargs.get('structured') else self.TEXT_INSTRUCTIONS
+        language_info = f"\n文档语言：{kwargs.get('language', '未指定')}"
+        doc_type_info = f"\n文档类型：{kwargs.get('document_type', '未指定')}"
+        return instructions + language_info + doc_type_info
+    
+    def build_suffix(self, **kwargs) -> str:
+        """
+        构建页码信息
+        
+        参数:
+            page_number: 当前页码
+            total_pages: 总页数
+        """
+        if 'page_number' in kwargs and 'total_pages' in kwargs:
+            return f"\n当前是第 {kwargs['page_number']} 页，共 {kwargs['total_pages']} 页。"
+        return ""
     
     def get_generation_config(self) -> Dict[str, Any]:
         """获取生成配置"""
@@ -56,6 +80,10 @@ class PDFExtractionPrompt(BasePrompt):
             "top_k": 40
         }
     
+    def get_response_schema(self) -> Optional[Dict[str, Any]]:
+        """获取响应 schema：全部内容块类型"""
+        return blocks_schema()
+    
     def get_stop_sequences(self) -> Optional[list]:
         """获取停止序列"""
         return None
@@ -68,21 +96,7 @@ class PDFExtractionPrompt(BasePrompt):
 class PDFTableExtractionPrompt(BasePrompt):
     """PDF表格提取提示词"""
     
-    def get_prompt(self, **kwargs) -> str:
-        """
-        获取PDF表格提取的提示词
-        
-        参数:
-            table_context: 表格上下文信息
-            expected_columns: 预期的列名列表
-        """
-        context = kwargs.get('table_context', '')
-        columns = kwargs.get('expected_columns', [])
-        columns_info = f"\n预期列名: {', '.join(columns)}" if columns else ""
-        
-        return f"""请分析图片中的表格，并提取其中的数据。{context}{columns_info}
-
-任务要求：
+    TEXT_INSTRUCTIONS = """任务要求：
 1. 识别表格的结构（行数、列数）
 2. 提取表头信息
 3. 提取每个单元格的内容
@@ -104,6 +118,37 @@ class PDFTableExtractionPrompt(BasePrompt):
 3. 标注任何无法识别的内容
 4. 处理表格中的特殊字符"""
     
+    STRUCTURED_INSTRUCTIONS = """输出要求：
+1. 每个表格输出一个 table 块，cells 为单元格二维数组，第一行为表头
+2. 合并单元格在合并范围内重复内容，空单元格使用空字符串
+3. 保持数字的原始格式（如货币、百分比等）
+4. 表格标题、注释输出为 paragraph 块"""
+    
+    dynamic_params = ('table_context',)
+    
+    def build_prefix(self, **kwargs) -> str:
+        """
+        构建PDF表格提取提示词的静态前缀
+        
+        参数:
+            expected_columns: 预期的列名列表
+            structured: 是否按响应 schema 输出内容块（可选）
+        """
+        columns = kwargs.get('expected_columns', [])
+        columns_info = f"\n预期列名: {', '.join(columns)}" if columns else ""
+        instructions = self.STRUCTURED_INSTRUCTIONS if kwargs.get('structured') else self.TEXT_INSTRUCTIONS
+        return f"请分析图片中的表格，并提取其中的数据。{columns_info}\n\n{instructions}"
+    
+    def build_suffix(self, **kwargs) -> str:
+        """
+        构建表格上下文信息
+        
+        参数:
+            table_context: 表格上下文信息
+        """
+        context = kwargs.get('table_context', '')
+        return f"\n\n{context}" if context else ""
+    
     def get_generation_config(self) -> Dict[str, Any]:
         """获取生成配置"""
         return {
@@ -112,3 +157,7 @@ class PDFTableExtractionPrompt(BasePrompt):
             "top_p": 0.8,
             "top_k": 40
         }
+    
+    def get_response_schema(self) -> Optional[Dict[str, Any]]:
+        """获取响应 schema：表格块和说明文字"""
+        return blocks_schema(["table", "paragraph"])
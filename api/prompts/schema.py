@@ -0,0 +1,63 @@
+from typing import Any, Dict, List
+
+# 内容块类型（与 api.models.BlockType 保持一致）
+BLOCK_TYPES = ["heading", "paragraph", "list_item", "table", "chart", "figure", "header", "footer"]
+
+CHART_SCHEMA: Dict[str, Any] = {
+    "type": "object",
+    "nullable": True,
+    "properties": {
+        "chart_type": {"type": "string", "nullable": True},
+        "title": {"type": "string", "nullable": True},
+        "categories": {"type": "array", "items": {"type": "string"}},
+        "series": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "name": {"type": "string", "nullable": True},
+                    "values": {"type": "array", "items": {"type": "number", "nullable": True}}
+                },
+                "required": ["values"]
+            }
+        }
+    }
+}
+
+
+def blocks_schema(block_types: List[str] = BLOCK_TYPES) -> Dict[str, Any]:
+    """
+    生成页面内容块的响应 schema（Vertex AI response_schema，OpenAPI 子集）
+
+    每个块只填写与类型相关的字段：
+    - 文字类（heading/paragraph/list_item/figure/header/footer）：text，标题和列表项带 level
+    - table：cells，第一行为表头
+    - chart：chart（类型、标题、类别、数据系列）
+
+    Args:
+        block_types: 允许的块类型
+    """
+    return {
+        "type": "object",
+        "properties": {
+            "blocks": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "type": {"type": "string", "enum": list(block_types)},
+                        "text": {"type": "string", "nullable": True},
+                        "level": {"type": "integer", "nullable": True},
+                        "cells": {
+                            "type": "array",
+                            "nullable": True,
+                            "items": {"type": "array", "items": {"type": "string"}}
+                        },
+                        "chart": CHART_SCHEMA
+                    },
+                    "required": ["type"]
+                }
+            }
+        },
+        "required": ["blocks"]
+    }
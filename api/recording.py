@@ -0,0 +1,205 @@
+import gzip
+import json
+import time
+import asyncio
+import hashlib
+import threading
+from collections import defaultdict, deque
+from types import SimpleNamespace
+from typing import Any, Deque, Dict, List, Optional
+
+from .model_client import ModelClient
+
+# 从响应 usage_metadata 中保存的字段
+USAGE_METADATA_FIELDS = (
+    "prompt_token_count", "candidates_token_count", "cached_content_token_count", "total_token_count"
+)
+
+
+def _part_bytes(part: Any) -> bytes:
+    if isinstance(part, str):
+        return part.encode("utf-8")
+    if isinstance(part, (bytes, bytearray)):
+        return bytes(part)
+    inline_data = getattr(part, "inline_data", None)
+    if inline_data is not None:
+        return inline_data.mime_type.encode("utf-8") + inline_data.data
+    data = getattr(part, "data", None)
+    if isinstance(data, (bytes, bytearray)):
+        return bytes(data)
+    to_dict = getattr(part, "to_dict", None)
+    if to_dict:
+        return json.dumps(to_dict(), sort_keys=True).encode("utf-8")
+    return repr(part).encode("utf-8")
+
+
+def _config_dict(generation_config: Any) -> Any:
+    if generation_config is None or isinstance(generation_config, dict):
+        return generation_config
+    to_dict = getattr(generation_config, "to_dict", None)
+    return to_dict() if to_dict else repr(generation_config)
+
+
+def request_fingerprint(contents: List[Any], generation_config: Any = None) -> str:
+    """请求指纹：提示词、图片字节和生成配置的 sha256（不含安全设置等其他参数）"""
+    digest = hashlib.sha256()
+    for part in contents:
+        data = _part_bytes(part)
+        digest.update(len(data).to_bytes(8, "big"))
+        digest.update(data)
+    digest.update(json.dumps(_config_dict(generation_config), sort_keys=True, default=str).encode("utf-8"))
+    return digest.hexdigest()
+
+
+class ReplayMissError(Exception):
+    """存档中没有该请求的记录"""
+
+
+class ReplayedError(Exception):
+    """回放录制时发生的模型错误（保留原始错误信息和状态码）"""
+
+    def __init__(self, message: str, code: Optional[int] = None):
+        super().__init__(message)
+        self.code = code
+
+
+class RecordingModelClient(ModelClient):
+    """
+    录制模式：透传给实际的模型客户端，同时把每次调用写入 gzip 压缩的 JSONL 存档
+
+    每条记录包含请求指纹、响应文本、usage_metadata 和耗时；失败的调用记录错误信息和状态码，
+    回放时原样抛出，限流和重试也能复现。
+
+    每条记录单独压缩为一个 gzip member 追加到文件末尾（gzip 允许多个 member 连接），
+    进程中断时已写入的记录仍然完整可读。
+    """
+
+    def __init__(self, inner: ModelClient, archive_path: str):
+        self.inner = inner
+        self.archive_path = archive_path
+        self._lock = threading.Lock()
+        self._file = open(archive_path, "ab")
+        self.recorded = 0
+
+    def _write(self, record: Dict):
+        data = gzip.compress((json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8"))
+        with self._lock:
+            self._file.write(data)
+            self._file.flush()
+            self.recorded += 1
+
+    def _record(self, fingerprint: str, latency: float, response: Any = None, error: Exception = None):
+        record: Dict[str, Any] = {"fingerprint": fingerprint, "latency": round(latency, 4)}
+        if error is not None:
+            record["error"] = str(error)
+            code = getattr(error, "code", None)
+            record["error_code"] = code if isinstance(code, int) else None
+        else:
+            record["text"] = response.text
+            metadata = getattr(response, "usage_metadata", None)
+            record["usage"] = {
+                field: getattr(metadata, field, 0) or 0 for field in USAGE_METADATA_FIELDS
+            } if metadata is not None else None
+        self._write(record)
+
+    async def generate_content_async(self, contents: List[Any], generation_config: Any = None, **kwargs) -> Any:
+        fingerprint = request_fingerprint(contents, generation_config)
+        start = time.perf_counter()
+        try:
+            response = await self.inner.generate_content_async(contents, generation_config=generation_config, **kwargs)
+        except Exception as e:
+            self._record(fingerprint, time.perf_counter() - start, error=e)
+            raise
+        self._record(fingerprint, time.perf_counter() - start, response=response)
+        return response
+
+    def generate_content(self, contents: List[Any], generation_config: Any = None, **kwargs) -> Any:
+        fingerprint = request_fingerprint(contents, generation_config)
+        start = time.perf_counter()
+        try:
+            response = self.inner.generate_content(contents, generation_config=generation_config, **kwargs)
+        except Exception as e:
+            self._record(fingerprint, time.perf_counter() - start, error=e)
+            raise
+        self._record(fingerprint, time.perf_counter() - start, response=response)
+        return response
+
+    def close(self):
+        """关闭存档"""
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+
+
+class ReplayModelClient(ModelClient):
+    """
+    回放模式：按请求指纹返回存档中的响应，不调用实际模型
+
+    - 同一请求录制了多次（如重试）时按录制顺序依次返回，最后一条重复使用
+    - time_scale 为耗时倍数：1 按原始耗时等待，0.1 加速 10 倍，0 不等待
+    - 存档中没有的请求抛出 ReplayMissError；指定 fallback 时改为调用 fallback
+    """
+
+    def __init__(self,
+                 archive_path: str,
+                 time_scale: float = 1.0,
+                 fallback: Optional[ModelClient] = None):
+        self.archive_path = archive_path
+        self.time_scale = time_scale
+        self.fallback = fallback
+        self._records: Dict[str, Deque[Dict]] = defaultdict(deque)
+        self._lock = threading.Lock()
+        with gzip.open(archive_path, "rt", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    self._records[record["fingerprint"]].append(record)
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return sum(len(records) for records in self._records.values())
+
+    def _next(self, fingerprint: str) -> Optional[Dict]:
+        with self._lock:
+            records = self._records.get(fingerprint)
+            if not records:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return records.popleft() if len(records) > 1 else records[0]
+
+    @staticmethod
+    def _response(record: Dict) -> Any:
+        if "error" in record:
+            raise ReplayedError(record["error"], record.get("error_code"))
+        usage = record.get("usage")
+        return SimpleNamespace(
+            text=record["text"],
+            usage_metadata=SimpleNamespace(**usage) if usage is not None else None
+        )
+
+    def _miss(self, fingerprint: str) -> ReplayMissError:
+        return ReplayMissError(f"No recorded response for request {fingerprint[:16]} in {self.archive_path}")
+
+    async def generate_content_async(self, contents: List[Any], generation_config: Any = None, **kwargs) -> Any:
+        fingerprint = request_fingerprint(contents, generation_config)
+        record = self._next(fingerprint)
+        if record is None:
+            if self.fallback is None:
+                raise self._miss(fingerprint)
+            return await self.fallback.generate_content_async(contents, generation_config=generation_config, **kwargs)
+        if self.time_scale:
+            await asyncio.sleep(record["latency"] * self.time_scale)
+        return self._response(record)
+
+    def generate_content(self, contents: List[Any], generation_config: Any = None, **kwargs) -> Any:
+        fingerprint = request_fingerprint(contents, generation_config)
+        record = self._next(fingerprint)
+        if record is None:
+            if self.fallback is None:
+                raise self._miss(fingerprint)
+            return self.fallback.generate_content(contents, generation_config=generation_config, **kwargs)
+        if self.time_scale:
+            time.sleep(record["latency"] * self.time_scale)
+        return self._response(record)
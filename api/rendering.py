@@ -0,0 +1,211 @@
+import io
+import os
+import asyncio
+import threading
+import subprocess
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, List, Optional
+
+from pdf2image import pdfinfo_from_path
+from PIL import Image
+
+from .metrics import ENCODE_SECONDS, RENDER_SECONDS, timed
+from .page_classifier import TextLayout, parse_text_layout
+from .profiling import bind_worker
+
+
+class _Subprocesses:
+    """
+    一次渲染调用在渲染线程中启动的子进程
+
+    渲染线程通过 popen 启动子进程；调用方协程被取消时在事件循环一侧调用 kill，
+    结束仍在运行的子进程，之后不再启动新进程。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._processes: List[subprocess.Popen] = []
+        self.killed = False
+
+    def popen(self, args: List[str], **kwargs) -> subprocess.Popen:
+        with self._lock:
+            if self.killed:
+                raise RuntimeError("Rendering cancelled")
+            process = subprocess.Popen(args, **kwargs)
+            self._processes.append(process)
+            return process
+
+    def kill(self):
+        with self._lock:
+            self.killed = True
+            for process in self._processes:
+                if process.poll() is None:
+                    process.kill()
+
+
+class RenderPool:
+    """
+    页面渲染池
+
+    PDF 和 PPT（先转为 PDF）共用同一个渲染池：每页单独调用 poppler 渲染，
+    在线程池中并行执行，渲染、编码和保存都不占用事件循环。
+    渲染任务被取消时，仍在运行的 pdftoppm 进程随之结束。
+    """
+
+    def __init__(self, max_workers: Optional[int] = None):
+        self.max_workers = max_workers or min(8, os.cpu_count() or 1)
+        self.executor = ThreadPoolExecutor(
+            max_workers=self.max_workers,
+            thread_name_prefix="render"
+        )
+
+    async def run(self, func: Callable, *args, **kwargs) -> Any:
+        """在渲染线程池中执行任意图片处理函数（任务剖析期间的调用计入该任务）"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, partial(bind_worker(func), *args, **kwargs))
+
+    async def page_count(self, pdf_path: str) -> int:
+        """获取 PDF 页数"""
+        info = await self.run(pdfinfo_from_path, pdf_path)
+        return info["Pages"]
+
+    @staticmethod
+    def _page_text(pdf_path: str, page_number: int) -> Optional[str]:
+        try:
+            completed = subprocess.run(
+                ["pdftotext", "-layout", "-f", str(page_number), "-l", str(page_number),
+                 "-enc", "UTF-8", pdf_path, "-"],
+                capture_output=True, timeout=30
+            )
+        except (OSError, subprocess.TimeoutExpired):
+            return None
+        if completed.returncode != 0:
+            return None
+        return completed.stdout.decode("utf-8", errors="replace")
+
+    async def page_text(self, pdf_path: str, page_number: int) -> Optional[str]:
+        """
+        提取单页的文字层（poppler pdftotext）
+
+        Returns:
+            页面文字；pdftotext 不可用或提取失败时返回 None
+        """
+        return await self.run(self._page_text, pdf_path, page_number)
+
+    @staticmethod
+    def _page_layout(pdf_path: str, page_number: int) -> Optional[TextLayout]:
+        try:
+            completed = subprocess.run(
+                ["pdftotext", "-bbox-layout", "-f", str(page_number), "-l", str(page_number),
+                 "-enc", "UTF-8", pdf_path, "-"],
+                capture_output=True, timeout=30
+            )
+        except (OSError, subprocess.TimeoutExpired):
+            return None
+        if completed.returncode != 0:
+            return None
+        try:
+            return parse_text_layout(completed.stdout.decode("utf-8", errors="replace"))
+        except ET.ParseError:
+            return None
+
+    async def page_layout(self, pdf_path: str, page_number: int) -> Optional[TextLayout]:
+        """
+        提取单页文字层的版式（poppler pdftotext -bbox-layout），含每个单词的位置
+
+        Returns:
+            段落 -> 行 -> 单词的版式（见 parse_text_layout）；pdftotext 不可用或提取失败时返回 None
+        """
+        return await self.run(self._page_layout, pdf_path, page_number)
+
+    @staticmethod
+    def _render_page(pdf_path: str, page_number: int, output_path: str, dpi: int,
+                     image_format: str, postprocess: Optional[Callable],
+                     processes: _Subprocesses) -> Any:
+        with timed(RENDER_SECONDS):
+            process = processes.popen(
+                ["pdftoppm", "-f", str(page_number), "-l", str(page_number), "-r", str(dpi), pdf_path],
+                stdout=subprocess.PIPE, stderr=subprocess.PIPE
+            )
+            stdout, stderr = process.communicate()
+            if process.returncode != 0:
+                raise RuntimeError(
+                    f"pdftoppm failed on page {page_number}: {stderr.decode('utf-8', errors='replace').strip()}"
+                )
+            image = Image.open(io.BytesIO(stdout))
+            image.load()
+        try:
+            with timed(ENCODE_SECONDS):
+                image.save(output_path, image_format.upper(), dpi=(dpi, dpi))
+            return postprocess(image) if postprocess else output_path
+        finally:
+            image.close()
+
+    async def render_page(self,
+                          pdf_path: str,
+                          page_number: int,
+                          output_path: str,
+                          dpi: int = 200,
+                          image_format: str = "png",
+                          postprocess: Optional[Callable[[Image.Image], Any]] = None) -> Any:
+        """
+        渲染单页并保存
+
+        Args:
+            pdf_path: PDF文件路径
+            page_number: 页码（从1开始）
+            output_path: 图片保存路径
+            dpi: 渲染分辨率
+            image_format: 图片格式
+            postprocess: 可选，在渲染线程中对页面图片执行的处理（如计算指纹）
+
+        Returns:
+            postprocess 的返回值；未指定时返回 output_path
+        """
+        processes = _Subprocesses()
+        try:
+            return await self.run(
+                self._render_page, pdf_path, page_number, output_path, dpi, image_format, postprocess, processes
+            )
+        except asyncio.CancelledError:
+            processes.kill()
+            raise
+
+    async def render_pages(self,
+                           pdf_path: str,
+                           output_dir: str,
+                           dpi: int = 200,
+                           image_format: str = "png",
+                           name_template: str = "page_{}",
+                           postprocess: Optional[Callable[[Image.Image], Any]] = None) -> List[Any]:
+        """
+        并行渲染 PDF 的所有页面
+
+        Returns:
+            List: 按页码排序的 render_page 返回值
+        """
+        total_pages = await self.page_count(pdf_path)
+        return await asyncio.gather(*[
+            self.render_page(
+                pdf_path,
+                page_number,
+                os.path.join(output_dir, f"{name_template.format(page_number)}.{image_format}"),
+                dpi=dpi,
+                image_format=image_format,
+                postprocess=postprocess
+            )
+            for page_number in range(1, total_pages + 1)
+        ])
+
+
+_default_pool: Optional[RenderPool] = None
+
+
+def get_render_pool() -> RenderPool:
+    """返回进程内共享的渲染池"""
+    global _default_pool
+    if _default_pool is None:
+        _default_pool = RenderPool()
+    return _default_pool
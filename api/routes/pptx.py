@@ -1,42 +1,96 @@
 import os
-from fastapi import APIRouter, File, UploadFile, HTTPException, Path
+
+import aiofiles
+import tempfile
+
+from fastapi import APIRouter, File, Form, Header, UploadFile, HTTPException, Path
 from fastapi.responses import FileResponse
-from typing import List
+from typing import List, Optional
 
 from ..services.pptx_service import PPTXProcessingService
-from ..models import TaskResponse, TaskStatus
+from ..services.pptx_extractor import extract_presentation
+from ..models import TaskResponse, TaskStatus, SlideResult, SlideContent
+from ..metrics import UPLOAD_SECONDS, timed
+from ..model_client import model_client_from_env
 
 router = APIRouter(prefix="/pptx", tags=["pptx"])
 
-# 初始化服务
-pptx_service = PPTXProcessingService()
+# 初始化服务（模型调用调度器由 api.main 注入，与 PDF 处理共用）
+pptx_service = PPTXProcessingService(
+    pool_size=int(os.getenv("LIBREOFFICE_POOL_SIZE", "2")),
+    max_jobs_per_worker=int(os.getenv("LIBREOFFICE_MAX_JOBS_PER_WORKER", "50")),
+    job_timeout=float(os.getenv("LIBREOFFICE_JOB_TIMEOUT", "120")),
+    model_client=model_client_from_env()
+)
+
+@router.on_event("shutdown")
+async def shutdown():
+    """关闭常驻的 LibreOffice worker"""
+    await pptx_service.close()
 
 @router.post("/tasks/", response_model=TaskResponse)
-async def create_task(file: UploadFile = File(...)):
+async def create_task(
+    file: UploadFile = File(...),
+    mode: str = Form("render", description="render: 渲染为图片; native: 原生提取"),
+    x_api_key: Optional[str] = Header(None, description="API key，用于按租户调度模型调用")
+):
     """
     上传PPT文件并创建转换任务
     
     - **file**: PPT文件
+    - **mode**: `render` 将每页渲染为图片；`native` 直接从对象模型提取文字、表格和图表，
+      仅对含图片或 SmartArt 的幻灯片渲染并调用视觉模型
     
     返回任务ID和初始状态
     """
     if not file.filename.lower().endswith(('.ppt', '.pptx')):
         raise HTTPException(status_code=400, detail="Only PPT/PPTX files are allowed")
     
+    if mode not in ("render", "native"):
+        raise HTTPException(status_code=400, detail="mode must be 'render' or 'native'")
+    
+    if mode == "native" and not file.filename.lower().endswith('.pptx'):
+        raise HTTPException(status_code=400, detail="Native extraction requires a PPTX file")
+    
     # 创建任务
-    task = pptx_service.create_task(file.filename)
+    task = pptx_service.create_task(file.filename, api_key=x_api_key)
     
     # 保存文件
     file_path = os.path.join(pptx_service.upload_dir, f"{task.task_id}.pptx")
-    content = await file.read()
-    async with aiofiles.open(file_path, "wb") as buffer:
-        await buffer.write(content)
+    with timed(UPLOAD_SECONDS.labels("pptx")):
+        content = await file.read()
+        async with aiofiles.open(file_path, "wb") as buffer:
+            await buffer.write(content)
     
     # 异步处理PPT
-    asyncio.create_task(pptx_service.convert_pptx_to_images(task.task_id, file_path))
+    if mode == "native":
+        pptx_service.runner.start(task.task_id, pptx_service.extract_pptx(task.task_id, file_path))
+    else:
+        pptx_service.runner.start(task.task_id, pptx_service.convert_pptx_to_images(task.task_id, file_path))
     
     return task
 
+@router.post("/extract", response_model=List[SlideContent])
+async def extract_pptx(file: UploadFile = File(...)):
+    """
+    直接提取PPTX的结构化内容（不渲染、不调用模型）
+    
+    - **file**: PPTX文件
+    
+    返回每张幻灯片的标题、多级列表、表格和图表数据；
+    `needs_vision` 为 true 的幻灯片包含图片或 SmartArt，可通过 `native` 模式的任务补充
+    """
+    if not file.filename.lower().endswith('.pptx'):
+        raise HTTPException(status_code=400, detail="Only PPTX files are allowed")
+    
+    content = await file.read()
+    with tempfile.NamedTemporaryFile(suffix=".pptx") as temp_file:
+        temp_file.write(content)
+        temp_file.flush()
+        contents = await pptx_service.render_pool.run(extract_presentation, temp_file.name)
+    
+    return [SlideContent(**c) for c in contents]
+
 @router.get("/tasks/{task_id}/status", response_model=TaskResponse)
 async def get_task_status(task_id: str):
     """
@@ -51,6 +105,28 @@ async def get_task_status(task_id: str):
         raise HTTPException(status_code=404, detail="Task not found")
     return task
 
+@router.delete("/tasks/{task_id}", response_model=TaskResponse)
+async def cancel_task(task_id: str):
+    """
+    取消任务
+    
+    - **task_id**: 任务ID
+    
+    停止 LibreOffice 转换和进行中的模型调用，标记为 cancelled，并删除上传文件和幻灯片图片。
+    已完成（且没有正在进行的分析）的任务返回 409。
+    """
+    task = pptx_service.get_task_status(task_id)
+    if not task:
+        raise HTTPException(status_code=404, detail="Task not found")
+    
+    if task.status == TaskStatus.COMPLETED and not pptx_service.runner.running(task_id):
+        raise HTTPException(status_code=409, detail="Task is already completed")
+    
+    if task.status == TaskStatus.CANCELLED:
+        return task
+    
+    return await pptx_service.cancel_task(task_id)
+
 @router.get("/tasks/{task_id}/slides/{slide_number}", response_class=FileResponse)
 async def get_slide_image(
     task_id: str,
@@ -68,7 +144,7 @@ async def get_slide_image(
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
     
-    if task.status not in [TaskStatus.COMPLETED]:
+    if task.status not in [TaskStatus.ANALYZING, TaskStatus.COMPLETED]:
         raise HTTPException(status_code=400, detail="Slides not yet converted")
     
     if not task.total_slides or slide_number > task.total_slides:
@@ -99,7 +175,76 @@ async def list_slides(task_id: str):
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
     
-    if task.status not in [TaskStatus.COMPLETED]:
+    if task.status not in [TaskStatus.ANALYZING, TaskStatus.COMPLETED]:
         raise HTTPException(status_code=400, detail="Slides not yet converted")
     
     return pptx_service.tasks[task_id]["image_paths"]
+
+@router.post("/tasks/{task_id}/analyze", response_model=TaskResponse)
+async def analyze_slides(task_id: str):
+    """
+    分析任务中所有幻灯片的内容
+    
+    - **task_id**: 任务ID
+    
+    纯文字幻灯片直接使用提取的文字，含图表的幻灯片调用视觉模型；返回任务状态
+    """
+    task = pptx_service.get_task_status(task_id)
+    if not task:
+        raise HTTPException(status_code=404, detail="Task not found")
+    
+    if task.status == TaskStatus.ANALYZING:
+        raise HTTPException(status_code=409, detail="Slides are already being analyzed")
+    
+    # 上次分析有失败的幻灯片时（FAILED）只重新分析失败的幻灯片
+    converted = bool(pptx_service.tasks[task_id]["image_paths"])
+    if task.status not in (TaskStatus.COMPLETED, TaskStatus.FAILED) or not converted:
+        raise HTTPException(status_code=400, detail="Slides not yet converted")
+    
+    pptx_service.runner.start(task_id, pptx_service.analyze_slides(task_id))
+    
+    return task
+
+@router.get("/tasks/{task_id}/slides/{slide_number}/analysis", response_model=SlideResult)
+async def get_slide_analysis(
+    task_id: str,
+    slide_number: int = Path(..., gt=0, description="幻灯片页码")
+):
+    """
+    获取指定幻灯片的分析结果
+    
+    - **task_id**: 任务ID
+    - **slide_number**: 幻灯片页码
+    
+    返回该幻灯片的分析结果（分析进行中时，已完成的幻灯片即可获取）
+    """
+    task = pptx_service.get_task_status(task_id)
+    if not task:
+        raise HTTPException(status_code=404, detail="Task not found")
+    
+    if not task.total_slides or slide_number > task.total_slides:
+        raise HTTPException(status_code=404, detail="Slide number out of range")
+    
+    result = pptx_service.get_slide_result(task_id, slide_number)
+    if not result:
+        raise HTTPException(status_code=404, detail="Slide not yet analyzed")
+    
+    return result
+
+@router.get("/tasks/{task_id}/content", response_model=List[SlideContent])
+async def get_slide_contents(task_id: str):
+    """
+    获取原生提取模式的结构化内容
+    
+    - **task_id**: 任务ID
+    
+    返回每张幻灯片的结构化内容（含视觉模型补充的内容）
+    """
+    task = pptx_service.get_task_status(task_id)
+    if not task:
+        raise HTTPException(status_code=404, detail="Task not found")
+    
+    if task.status != TaskStatus.COMPLETED:
+        raise HTTPException(status_code=400, detail="Extraction not yet completed")
+    
+    return pptx_service.get_slide_contents(task_id)
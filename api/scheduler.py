@@ -0,0 +1,206 @@
+import time
+import asyncio
+import itertools
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from enum import IntEnum
+from typing import Dict, List, Optional
+
+from .metrics import SCHEDULER_WAIT_SECONDS
+
+
+class Priority(IntEnum):
+    """优先级（数值小的优先）"""
+    INTERACTIVE = 0  # 单页分析等用户在等待结果的请求
+    BATCH = 1        # 整个文档的后台处理
+
+
+@dataclass
+class WorkContext:
+    """
+    模型调用所属的工作：优先级、租户和剩余工作量
+
+    remaining 为所属任务剩余的页数，由任务在页面完成时更新（同一任务的页面共享同一个对象）
+    """
+    priority: Priority = Priority.BATCH
+    tenant: str = "default"
+    remaining: int = 1
+
+
+# 当前上下文的工作（由任务协程创建的子任务继承）；未设置时按默认租户的批量工作调度
+_current_work: ContextVar[Optional[WorkContext]] = ContextVar("current_work", default=None)
+
+
+@contextmanager
+def scheduling(priority: Priority, tenant: str, remaining: int = 1):
+    """
+    在代码块内发起的模型调用按给定优先级、租户和剩余工作量调度
+
+    用法：
+        with scheduling(Priority.BATCH, tenant, remaining=len(pages)) as work:
+            ...
+            work.remaining -= 1
+    """
+    work = WorkContext(priority, tenant, remaining)
+    token = _current_work.set(work)
+    try:
+        yield work
+    finally:
+        _current_work.reset(token)
+
+
+@dataclass
+class _Waiter:
+    work: WorkContext
+    seq: int
+    future: asyncio.Future
+    enqueued_at: float = field(default_factory=time.perf_counter)
+
+
+class PageScheduler:
+    """
+    模型调用调度器（代替单一的 FIFO 信号量）
+
+    同时进行的调用不超过 max_concurrent，空出名额时按以下顺序选择下一个等待的调用：
+    1. 优先级：交互请求优先于批量处理；reserved_interactive 个名额只给交互请求，
+       批量处理占满其余名额时交互请求仍能立即开始
+    2. 同一优先级内按租户加权公平排队（self-clocked fair queuing）：租户开始排队时下一次调用的
+       虚拟完成时间为 max(全局虚拟时间, 该租户上次的完成时间) + 1 / 权重，之后每次调用递增 1 / 权重，
+       取最小者；大批量任务不会挤占其他租户，空闲的租户也不能积累额度
+    3. 同一租户内剩余页数少的任务优先（最短剩余工作优先），页数相同时先到先得
+
+    Args:
+        max_concurrent: 同时进行的调用数
+        reserved_interactive: 只给交互请求使用的名额数
+        weights: 租户权重（租户ID -> 权重），未列出的租户权重为 1
+    """
+
+    def __init__(self,
+                 max_concurrent: int = 4,
+                 reserved_interactive: int = 0,
+                 weights: Optional[Dict[str, float]] = None):
+        self.max_concurrent = max_concurrent
+        self.reserved_interactive = min(reserved_interactive, max_concurrent - 1)
+        self.weights = weights or {}
+        self.running = 0
+        self._running_batch = 0
+        self._waiting: Dict[Priority, Dict[str, List[_Waiter]]] = {p: {} for p in Priority}
+        self._virtual_time: Dict[Priority, float] = {p: 0.0 for p in Priority}
+        # 有调用在等待的租户的下一次调用的虚拟完成时间，以及各租户上一次调用的虚拟完成时间
+        self._finish_tags: Dict[Priority, Dict[str, float]] = {p: {} for p in Priority}
+        self._last_finish: Dict[Priority, Dict[str, float]] = {p: {} for p in Priority}
+        self._seq = itertools.count()
+
+    @property
+    def waiting(self) -> int:
+        return sum(len(queue) for queues in self._waiting.values() for queue in queues.values())
+
+    @asynccontextmanager
+    async def slot(self, work: Optional[WorkContext] = None):
+        """
+        获得调用名额后执行代码块；work 未指定时使用当前上下文的工作（见 scheduling）
+
+        用法：
+            async with scheduler.slot():
+                await model.generate_content_async(...)
+        """
+        work = work or _current_work.get() or WorkContext()
+        await self._acquire(work)
+        try:
+            yield
+        finally:
+            self._release(work)
+
+    async def _acquire(self, work: WorkContext):
+        ahead = any(self._waiting[p] for p in Priority if p <= work.priority)
+        if self._can_start(work.priority) and not ahead:
+            self._start(work)
+            SCHEDULER_WAIT_SECONDS.labels(work.priority.name.lower()).observe(0)
+            return
+
+        waiter = _Waiter(work, next(self._seq), asyncio.get_running_loop().create_future())
+        queues = self._waiting[work.priority]
+        if work.tenant not in queues:
+            # 租户开始排队：从当前虚拟时间起算，空闲期间不积累额度
+            start = max(self._virtual_time[work.priority], self._last_finish[work.priority].get(work.tenant, 0.0))
+            self._finish_tags[work.priority][work.tenant] = start + self._cost(work.tenant)
+        queues.setdefault(work.tenant, []).append(waiter)
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # 已分配名额后被取消，交还名额
+                self._release(work)
+            else:
+                self._remove(waiter)
+            raise
+        SCHEDULER_WAIT_SECONDS.labels(work.priority.name.lower()).observe(
+            time.perf_counter() - waiter.enqueued_at
+        )
+
+    def _cost(self, tenant: str) -> float:
+        return 1.0 / self.weights.get(tenant, 1.0)
+
+    def _can_start(self, priority: Priority) -> bool:
+        if self.running >= self.max_concurrent:
+            return False
+        if priority == Priority.BATCH:
+            return self._running_batch < self.max_concurrent - self.reserved_interactive
+        return True
+
+    def _start(self, work: WorkContext):
+        self.running += 1
+        if work.priority == Priority.BATCH:
+            self._running_batch += 1
+
+    def _release(self, work: WorkContext):
+        self.running -= 1
+        if work.priority == Priority.BATCH:
+            self._running_batch -= 1
+        self._dispatch()
+
+    def _dispatch(self):
+        """按优先级、租户公平和剩余工作量分配空出的名额"""
+        for priority in Priority:
+            while self._can_start(priority):
+                waiter = self._next(priority)
+                if waiter is None:
+                    break
+                self._start(waiter.work)
+                waiter.future.set_result(None)
+
+    def _next(self, priority: Priority) -> Optional[_Waiter]:
+        """取出该优先级下虚拟完成时间最小的租户中剩余工作最少的调用"""
+        queues = self._waiting[priority]
+        finish_tags = self._finish_tags[priority]
+        best = None
+        for tenant, queue in queues.items():
+            # 剩余工作量随任务进度变化，在分配时比较
+            waiter = min(queue, key=lambda w: (w.work.remaining, w.seq))
+            key = (finish_tags[tenant], waiter.work.remaining, waiter.seq)
+            if best is None or key < best[0]:
+                best = (key, tenant, waiter)
+        if best is None:
+            return None
+
+        (finish, _, _), tenant, waiter = best
+        queues[tenant].remove(waiter)
+        self._virtual_time[priority] = finish
+        self._last_finish[priority][tenant] = finish
+        if queues[tenant]:
+            finish_tags[tenant] = finish + self._cost(tenant)
+        else:
+            del queues[tenant]
+            del finish_tags[tenant]
+        return waiter
+
+    def _remove(self, waiter: _Waiter):
+        queues = self._waiting[waiter.work.priority]
+        queue = queues.get(waiter.work.tenant)
+        if queue is None or waiter not in queue:
+            return
+        queue.remove(waiter)
+        if not queue:
+            del queues[waiter.work.tenant]
+            del self._finish_tags[waiter.work.priority][waiter.work.tenant]
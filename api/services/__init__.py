@@ -1,3 +1,4 @@
+from .pdf_service import PDFProcessingService
 from .pptx_service import PPTXProcessingService
 
-__all__ = ['PPTXProcessingService']
+__all__ = ['PDFProcessingService', 'PPTXProcessingService']
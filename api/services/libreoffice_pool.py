@@ -0,0 +1,250 @@
+import os
+import asyncio
+import shutil
+import socket
+import logging
+import tempfile
+import xmlrpc.client
+from pathlib import Path
+from typing import List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class LibreOfficeWorker:
+    """
+    常驻的 LibreOffice 转换进程
+
+    每个 worker 使用独立的用户配置目录，避免并发实例争用同一个 profile。
+    默认（unoserver 在 requirements.txt 中声明）worker 是一个常驻的 headless
+    LibreOffice，通过本地 XML-RPC 端口接收转换任务；找不到 unoserver 命令时
+    退化为每个任务启动一次 soffice（仍使用独立的 profile 目录）。
+    """
+
+    def __init__(self, worker_id: int, port: int, uno_port: int, profile_dir: str):
+        self.worker_id = worker_id
+        self.port = port
+        self.uno_port = uno_port
+        self.profile_dir = profile_dir
+        self.jobs_done = 0
+        self.persistent = shutil.which("unoserver") is not None
+        self._process: Optional[asyncio.subprocess.Process] = None
+
+    @property
+    def profile_url(self) -> str:
+        return Path(self.profile_dir).absolute().as_uri()
+
+    async def start(self, startup_timeout: float = 60):
+        """启动 worker，并等待其端口可用"""
+        Path(self.profile_dir).mkdir(parents=True, exist_ok=True)
+        self.jobs_done = 0
+        if not self.persistent:
+            return
+
+        self._process = await asyncio.create_subprocess_exec(
+            'unoserver',
+            '--interface', '127.0.0.1',
+            '--port', str(self.port),
+            '--uno-port', str(self.uno_port),
+            '--user-installation', self.profile_url,
+            stdout=asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.DEVNULL
+        )
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + startup_timeout
+        while loop.time() < deadline:
+            if await self.is_healthy():
+                return
+            await asyncio.sleep(0.5)
+
+        await self.stop()
+        raise RuntimeError(f"LibreOffice worker {self.worker_id} failed to start")
+
+    async def stop(self):
+        """停止 worker 进程"""
+        process, self._process = self._process, None
+        if process is None or process.returncode is not None:
+            return
+        process.terminate()
+        try:
+            await asyncio.wait_for(process.wait(), timeout=10)
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+
+    async def restart(self):
+        """重启 worker（回收或故障恢复）"""
+        await self.stop()
+        await self.start()
+
+    async def is_healthy(self) -> bool:
+        """健康检查：进程存活且端口可连接"""
+        if not self.persistent:
+            return True
+        if self._process is None or self._process.returncode is not None:
+            return False
+        try:
+            _, writer = await asyncio.wait_for(
+                asyncio.open_connection('127.0.0.1', self.port), timeout=2
+            )
+        except (OSError, asyncio.TimeoutError):
+            return False
+        writer.close()
+        return True
+
+    async def convert(self, input_path: str, output_path: str, convert_to: str):
+        """执行一次转换"""
+        if self.persistent:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(
+                None, self._convert_via_rpc, input_path, output_path, convert_to
+            )
+        else:
+            await self._convert_via_soffice(input_path, output_path, convert_to)
+        self.jobs_done += 1
+
+    def _convert_via_rpc(self, input_path: str, output_path: str, convert_to: str):
+        server = xmlrpc.client.ServerProxy(f"http://127.0.0.1:{self.port}", allow_none=True)
+        server.convert(
+            os.path.abspath(input_path), None, os.path.abspath(output_path), convert_to
+        )
+
+    async def _convert_via_soffice(self, input_path: str, output_path: str, convert_to: str):
+        output_dir = os.path.dirname(output_path)
+        process = await asyncio.create_subprocess_exec(
+            'soffice',
+            f'-env:UserInstallation={self.profile_url}',
+            '--headless',
+            '--convert-to', convert_to,
+            '--outdir', output_dir,
+            input_path,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE
+        )
+        try:
+            _, stderr = await process.communicate()
+        except asyncio.CancelledError:
+            # 超时或取消时结束子进程，避免遗留 soffice
+            process.kill()
+            await process.wait()
+            raise
+
+        if process.returncode != 0:
+            raise RuntimeError(f"Conversion failed: {stderr.decode()}")
+
+        # soffice 以输入文件名命名输出文件
+        produced = os.path.join(
+            output_dir, f"{Path(input_path).stem}.{convert_to.split(':')[0]}"
+        )
+        if produced != output_path:
+            os.replace(produced, output_path)
+
+
+class LibreOfficePool:
+    """
+    LibreOffice worker 池
+
+    - pool_size: worker 数量（即最大并发转换数）
+    - max_jobs_per_worker: 每个 worker 处理多少个任务后回收重启，防止内存泄漏
+    - job_timeout: 单个转换任务的超时时间（秒），超时的 worker 会被强制重启
+    """
+
+    def __init__(self,
+                 pool_size: int = 2,
+                 base_port: int = 2003,
+                 max_jobs_per_worker: int = 50,
+                 job_timeout: float = 120,
+                 profile_root: Optional[str] = None):
+        self.pool_size = pool_size
+        self.base_port = base_port
+        self.max_jobs_per_worker = max_jobs_per_worker
+        self.job_timeout = job_timeout
+        self.profile_root = profile_root or os.path.join(
+            tempfile.gettempdir(), "xdan-libreoffice-profiles"
+        )
+        self.workers: List[LibreOfficeWorker] = []
+        self._idle: Optional[asyncio.Queue] = None
+        self._start_lock: Optional[asyncio.Lock] = None
+
+    @staticmethod
+    def _port_available(port: int) -> bool:
+        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+            return sock.connect_ex(('127.0.0.1', port)) != 0
+
+    async def start(self):
+        """启动所有 worker（首次转换时自动调用）"""
+        if self._start_lock is None:
+            self._start_lock = asyncio.Lock()
+        async with self._start_lock:
+            if self._idle is not None:
+                return
+
+            idle = asyncio.Queue()
+            for i in range(self.pool_size):
+                port = self.base_port + 2 * i
+                worker = LibreOfficeWorker(
+                    worker_id=i,
+                    port=port,
+                    uno_port=port + 1,
+                    profile_dir=os.path.join(self.profile_root, f"worker_{i}")
+                )
+                if not worker.persistent and i == 0:
+                    logger.warning("未找到 unoserver，LibreOffice 转换退化为每个任务单独启动 soffice")
+                if worker.persistent and not self._port_available(port):
+                    raise RuntimeError(f"Port {port} for LibreOffice worker {i} is in use")
+                await worker.start()
+                self.workers.append(worker)
+                idle.put_nowait(worker)
+            self._idle = idle
+
+    async def convert(self, input_path: str, output_path: str, convert_to: str) -> str:
+        """
+        提交一个转换任务
+
+        Args:
+            input_path: 输入文件路径
+            output_path: 输出文件路径
+            convert_to: 目标格式（如 pdf、png）
+
+        Returns:
+            str: 输出文件路径
+        """
+        await self.start()
+        idle = self._idle
+        worker = await idle.get()
+        try:
+            if not await worker.is_healthy():
+                await worker.restart()
+
+            try:
+                await asyncio.wait_for(
+                    worker.convert(input_path, output_path, convert_to),
+                    timeout=self.job_timeout
+                )
+            except asyncio.TimeoutError:
+                await worker.restart()
+                raise RuntimeError(
+                    f"Conversion timed out after {self.job_timeout}s: {input_path}"
+                )
+            except asyncio.CancelledError:
+                # 任务被取消：RPC 转换无法中断，停止常驻进程（下次使用时健康检查失败而重启）
+                if worker.persistent:
+                    await worker.stop()
+                raise
+
+            if worker.jobs_done >= self.max_jobs_per_worker:
+                await worker.restart()
+
+            return output_path
+        finally:
+            # 转换期间池已关闭（或重新启动）时不再归还旧 worker
+            if self._idle is idle:
+                idle.put_nowait(worker)
+
+    async def close(self):
+        """停止所有 worker"""
+        for worker in self.workers:
+            await worker.stop()
+        self.workers = []
+        self._idle = None
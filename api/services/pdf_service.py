@@ -0,0 +1,934 @@
+import os
+import time
+import shutil
+import asyncio
+from typing import List, Optional, Dict
+from datetime import datetime
+import uuid
+from pathlib import Path
+import json
+
+from PIL import Image
+import io
+
+from ..models import TaskStatus, TaskResponse, TaskResult, PageResult, PageType
+from ..prompts import PDFExtractionPrompt, PDFTableExtractionPrompt, ChartExtractionPrompt
+from ..checkpoint import CheckpointStore
+from ..page_hash import fingerprint_page, hamming_distance, is_blank_page
+from ..page_classifier import page_features, classify_page, detect_regions, text_outside_regions
+from ..rendering import RenderPool, get_render_pool
+from ..analysis import PageAnalyzer
+from ..admission import AdmissionController
+from ..scheduler import PageScheduler, Priority, WorkContext, scheduling
+from ..task_runner import TaskRunner
+from ..model_client import ModelClient, VertexModelClient
+from ..structured import parse_structured, blocks_to_text
+from ..metrics import ENCODE_SECONDS, PAGES_IN_FLIGHT, QUEUE_DEPTH, timed
+from ..timeline import empty_timing, record_call, summarize_timing
+from ..tracing import tracer
+from ..profiling import profile_task
+from ..usage import (
+    UsageTracker, add_usage, empty_usage, estimate_tokens, tenant_id, usage_from_response
+)
+
+# 模型分析页面的置信度（TODO: 实现实际的置信度计算，目前为固定值）
+MODEL_CONFIDENCE = 0.9
+
+def _page_layout(image: Image.Image) -> tuple:
+    """渲染线程中计算页面指纹和版式特征"""
+    return fingerprint_page(image), page_features(image)
+
+def _encode_png(image: Image.Image) -> bytes:
+    """将图片编码为 PNG 字节"""
+    buffer = io.BytesIO()
+    with timed(ENCODE_SECONDS):
+        image.save(buffer, format='PNG')
+    return buffer.getvalue()
+
+class PDFProcessingService:
+    def __init__(self, 
+                 upload_dir: str = "uploads",
+                 output_dir: str = "outputs",
+                 project_id: str = "elated-bison-417808",
+                 location: str = "us-central1",
+                 model_name: str = "gemini-1.5-pro-002",
+                 revision_match_ratio: float = 0.5,
+                 duplicate_max_distance: int = 3,
+                 dpi: int = 200,
+                 render_pool: Optional[RenderPool] = None,
+                 max_concurrent: int = 4,
+                 crop_regions: bool = True,
+                 region_max_coverage: float = 0.6,
+                 structured_output: bool = False,
+                 usage_tracker: Optional[UsageTracker] = None,
+                 model_client: Optional[ModelClient] = None,
+                 shared_state: bool = False,
+                 admission: Optional[AdmissionController] = None,
+                 scheduler: Optional[PageScheduler] = None):
+        self.upload_dir = upload_dir
+        self.output_dir = output_dir
+        self.project_id = project_id
+        self.location = location
+        self.model_name = model_name
+        self.revision_match_ratio = revision_match_ratio
+        self.duplicate_max_distance = duplicate_max_distance
+        self.dpi = dpi
+        self.crop_regions = crop_regions
+        self.region_max_coverage = region_max_coverage
+        self.structured_output = structured_output
+        self.render_pool = render_pool or get_render_pool()
+        self.tasks: Dict[str, Dict] = {}
+        
+        # 任务由独立的 worker 进程处理（见 api.worker）时，查询以检查点中的任务清单为准
+        self.shared_state = shared_state
+        
+        # 已完成页面的内容哈希索引：content_hash -> task_id，用于自动匹配修订版本
+        self.page_hash_index: Dict[str, str] = {}
+        
+        # 创建必要的目录
+        Path(upload_dir).mkdir(parents=True, exist_ok=True)
+        Path(output_dir).mkdir(parents=True, exist_ok=True)
+        
+        # 检查点存储（每页完成后落盘，用于断点续跑）
+        self.checkpoints = CheckpointStore(output_dir)
+        
+        # token 用量和费用统计（按租户累计）
+        self.usage = usage_tracker or UsageTracker(output_dir)
+        
+        # 模型客户端（默认 Vertex AI，可替换为 FakeModelClient 离线压测）
+        self.model = model_client or VertexModelClient(model_name, project_id=project_id, location=location)
+        
+        # 模型调用执行器（并发上限和调度、缓存、重试）
+        self.analyzer = PageAnalyzer(self.model, max_concurrent=max_concurrent, scheduler=scheduler)
+        
+        # 任务准入控制（同时运行的任务数、已接收的页数和字节数）
+        self.admission = admission or AdmissionController()
+        
+        # 后台处理中的任务协程（用于取消）
+        self.runner = TaskRunner()
+        
+        # 初始化提示词
+        self.pdf_prompt = PDFExtractionPrompt()
+        self.table_prompt = PDFTableExtractionPrompt()
+        self.chart_prompt = ChartExtractionPrompt()
+        
+        # self.pdf_prompt = PDFExtractionPrompt()
+        # self.table_prompt = PDFTableExtractionPrompt()
+        
+    def create_task(self,
+                    file_name: str,
+                    revision_of: Optional[str] = None,
+                    api_key: Optional[str] = None,
+                    estimate: Optional[Dict] = None,
+                    profile: bool = False,
+                    upload_bytes: int = 0) -> TaskResponse:
+        """
+        创建新任务
+        
+        Args:
+            file_name: 文件名
+            revision_of: 上一版本的任务ID（可选），未指定时按页面哈希自动匹配
+            api_key: 调用方的 API key（可选），用于按租户统计用量
+            estimate: 预估用量（可选，estimate_task 的返回值）
+            profile: 是否对任务处理过程做采样剖析，结果写入 profile_path(task_id)
+            upload_bytes: 上传文件字节数，用于准入控制
+            
+        Raises:
+            AdmissionRejected: 系统饱和（见 AdmissionController）
+        """
+        task_id = str(uuid.uuid4())
+        now = datetime.now()
+        total_pages = estimate["total_pages"] if estimate else None
+        
+        # 由其他进程处理时（共享状态）由任务队列承担排队
+        if not self.shared_state:
+            self.admission.admit(task_id, total_pages or 1, upload_bytes)
+        
+        task_info = {
+            "task_id": task_id,
+            "status": TaskStatus.PENDING,
+            "created_at": now,
+            "updated_at": now,
+            "file_name": file_name,
+            "total_pages": None,
+            "current_page": None,
+            "error": None,
+            "revision_of": revision_of,
+            "revision": None,
+            "dedup": None,
+            "page_hashes": [],
+            "page_features": [],
+            "page_types": [],
+            "tenant": tenant_id(api_key),
+            "usage": empty_usage(),
+            "estimated_tokens": estimate["estimated_tokens"] if estimate else None,
+            "timing": empty_timing(),
+            "profile": profile,
+            "upload_bytes": upload_bytes,
+            "results": []
+        }
+        
+        self.tasks[task_id] = task_info
+        self._save_manifest(task_id)
+        return self._task_response(task_id)
+
+    def get_task_status(self, task_id: str) -> Optional[TaskResponse]:
+        """获取任务状态"""
+        if not self._load_task(task_id, with_results=False):
+            return None
+        return self._task_response(task_id)
+
+    def resume_task(self, task_id: str) -> Optional[TaskResponse]:
+        """
+        准备续跑任务：重置错误信息，后续由 process_pdf(resume=True) 只处理缺失或失败的页面
+        
+        Args:
+            task_id: 任务ID
+            
+        Returns:
+            TaskResponse: 任务状态，任务不存在时返回 None
+            
+        Raises:
+            AdmissionRejected: 系统饱和（见 AdmissionController）
+        """
+        if not self._load_task(task_id):
+            return None
+        
+        task = self.tasks[task_id]
+        if not self.shared_state:
+            self.admission.admit(task_id, task.get("total_pages") or 1, task.get("upload_bytes", 0))
+        
+        self.tasks[task_id]["error"] = None
+        self._update_task_status(task_id, TaskStatus.PENDING)
+        return self._task_response(task_id)
+
+    async def cancel_task(self, task_id: str, timeout: float = 10.0) -> Optional[TaskResponse]:
+        """
+        取消任务：停止处理中的协程（丢弃排队的页面、中断进行中的模型调用），
+        标记为 CANCELLED，删除上传文件、页面图片和逐页结果（保留任务清单）
+        
+        Args:
+            task_id: 任务ID
+            timeout: 等待处理协程结束的最长时间（秒）
+            
+        Returns:
+            TaskResponse: 任务状态，任务不存在时返回 None
+        """
+        if not self._load_task(task_id, with_results=False):
+            return None
+        
+        stopped = await self.runner.cancel(task_id, timeout)
+        self.admission.release(task_id)
+        
+        task = self.tasks[task_id]
+        task["error"] = "Cancelled" if stopped else f"Cancelled (processing did not stop within {timeout}s)"
+        task["current_page"] = None
+        self._update_task_status(task_id, TaskStatus.CANCELLED)
+        self._free_files(task_id)
+        return self._task_response(task_id)
+
+    def get_task_result(self, task_id: str) -> Optional[TaskResult]:
+        """获取任务结果"""
+        if not self._load_task(task_id):
+            return None
+            
+        task = self.tasks[task_id]
+        if task["status"] != TaskStatus.COMPLETED:
+            return None
+            
+        return TaskResult(
+            task_id=task["task_id"],
+            status=task["status"],
+            file_name=task["file_name"],
+            total_pages=task["total_pages"],
+            results=[PageResult(**r) for r in task["results"]],
+            created_at=task["created_at"],
+            completed_at=task["updated_at"],
+            error=task["error"],
+            revision=task.get("revision"),
+            dedup=task.get("dedup"),
+            usage=task.get("usage"),
+            timeline=summarize_timing(task.get("timing"))
+        )
+
+    async def convert_pdf_to_images(self, task_id: str, file_path: str) -> List[str]:
+        """
+        将 PDF 转换为图片
+        
+        Args:
+            task_id: 任务ID
+            file_path: PDF文件路径
+            
+        Returns:
+            List[str]: 图片文件路径列表
+        """
+        try:
+            self._update_task_status(task_id, TaskStatus.CONVERTING)
+            start = time.perf_counter()
+            
+            # 创建图片保存目录
+            image_dir = os.path.join(self.output_dir, task_id, 'images')
+            Path(image_dir).mkdir(parents=True, exist_ok=True)
+            
+            # 在渲染池中并行渲染各页，同时计算页面指纹和版式特征
+            with tracer.span("render_pages", task_id=task_id, dpi=self.dpi) as span:
+                layouts = await self.render_pool.render_pages(
+                    file_path, image_dir, dpi=self.dpi, postprocess=_page_layout
+                )
+                span.set_attribute("pages", len(layouts))
+            page_hashes = [fingerprint for fingerprint, _ in layouts]
+            image_paths = [
+                os.path.join(image_dir, f"page_{i}.png") for i in range(1, len(page_hashes) + 1)
+            ]
+            
+            # 更新任务信息
+            self.tasks[task_id]["total_pages"] = len(page_hashes)
+            self.tasks[task_id]["page_hashes"] = page_hashes
+            self.tasks[task_id]["page_features"] = [features for _, features in layouts]
+            self.tasks[task_id]["image_paths"] = image_paths
+            
+            # 结合文字层给每页分类，用于选择提示词
+            with tracer.span("classify_pages", task_id=task_id):
+                self.tasks[task_id]["page_types"] = await self._classify_pages(task_id, file_path)
+            self._timing(task_id)["render_seconds"] = round(time.perf_counter() - start, 3)
+            self._update_task_status(task_id, TaskStatus.CONVERTED)
+            
+            return image_paths
+            
+        except Exception as e:
+            self.tasks[task_id]["error"] = str(e)
+            self._update_task_status(task_id, TaskStatus.FAILED)
+            raise
+
+    async def analyze_image(self, task_id: str, image_path: str, page_num: int) -> Optional[Dict]:
+        """
+        分析单个图片
+        
+        Args:
+            task_id: 任务ID
+            image_path: 图片路径
+            page_num: 页码
+            
+        Returns:
+            Dict: 分析结果
+        """
+        try:
+            with tracer.span("page", page_number=page_num + 1) as span:
+                with Image.open(image_path) as image:
+                    result = await self._process_single_page(task_id, page_num, image)
+                if result:
+                    span.set_attributes(
+                        page_type=result.get("page_type"),
+                        regions=len(result.get("regions") or [])
+                    )
+                return result
+        except Exception as e:
+            self.tasks[task_id]["error"] = str(e)
+            raise
+
+    async def process_pdf(self, task_id: str, file_path: str, resume: bool = False):
+        """
+        处理PDF文件（等待准入控制分配运行名额后开始）
+        
+        Args:
+            task_id: 任务ID
+            file_path: PDF文件路径
+            resume: 是否从检查点续跑（复用已渲染图片，只处理缺失或失败的页面）
+        """
+        task = self.tasks[task_id]
+        async with self.admission.slot(task_id, task.get("total_pages") or 1, task.get("upload_bytes", 0)):
+            # 模型调用按租户公平调度，交互请求（单页分析）优先
+            with scheduling(Priority.BATCH, task.get("tenant") or tenant_id(None)) as work:
+                await self._process_pdf(task_id, file_path, resume, work)
+
+    async def _process_pdf(self, task_id: str, file_path: str, resume: bool, work: WorkContext):
+        profile_path = self.profile_path(task_id) if self.tasks[task_id].get("profile") else None
+        with tracer.span("process_pdf", trace_id=task_id, task_id=task_id, resume=resume), profile_task(profile_path):
+            try:
+                self.tasks[task_id]["file_path"] = file_path
+                timing = self._timing(task_id)
+                if timing["queued_seconds"] is None:
+                    created_at = self.tasks[task_id]["created_at"]
+                    timing["queued_seconds"] = round((datetime.now() - created_at).total_seconds(), 3)
+                
+                # 转换PDF为图片（续跑时复用已有图片）
+                image_paths = self._existing_image_paths(task_id) if resume else None
+                if not image_paths:
+                    image_paths = await self.convert_pdf_to_images(task_id, file_path)
+                
+                # 更新状态为分析中
+                self._update_task_status(task_id, TaskStatus.ANALYZING)
+                analysis_start = time.perf_counter()
+                
+                # 处理每一页，每页完成后立即写入检查点
+                results = self.checkpoints.load_pages(task_id) if resume else {}
+                
+                # 修订版本：复用未修改页面的结果
+                for page_number, result in self._reuse_revision_results(task_id).items():
+                    if page_number not in results:
+                        results[page_number] = result
+                        self.checkpoints.save_page(task_id, page_number, result)
+                
+                # 文档内去重：空白页不调用模型，近似重复页复用代表页的结果
+                dedup_plan = await self._plan_dedup(task_id, file_path)
+                dedup = {"blank_pages": [], "duplicate_pages": {}, "saved_calls": 0}
+                
+                failed_pages = []
+                page_slots = asyncio.Semaphore(self.analyzer.max_concurrent)
+                
+                def reuse_result(page_number: int, result: Dict):
+                    dedup["saved_calls"] += 1
+                    results[page_number] = result
+                    self.checkpoints.save_page(task_id, page_number, result)
+                
+                queue_depth = QUEUE_DEPTH.labels("pdf")
+                in_flight = PAGES_IN_FLIGHT.labels("pdf")
+                
+                async def run_page(page_number: int):
+                    queue_depth.inc()
+                    async with page_slots:
+                        queue_depth.dec()
+                        in_flight.inc()
+                        self.tasks[task_id]["current_page"] = page_number
+                        try:
+                            result = await self.analyze_image(
+                                task_id, image_paths[page_number - 1], page_number - 1
+                            )
+                        except Exception as e:
+                            self.checkpoints.save_page_error(task_id, page_number, str(e))
+                            failed_pages.append(page_number)
+                            return
+                        finally:
+                            in_flight.dec()
+                            work.remaining -= 1
+                    
+                    if result:
+                        self._record_usage(task_id, result.get("usage"))
+                        results[page_number] = result
+                        self.checkpoints.save_page(task_id, page_number, result)
+                
+                pending = [n for n in range(1, len(image_paths) + 1) if n not in results]
+                
+                # 空白页直接给出空结果
+                for page_number in pending:
+                    if page_number in dedup_plan and dedup_plan[page_number] is None:
+                        dedup["blank_pages"].append(page_number)
+                        reuse_result(page_number, {
+                            "page_number": page_number, "content": "", "confidence": 1.0,
+                            "page_type": PageType.BLANK.value
+                        })
+                
+                # 代表页并行处理（并发受 PageAnalyzer 上限约束）
+                representative_pages = [n for n in pending if n not in dedup_plan]
+                work.remaining = len(representative_pages)
+                with tracer.span("analyze_pages", pages=len(representative_pages)):
+                    await asyncio.gather(*[run_page(n) for n in representative_pages])
+                
+                # 近似重复页复用代表页结果；代表页失败时单独处理
+                fallback_pages = []
+                for page_number in pending:
+                    source_page = dedup_plan.get(page_number)
+                    if source_page is None:
+                        continue
+                    if source_page in results:
+                        dedup["duplicate_pages"][page_number] = source_page
+                        reuse_result(page_number, {
+                            **results[source_page], "page_number": page_number, "usage": None
+                        })
+                    else:
+                        fallback_pages.append(page_number)
+                if fallback_pages:
+                    work.remaining = len(fallback_pages)
+                    with tracer.span("analyze_fallback_pages", pages=len(fallback_pages)):
+                        await asyncio.gather(*[run_page(n) for n in fallback_pages])
+                
+                # 保存结果
+                timing["analysis_seconds"] = round(time.perf_counter() - analysis_start, 3)
+                self.tasks[task_id]["results"] = [results[n] for n in sorted(results)]
+                self.tasks[task_id]["dedup"] = dedup
+                if failed_pages:
+                    self.tasks[task_id]["error"] = f"Pages failed: {failed_pages}"
+                    self._update_task_status(task_id, TaskStatus.FAILED)
+                    return
+                
+                self.tasks[task_id]["error"] = None
+                self._index_page_hashes(task_id)
+                self._update_task_status(task_id, TaskStatus.COMPLETED)
+                
+            except Exception as e:
+                self.tasks[task_id]["error"] = str(e)
+                self._update_task_status(task_id, TaskStatus.FAILED)
+                raise
+
+    async def _process_single_page(self, task_id: str, page_num: int, image: Image.Image) -> Optional[Dict]:
+        """处理单个页面（重试、缓存和并发控制由 PageAnalyzer 负责）"""
+        # 按页面类型选择提示词和配置
+        page_type = self._page_type(task_id, page_num + 1)
+        if page_type == PageType.BLANK:
+            return {
+                "page_number": page_num + 1,
+                "content": "",
+                "confidence": 1.0,
+                "page_type": page_type.value
+            }
+
+        # 含表格或图表的页面：只把检测到的区域发给专用提示词
+        if self.crop_regions and page_type in (PageType.MIXED, PageType.TABLE, PageType.CHART):
+            regions = await self.render_pool.run(detect_regions, image)
+            if self._use_regions(image, page_type, regions):
+                return await self._process_regions(task_id, page_num, image, page_type, regions)
+
+        # 转换为字节流
+        img_byte_arr = await self.render_pool.run(_encode_png, image)
+
+        # 调用模型
+        output = await self._analyze(task_id, page_num, page_type, img_byte_arr)
+        
+        return {
+            "page_number": page_num + 1,
+            "confidence": MODEL_CONFIDENCE,
+            "page_type": page_type.value if page_type else None,
+            **output
+        }
+
+    async def _analyze(self,
+                       task_id: str,
+                       page_num: int,
+                       page_type: Optional[PageType],
+                       image_bytes: bytes) -> Dict:
+        """
+        按页面类型调用模型
+
+        Returns:
+            Dict: content（文本）、structured（结构化输出模式下的内容块，解析失败时为 None）
+            和 usage（token 用量和费用）
+        """
+        template, params, config = self._select_prompt(task_id, page_num, page_type)
+        
+        prompt = template.get_prompt(**params)
+        
+        call_stats: Dict = {}
+        try:
+            response, cache_hit = await self.analyzer.generate_with_cache_info(
+                prompt, image_bytes, config,
+                prompt_type=page_type.value if page_type else PageType.TEXT.value,
+                call_stats=call_stats
+            )
+        finally:
+            record_call(self._timing(task_id), call_stats)
+        # 命中结果缓存时没有新的 token 用量
+        usage = empty_usage() if cache_hit else self.usage.price(usage_from_response(response))
+        
+        if not self.structured_output:
+            return {"content": response.text, "structured": None, "usage": usage}
+        
+        # 输出被截断或不符合 schema 时保留原始文本
+        structured = parse_structured(response.text)
+        if structured is None:
+            return {"content": response.text, "structured": None, "usage": usage}
+        return {
+            "content": blocks_to_text(structured),
+            "structured": structured.model_dump(),
+            "usage": usage
+        }
+
+    def _use_regions(self, image: Image.Image, page_type: PageType, regions: List[Dict]) -> bool:
+        """
+        判断是否按区域处理
+
+        混合页只要检测到区域就裁剪；表格页、图表页仅当区域只占页面一部分时才裁剪，
+        否则整页发送更省事。
+        """
+        if not regions:
+            return False
+        if page_type == PageType.MIXED:
+            return True
+        page_area = image.width * image.height
+        region_area = sum(
+            (x1 - x0) * (y1 - y0) for x0, y0, x1, y1 in (r["bbox"] for r in regions)
+        )
+        return region_area / page_area <= self.region_max_coverage
+
+    async def _process_regions(self,
+                               task_id: str,
+                               page_num: int,
+                               image: Image.Image,
+                               page_type: PageType,
+                               regions: List[Dict]) -> Dict:
+        """
+        按区域处理页面
+
+        - 表格、图表区域：裁剪后并行调用对应的专用提示词
+        - 正文：有文字层时直接使用区域之外的文字（按单词位置过滤，区域内的文字由区域结果给出），
+          否则（或无法取得单词位置时）把区域涂白后用通用提示词识别
+        """
+        async def analyze_region(region: Dict) -> Dict:
+            crop = image.crop(tuple(region["bbox"]))
+            image_bytes = await self.render_pool.run(_encode_png, crop)
+            output = await self._analyze(task_id, page_num, PageType(region["region_type"]), image_bytes)
+            return {**region, **output}
+
+        async def analyze_prose() -> Dict:
+            page_texts = self.tasks[task_id].get("page_texts") or []
+            text = page_texts[page_num] if page_num < len(page_texts) else None
+            layout = None
+            if text and text.strip():
+                file_path = self._pdf_path(task_id)
+                if file_path:
+                    layout = await self.render_pool.page_layout(file_path, page_num + 1)
+            if layout is not None:
+                prose = text_outside_regions(layout, regions, self.dpi / 72)
+                return {
+                    "content": prose,
+                    "structured": {"blocks": [{"type": "paragraph", "text": p} for p in prose.split("\n\n") if p]},
+                    "usage": None
+                }
+            
+            masked = image.convert("RGB")
+            for region in regions:
+                masked.paste((255, 255, 255), tuple(region["bbox"]))
+            if await self.render_pool.run(is_blank_page, masked):
+                return {"content": "", "structured": {"blocks": []}, "usage": None}
+            image_bytes = await self.render_pool.run(_encode_png, masked)
+            return await self._analyze(task_id, page_num, PageType.TEXT, image_bytes)
+
+        prose, *region_results = await asyncio.gather(
+            analyze_prose(), *[analyze_region(region) for region in regions]
+        )
+        
+        # 合并：正文在前，各区域按阅读顺序附带坐标
+        labels = {PageType.TABLE.value: "表格", PageType.CHART.value: "图表"}
+        sections = [prose["content"]] if prose["content"] else []
+        sections.extend(
+            f"[{labels[r['region_type']]} {tuple(r['bbox'])}]\n{r['content']}" for r in region_results
+        )
+        
+        # 页面用量为正文和各区域调用之和
+        usage = empty_usage()
+        for part in [prose] + region_results:
+            add_usage(usage, part.pop("usage"))
+        
+        structured = None
+        if self.structured_output:
+            parts = [prose] + region_results
+            structured = {"blocks": [
+                block for part in parts for block in (part["structured"] or {}).get("blocks", [])
+            ]}
+        
+        return {
+            "page_number": page_num + 1,
+            "content": "\n\n".join(sections),
+            "confidence": MODEL_CONFIDENCE,
+            "page_type": page_type.value,
+            "regions": region_results,
+            "structured": structured,
+            "usage": usage
+        }
+
+    async def estimate_task(self, file_path: str) -> Dict:
+        """
+        任务开始前预估 token 用量（按每页一次通用提示词调用、输出达到上限计算）
+        
+        Returns:
+            Dict: total_pages 和 estimated_tokens
+        """
+        total_pages = await self.render_pool.page_count(file_path)
+        prompt = self.pdf_prompt.get_prompt(
+            page_number=total_pages,
+            total_pages=total_pages,
+            language="auto",
+            document_type="general",
+            structured=self.structured_output
+        )
+        max_output_tokens = self.pdf_prompt.get_generation_config()["max_output_tokens"]
+        return {
+            "total_pages": total_pages,
+            "estimated_tokens": UsageTracker.estimate_task(
+                total_pages, estimate_tokens(prompt), max_output_tokens
+            )
+        }
+
+    def _select_prompt(self, task_id: str, page_num: int, page_type: Optional[PageType]) -> tuple:
+        """
+        根据页面类型选择提示词和生成配置
+
+        - 表格页：PDFTableExtractionPrompt
+        - 图表页：ChartExtractionPrompt
+        - 文本页、混合页以及未分类的页面：PDFExtractionPrompt
+        
+        结构化输出模式下使用各提示词的响应 schema。
+        
+        Returns:
+            (提示词对象, 提示词参数, 生成配置)
+        """
+        structured = self.structured_output
+        if page_type == PageType.TABLE:
+            template = self.table_prompt
+            params = {"table_context": f"这是文档的第 {page_num + 1} 页。"}
+        elif page_type == PageType.CHART:
+            template = self.chart_prompt
+            params = {"language": "auto"}
+        else:
+            template = self.pdf_prompt
+            params = {
+                "page_number": page_num + 1,
+                "total_pages": self.tasks[task_id]["total_pages"],
+                "language": "auto",
+                "document_type": "general"
+            }
+        params["structured"] = structured
+        
+        if structured:
+            return template, params, template.get_structured_generation_config()
+        return template, params, template.get_generation_config()
+
+    async def _classify_pages(self, task_id: str, file_path: str) -> List[str]:
+        """根据版式特征和文字层给每页分类"""
+        features = self.tasks[task_id]["page_features"]
+        texts = await asyncio.gather(*[
+            self.render_pool.page_text(file_path, page_number)
+            for page_number in range(1, len(features) + 1)
+        ])
+        self.tasks[task_id]["page_texts"] = list(texts)
+        return [
+            classify_page(page, text).value for page, text in zip(features, texts)
+        ]
+
+    def _page_type(self, task_id: str, page_number: int) -> Optional[PageType]:
+        """返回页面类型；未分类（例如旧任务续跑）时返回 None"""
+        page_types = self.tasks[task_id].get("page_types") or []
+        if page_number > len(page_types):
+            return None
+        return PageType(page_types[page_number - 1])
+
+    async def _plan_dedup(self, task_id: str, file_path: str) -> Dict[int, Optional[int]]:
+        """
+        根据页面指纹规划文档内去重
+        
+        内容哈希相同的页面直接复用；感知哈希相近的页面只是候选（例如只有章节号不同的分隔页
+        缩小后几乎没有差别），文字层也相同时才复用，没有文字层（扫描件）时不复用。
+        
+        Returns:
+            Dict[int, Optional[int]]: 页码 -> None（空白页）或代表页页码（重复页）
+        """
+        plan: Dict[int, Optional[int]] = {}
+        exact: Dict[str, int] = {}
+        representatives: List[tuple] = []
+        page_texts = self.tasks[task_id].get("page_texts") or []
+        texts: Dict[int, Optional[str]] = {}
+        
+        async def page_text(page_number: int) -> Optional[str]:
+            # 续跑时文字层不在内存中，按需重新提取
+            if page_number not in texts:
+                text = page_texts[page_number - 1] if page_number <= len(page_texts) else None
+                if text is None:
+                    text = await self.render_pool.page_text(file_path, page_number)
+                texts[page_number] = " ".join(text.split()) if text else None
+            return texts[page_number]
+        
+        for i, fingerprint in enumerate(self.tasks[task_id].get("page_hashes") or []):
+            page_number = i + 1
+            if fingerprint.get("blank"):
+                plan[page_number] = None
+                continue
+            
+            # 先按内容哈希精确匹配，再按感知哈希找候选并核对文字层
+            source_page = exact.get(fingerprint["content_hash"])
+            dedup_hash = fingerprint.get("dedup_hash")
+            if source_page is None and dedup_hash:
+                for rep_page, rep_hash in representatives:
+                    if hamming_distance(dedup_hash, rep_hash) > self.duplicate_max_distance:
+                        continue
+                    text = await page_text(page_number)
+                    if text and text == await page_text(rep_page):
+                        source_page = rep_page
+                        break
+            
+            if source_page is not None:
+                plan[page_number] = source_page
+                continue
+            
+            exact[fingerprint["content_hash"]] = page_number
+            if dedup_hash:
+                representatives.append((page_number, dedup_hash))
+        
+        return plan
+
+    def _find_base_task(self, task_id: str) -> Optional[str]:
+        """
+        查找修订版本的基准任务
+        
+        优先使用上传时声明的 revision_of；否则按内容哈希投票，
+        与当前文档重合页面比例不低于 revision_match_ratio 的已完成任务视为上一版本。
+        """
+        task = self.tasks[task_id]
+        base_task_id = task.get("revision_of")
+        if base_task_id:
+            if base_task_id not in self.tasks and not self._restore_task(base_task_id):
+                return None
+            return base_task_id
+        
+        hashes = [h["content_hash"] for h in task.get("page_hashes") or []]
+        votes: Dict[str, int] = {}
+        for content_hash in set(hashes):
+            candidate = self.page_hash_index.get(content_hash)
+            if candidate and candidate != task_id:
+                votes[candidate] = votes.get(candidate, 0) + 1
+        
+        if not votes:
+            return None
+        candidate, matched = max(votes.items(), key=lambda item: item[1])
+        if matched < len(hashes) * self.revision_match_ratio:
+            return None
+        return candidate
+
+    def _reuse_revision_results(self, task_id: str) -> Dict[int, Dict]:
+        """
+        复用基准任务中未修改页面的结果，并记录修订差异摘要
+        
+        Returns:
+            Dict[int, Dict]: 页码到复用结果的映射
+        """
+        base_task_id = self._find_base_task(task_id)
+        if not base_task_id:
+            return {}
+        
+        base_task = self.tasks[base_task_id]
+        base_results = {r["page_number"]: r for r in base_task.get("results") or []}
+        if not base_results:
+            base_results = self.checkpoints.load_pages(base_task_id)
+        
+        # 内容哈希 -> 基准任务中的页码
+        base_pages = {
+            h["content_hash"]: i + 1
+            for i, h in enumerate(base_task.get("page_hashes") or [])
+        }
+        
+        reused = {}
+        for i, page_hash in enumerate(self.tasks[task_id]["page_hashes"]):
+            base_page = base_pages.get(page_hash["content_hash"])
+            if base_page in base_results:
+                reused[i + 1] = {**base_results[base_page], "page_number": i + 1, "usage": None}
+        
+        total_pages = self.tasks[task_id]["total_pages"]
+        self.tasks[task_id]["revision"] = {
+            "base_task_id": base_task_id,
+            "reused_pages": sorted(reused),
+            "recomputed_pages": [n for n in range(1, total_pages + 1) if n not in reused]
+        }
+        return reused
+
+    def _index_page_hashes(self, task_id: str):
+        """将已完成任务的页面哈希加入索引，供后续上传自动匹配"""
+        for page_hash in self.tasks[task_id].get("page_hashes") or []:
+            self.page_hash_index[page_hash["content_hash"]] = task_id
+
+    def _existing_image_paths(self, task_id: str) -> Optional[List[str]]:
+        """返回已渲染的全部页面图片，缺页时返回 None"""
+        total_pages = self.tasks[task_id].get("total_pages")
+        if not total_pages:
+            return None
+        
+        image_dir = os.path.join(self.output_dir, task_id, 'images')
+        image_paths = [
+            os.path.join(image_dir, f"page_{i}.png") for i in range(1, total_pages + 1)
+        ]
+        if not all(os.path.exists(p) for p in image_paths):
+            return None
+        
+        self.tasks[task_id]["image_paths"] = image_paths
+        return image_paths
+
+    def _restore_task(self, task_id: str, with_results: bool = True) -> bool:
+        """从检查点恢复任务信息（例如服务重启之后）"""
+        manifest = self.checkpoints.load_task(task_id)
+        if not manifest:
+            return False
+        
+        manifest["results"] = [
+            r for _, r in sorted(self.checkpoints.load_pages(task_id).items())
+        ] if with_results else []
+        # 清单中的时间是 ISO 字符串
+        for key in ("created_at", "updated_at"):
+            if isinstance(manifest.get(key), str):
+                manifest[key] = datetime.fromisoformat(manifest[key])
+        self.tasks[task_id] = manifest
+        return True
+
+    def _load_task(self, task_id: str, with_results: bool = True) -> bool:
+        """
+        确保任务信息已加载，任务不存在时返回 False
+
+        共享状态时任务由其他进程处理，每次都从检查点重新读取；只查询状态时不读取逐页结果
+        """
+        if not self.shared_state:
+            return task_id in self.tasks or self._restore_task(task_id)
+        return self._restore_task(task_id, with_results=with_results)
+
+    def _free_files(self, task_id: str):
+        """删除任务的上传文件、输出文件和逐页结果（保留任务清单）"""
+        upload_path = os.path.join(self.upload_dir, f"{task_id}.pdf")
+        if os.path.exists(upload_path):
+            os.remove(upload_path)
+        
+        task_dir = os.path.join(self.output_dir, task_id)
+        if os.path.isdir(task_dir):
+            for name in os.listdir(task_dir):
+                path = os.path.join(task_dir, name)
+                if name == "checkpoints":
+                    continue
+                if os.path.isdir(path):
+                    shutil.rmtree(path, ignore_errors=True)
+                else:
+                    os.remove(path)
+        self.checkpoints.clear_pages(task_id)
+        
+        task = self.tasks[task_id]
+        task["results"] = []
+        task.pop("image_paths", None)
+
+    def _task_response(self, task_id: str) -> TaskResponse:
+        task = self.tasks[task_id]
+        return TaskResponse(
+            **task,
+            timeline=summarize_timing(task.get("timing")),
+            queue_position=self.admission.position(task_id),
+            estimated_start=self.admission.estimated_start(task_id)
+        )
+
+    def profile_path(self, task_id: str) -> str:
+        """任务采样剖析结果（folded stacks）的路径"""
+        return os.path.join(self.output_dir, task_id, "profile.folded")
+
+    def _pdf_path(self, task_id: str) -> Optional[str]:
+        """任务的 PDF 文件路径（处理中的任务使用传入的路径，否则为上传目录中的文件）"""
+        file_path = self.tasks[task_id].get("file_path") or os.path.join(self.upload_dir, f"{task_id}.pdf")
+        return file_path if os.path.exists(file_path) else None
+
+    def _timing(self, task_id: str) -> Dict:
+        """任务的耗时记录（早期任务清单中没有时补上）"""
+        return self.tasks[task_id].setdefault("timing", empty_timing())
+
+    def _save_manifest(self, task_id: str):
+        """持久化任务清单（不含逐页结果，逐页结果单独保存）"""
+        task = self.tasks[task_id]
+        self.checkpoints.save_task(task_id, {
+            key: value for key, value in task.items()
+            if key not in ("results", "image_paths", "page_texts", "file_path")
+        })
+
+    def _update_task_status(self, task_id: str, status: TaskStatus):
+        """更新任务状态"""
+        self.tasks[task_id]["status"] = status
+        self.tasks[task_id]["updated_at"] = datetime.now()
+        self._save_manifest(task_id)
+        if status in (TaskStatus.COMPLETED, TaskStatus.FAILED, TaskStatus.CANCELLED):
+            self.usage.save()
+
+    def _record_usage(self, task_id: str, usage: Optional[Dict]):
+        """累计页面用量到任务和租户"""
+        if not usage:
+            return
+        task = self.tasks[task_id]
+        add_usage(task.setdefault("usage", empty_usage()), usage)
+        self.usage.record(task.get("tenant") or tenant_id(None), usage)
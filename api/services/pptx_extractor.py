@@ -0,0 +1,112 @@
+from typing import Dict, Iterator, List
+
+from pptx import Presentation
+from pptx.shapes.graphfrm import GraphicFrame
+from pptx.shapes.group import GroupShape
+from pptx.shapes.picture import Picture
+
+
+def iter_shapes(shapes) -> Iterator:
+    """递归遍历形状（展开组合形状）"""
+    for shape in shapes:
+        if isinstance(shape, GroupShape):
+            yield from iter_shapes(shape.shapes)
+        else:
+            yield shape
+
+
+def _extract_chart(chart) -> Dict:
+    """从图表对象模型中读取类型、标题、类别和数据系列"""
+    title = None
+    if chart.has_title and chart.chart_title.has_text_frame:
+        title = chart.chart_title.text_frame.text or None
+
+    categories: List[str] = []
+    series = []
+    for plot in chart.plots:
+        if not categories:
+            try:
+                categories = [str(c) for c in plot.categories]
+            except (AttributeError, KeyError, ValueError):
+                categories = []
+        for s in plot.series:
+            series.append({"name": s.name, "values": list(s.values)})
+
+    chart_type = chart.chart_type
+    return {
+        "chart_type": chart_type.name if chart_type is not None else None,
+        "title": title,
+        "categories": categories,
+        "series": series
+    }
+
+
+def extract_slide(slide, slide_number: int) -> Dict:
+    """
+    直接从 PPT 对象模型中提取单张幻灯片的结构化内容
+
+    图片、SmartArt 和嵌入对象无法从 XML 中读出内容，会标记 needs_vision，
+    由渲染 + 视觉模型兜底处理。
+    """
+    title_shape = slide.shapes.title
+    title = title_shape.text_frame.text if title_shape is not None else None
+    title_id = title_shape.shape_id if title_shape is not None else None
+
+    bullets = []
+    tables = []
+    charts = []
+    needs_vision = False
+
+    for shape in iter_shapes(slide.shapes):
+        if shape.shape_id == title_id:
+            continue
+        if shape.has_text_frame:
+            bullets.extend(
+                {"text": p.text, "level": p.level}
+                for p in shape.text_frame.paragraphs if p.text.strip()
+            )
+        elif isinstance(shape, GraphicFrame) and shape.has_table:
+            tables.append([[cell.text for cell in row.cells] for row in shape.table.rows])
+        elif isinstance(shape, GraphicFrame) and shape.has_chart:
+            charts.append(_extract_chart(shape.chart))
+        elif isinstance(shape, (Picture, GraphicFrame)):
+            # 图片、SmartArt、OLE 对象
+            needs_vision = True
+
+    return {
+        "slide_number": slide_number,
+        "title": title or None,
+        "bullets": bullets,
+        "tables": tables,
+        "charts": charts,
+        "needs_vision": needs_vision
+    }
+
+
+def extract_slides(prs: Presentation) -> List[Dict]:
+    """提取演示文稿中所有幻灯片的结构化内容"""
+    return [extract_slide(slide, i) for i, slide in enumerate(prs.slides, 1)]
+
+
+def extract_presentation(file_path: str) -> List[Dict]:
+    """打开 PPT 文件并提取所有幻灯片的结构化内容"""
+    return extract_slides(Presentation(file_path))
+
+
+def content_to_text(content: Dict) -> str:
+    """将结构化内容转换为纯文本（标题、缩进的列表项、制表符分隔的表格和图表数据）"""
+    lines = []
+    if content["title"]:
+        lines.append(content["title"])
+    for bullet in content["bullets"]:
+        lines.append("  " * bullet["level"] + bullet["text"])
+    for table in content["tables"]:
+        lines.extend("\t".join(row) for row in table)
+    for chart in content["charts"]:
+        lines.append(f"[图表] {chart['title'] or chart['chart_type'] or ''}".rstrip())
+        if chart["categories"]:
+            lines.append("\t" + "\t".join(chart["categories"]))
+        for series in chart["series"]:
+            values = ["" if v is None else f"{v:g}" for v in series["values"]]
+            lines.append("\t".join([series["name"] or ""] + values))
+    return "\n".join(lines)
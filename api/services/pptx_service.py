@@ -1,18 +1,29 @@
 import os
 import asyncio
+import logging
 from pathlib import Path
 from typing import List, Dict, Optional
 import uuid
 from datetime import datetime
-import io
 import tempfile
 import shutil
 
 from pptx import Presentation
 from PIL import Image
-import aiofiles
 
-from ..models import TaskStatus, TaskResponse
+from ..models import TaskStatus, TaskResponse, SlideResult, SlideContent
+from ..rendering import RenderPool, get_render_pool
+from ..analysis import PageAnalyzer
+from ..model_client import ModelClient, VertexModelClient
+from ..scheduler import PageScheduler, Priority, scheduling
+from ..usage import tenant_id
+from ..metrics import PAGES_IN_FLIGHT, QUEUE_DEPTH
+from ..prompts import ChartExtractionPrompt
+from ..task_runner import TaskRunner
+from .libreoffice_pool import LibreOfficePool
+from .pptx_extractor import extract_presentation, extract_slides, content_to_text
+
+logger = logging.getLogger(__name__)
 
 class PPTXProcessingService:
     """PPT处理服务"""
@@ -21,19 +32,55 @@ class PPTXProcessingService:
                  upload_dir: str = "uploads",
                  output_dir: str = "outputs",
                  image_format: str = "png",
-                 dpi: int = 300):
+                 dpi: int = 300,
+                 render_dpi: Optional[int] = None,
+                 pool_size: int = 2,
+                 max_jobs_per_worker: int = 50,
+                 job_timeout: float = 120,
+                 render_pool: Optional[RenderPool] = None,
+                 analyzer: Optional[PageAnalyzer] = None,
+                 project_id: str = "elated-bison-417808",
+                 location: str = "us-central1",
+                 model_name: str = "gemini-1.5-pro-002",
+                 max_concurrent: int = 4,
+                 model_client: Optional[ModelClient] = None,
+                 scheduler: Optional[PageScheduler] = None):
         self.upload_dir = upload_dir
         self.output_dir = output_dir
         self.image_format = image_format.lower()
         self.dpi = dpi
+        # 渲染分辨率，默认与目标 DPI 一致（此时无需重采样）
+        self.render_dpi = render_dpi or dpi
+        self.render_pool = render_pool or get_render_pool()
+        self.project_id = project_id
+        self.location = location
+        self.model_name = model_name
+        self.max_concurrent = max_concurrent
         self.tasks: Dict[str, Dict] = {}
         
+        # 后台处理中的任务协程（用于取消）
+        self.runner = TaskRunner()
+        
+        # 模型调用执行器（首次分析时初始化 Vertex AI）
+        self.analyzer = analyzer
+        self.model_client = model_client
+        # 模型调用调度器（与 PDF 处理共用时受同一并发上限、优先级和租户公平约束）
+        self.scheduler = scheduler
+        self.chart_prompt = ChartExtractionPrompt()
+        
         # 创建必要的目录
         Path(upload_dir).mkdir(parents=True, exist_ok=True)
         Path(output_dir).mkdir(parents=True, exist_ok=True)
         
         # 检查 LibreOffice 是否安装
         self._check_libreoffice()
+        
+        # 常驻 LibreOffice worker 池（首次转换时启动）
+        self.office_pool = LibreOfficePool(
+            pool_size=pool_size,
+            max_jobs_per_worker=max_jobs_per_worker,
+            job_timeout=job_timeout
+        )
     
     def _check_libreoffice(self):
         """检查 LibreOffice 是否已安装"""
@@ -54,8 +101,14 @@ class PPTXProcessingService:
                 "On Windows: Download from https://www.libreoffice.org/"
             )
     
-    def create_task(self, file_name: str) -> TaskResponse:
-        """创建新任务"""
+    def create_task(self, file_name: str, api_key: Optional[str] = None) -> TaskResponse:
+        """
+        创建新任务
+        
+        Args:
+            file_name: 文件名
+            api_key: 调用方的 API key（可选），用于按租户调度模型调用
+        """
         task_id = str(uuid.uuid4())
         now = datetime.now()
         
@@ -68,7 +121,11 @@ class PPTXProcessingService:
             "total_slides": None,
             "current_slide": None,
             "error": None,
-            "image_paths": []
+            "image_paths": [],
+            "slide_texts": [],
+            "slide_results": {},
+            "slide_contents": [],
+            "tenant": tenant_id(api_key)
         }
         
         self.tasks[task_id] = task_info
@@ -80,6 +137,36 @@ class PPTXProcessingService:
             return None
         return TaskResponse(**self.tasks[task_id])
     
+    async def cancel_task(self, task_id: str, timeout: float = 10.0) -> Optional[TaskResponse]:
+        """
+        取消任务：停止转换和分析（LibreOffice 转换进程随之结束，排队的幻灯片直接丢弃），
+        标记为 CANCELLED，删除上传文件和幻灯片图片
+        
+        Args:
+            task_id: 任务ID
+            timeout: 等待处理协程结束的最长时间（秒）
+            
+        Returns:
+            TaskResponse: 任务状态，任务不存在时返回 None
+        """
+        if task_id not in self.tasks:
+            return None
+        
+        stopped = await self.runner.cancel(task_id, timeout)
+        
+        task = self.tasks[task_id]
+        task["error"] = "Cancelled" if stopped else f"Cancelled (processing did not stop within {timeout}s)"
+        task["current_slide"] = None
+        task["image_paths"] = []
+        task["slide_results"] = {}
+        self._update_task_status(task_id, TaskStatus.CANCELLED)
+        
+        upload_path = os.path.join(self.upload_dir, f"{task_id}.pptx")
+        if os.path.exists(upload_path):
+            os.remove(upload_path)
+        shutil.rmtree(os.path.join(self.output_dir, task_id), ignore_errors=True)
+        return TaskResponse(**task)
+    
     async def convert_pptx_to_images(self, task_id: str, file_path: str) -> List[str]:
         """
         将PPT转换为图片
@@ -98,19 +185,20 @@ class PPTXProcessingService:
             image_dir = os.path.join(self.output_dir, task_id, 'slides')
             Path(image_dir).mkdir(parents=True, exist_ok=True)
             
-            # 获取总页数
-            prs = Presentation(file_path)
-            total_slides = len(prs.slides)
+            # 获取总页数和各页文字（解析演示文稿在渲染线程池中执行，不阻塞事件循环）
+            slide_texts = await self.render_pool.run(self._read_slide_texts, file_path)
+            total_slides = len(slide_texts)
             self.tasks[task_id]["total_slides"] = total_slides
+            self.tasks[task_id]["slide_texts"] = slide_texts
             
             # 使用临时目录进行转换
             with tempfile.TemporaryDirectory() as temp_dir:
                 # 复制文件到临时目录
                 temp_file = os.path.join(temp_dir, "presentation.pptx")
-                shutil.copy2(file_path, temp_file)
+                await self.render_pool.run(shutil.copy2, file_path, temp_file)
                 
-                # 转换为图片
-                await self._convert_to_images(temp_file, image_dir)
+                # 先整体转换为 PDF，再逐页并行渲染为图片
+                await self._convert_to_images(temp_file, image_dir, temp_dir)
                 
                 # 重命名和整理文件
                 image_paths = await self._organize_images(image_dir, total_slides)
@@ -126,28 +214,269 @@ class PPTXProcessingService:
             self._update_task_status(task_id, TaskStatus.FAILED)
             raise
     
-    async def _convert_to_images(self, input_path: str, output_dir: str):
-        """使用 LibreOffice 转换PPT为图片"""
-        cmd = [
-            'soffice',
-            '--headless',
-            '--convert-to',
-            self.image_format,
-            '--outdir',
-            output_dir,
-            input_path
-        ]
+    @classmethod
+    def _read_slide_texts(cls, file_path: str) -> List[Dict]:
+        """读取各页的文字（在渲染线程池中执行）"""
+        return [cls._slide_text(content) for content in extract_slides(Presentation(file_path))]
+    
+    def get_slide_result(self, task_id: str, slide_number: int) -> Optional[SlideResult]:
+        """获取单张幻灯片的分析结果（分析进行中时，已完成的幻灯片即可获取）"""
+        if task_id not in self.tasks:
+            return None
+        result = self.tasks[task_id]["slide_results"].get(slide_number)
+        return SlideResult(**result) if result else None
+    
+    async def analyze_slides(self, task_id: str) -> List[SlideResult]:
+        """
+        分析所有幻灯片的内容
         
-        process = await asyncio.create_subprocess_exec(
-            *cmd,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE
+        纯文字幻灯片直接使用 python-pptx 提取的文字，不调用模型；
+        含图表或图片的幻灯片使用 ChartExtractionPrompt 调用视觉模型，
+        并把已提取的文字随提示词一起提供，模型只需补充图片中的信息。
+        
+        单张幻灯片失败不影响其他幻灯片：全部处理完后有失败的幻灯片时任务标记为 FAILED，
+        error 列出失败的页码；再次分析时只处理失败的幻灯片。
+        
+        Args:
+            task_id: 任务ID
+            
+        Returns:
+            List[SlideResult]: 按页码排序的分析结果
+        """
+        try:
+            task = self.tasks[task_id]
+            # 上次分析有失败的幻灯片时保留已完成的结果
+            if task["status"] != TaskStatus.FAILED:
+                task["slide_results"] = {}
+            self._update_task_status(task_id, TaskStatus.ANALYZING)
+            
+            analyzer = self._get_analyzer()
+            slide_slots = asyncio.Semaphore(analyzer.max_concurrent)
+            
+            queue_depth = QUEUE_DEPTH.labels("pptx")
+            in_flight = PAGES_IN_FLIGHT.labels("pptx")
+            
+            slides = [
+                (i, slide) for i, slide in enumerate(zip(task["image_paths"], task["slide_texts"]), 1)
+                if i not in task["slide_results"]
+            ]
+            failed_slides = []
+            
+            # 模型调用与 PDF 页面一起按租户公平调度
+            with scheduling(Priority.BATCH, task["tenant"], remaining=len(slides)) as work:
+                async def run_slide(slide_number: int, image_path: str, slide_text: Dict):
+                    queue_depth.inc()
+                    async with slide_slots:
+                        queue_depth.dec()
+                        in_flight.inc()
+                        task["current_slide"] = slide_number
+                        try:
+                            result = await self._analyze_slide(analyzer, slide_number, image_path, slide_text)
+                        except Exception as e:
+                            logger.warning(f"任务 {task_id} 第 {slide_number} 张幻灯片分析失败: {e}")
+                            failed_slides.append(slide_number)
+                            return
+                        finally:
+                            in_flight.dec()
+                            work.remaining -= 1
+                    task["slide_results"][slide_number] = result
+                
+                await asyncio.gather(*[
+                    run_slide(i, image_path, slide_text) for i, (image_path, slide_text) in slides
+                ])
+            
+            if failed_slides:
+                task["error"] = f"Slides failed: {sorted(failed_slides)}"
+                self._update_task_status(task_id, TaskStatus.FAILED)
+            else:
+                task["error"] = None
+                self._update_task_status(task_id, TaskStatus.COMPLETED)
+            return [SlideResult(**task["slide_results"][n]) for n in sorted(task["slide_results"])]
+            
+        except Exception as e:
+            self.tasks[task_id]["error"] = str(e)
+            self._update_task_status(task_id, TaskStatus.FAILED)
+            raise
+    
+    async def _analyze_slide(self, analyzer: PageAnalyzer, slide_number: int,
+                             image_path: str, slide_text: Dict) -> Dict:
+        """分析单张幻灯片"""
+        text = slide_text["text"]
+        if not slide_text["has_visuals"]:
+            return {
+                "slide_number": slide_number,
+                "content": text,
+                "source": "text" if text else "blank"
+            }
+        
+        additional_instructions = ""
+        if text:
+            additional_instructions = (
+                "以下文字已从幻灯片中直接提取，无需重复转录，"
+                "请只补充图表、图片中的数据和信息：\n" + text
+            )
+        prompt = self.chart_prompt.get_prompt(
+            language="auto",
+            additional_instructions=additional_instructions
+        )
+        image_bytes = await self.render_pool.run(Path(image_path).read_bytes)
+        response = await analyzer.generate(
+            prompt,
+            image_bytes,
+            self.chart_prompt.get_generation_config(),
+            mime_type=f"image/{self.image_format}",
+            prompt_type="slide"
         )
         
-        stdout, stderr = await process.communicate()
+        content = f"{text}\n\n{response.text}" if text else response.text
+        return {
+            "slide_number": slide_number,
+            "content": content,
+            "source": "model",
+            "vision_content": response.text
+        }
+    
+    def _get_analyzer(self) -> PageAnalyzer:
+        """获取模型调用执行器，首次使用时初始化 Vertex AI"""
+        if self.analyzer is None:
+            model = self.model_client or VertexModelClient(
+                self.model_name, project_id=self.project_id, location=self.location
+            )
+            self.analyzer = PageAnalyzer(
+                model,
+                max_concurrent=self.max_concurrent,
+                scheduler=self.scheduler
+            )
+        return self.analyzer
+    
+    @staticmethod
+    def _slide_text(content: Dict) -> Dict:
+        """由结构化内容得到分析所需的文字，以及是否需要视觉模型"""
+        return {"text": content_to_text(content), "has_visuals": content["needs_vision"]}
+    
+    def get_slide_contents(self, task_id: str) -> Optional[List[SlideContent]]:
+        """获取原生提取的结构化内容"""
+        if task_id not in self.tasks:
+            return None
+        return [SlideContent(**c) for c in self.tasks[task_id]["slide_contents"]]
+    
+    async def extract_pptx(self, task_id: str, file_path: str) -> List[SlideContent]:
+        """
+        原生提取模式
+        
+        直接从 PPT 对象模型读取标题、多级列表、表格和图表数据，不渲染、不调用模型；
+        只有包含图片或 SmartArt 的幻灯片才会被渲染，并由视觉模型补充内容。
+        视觉模型调用失败的幻灯片保留原生提取的内容，任务标记为 FAILED，error 列出失败的页码。
+        
+        Args:
+            task_id: 任务ID
+            file_path: PPT文件路径
+            
+        Returns:
+            List[SlideContent]: 每张幻灯片的结构化内容
+        """
+        try:
+            self._update_task_status(task_id, TaskStatus.ANALYZING)
+            task = self.tasks[task_id]
+            
+            contents = await self.render_pool.run(extract_presentation, file_path)
+            task["total_slides"] = len(contents)
+            task["slide_contents"] = contents
+            
+            # 仅渲染需要视觉模型的幻灯片
+            vision_slides = [c for c in contents if c["needs_vision"]]
+            if vision_slides:
+                image_paths = await self._render_slides(
+                    task_id, file_path, [c["slide_number"] for c in vision_slides]
+                )
+                analyzer = self._get_analyzer()
+                slide_slots = asyncio.Semaphore(analyzer.max_concurrent)
+                queue_depth = QUEUE_DEPTH.labels("pptx")
+                in_flight = PAGES_IN_FLIGHT.labels("pptx")
+                
+                failed_slides = []
+                with scheduling(Priority.BATCH, task["tenant"], remaining=len(vision_slides)) as work:
+                    async def run_slide(content: Dict):
+                        slide_number = content["slide_number"]
+                        queue_depth.inc()
+                        async with slide_slots:
+                            queue_depth.dec()
+                            in_flight.inc()
+                            task["current_slide"] = slide_number
+                            try:
+                                result = await self._analyze_slide(
+                                    analyzer, slide_number, image_paths[slide_number], self._slide_text(content)
+                                )
+                            except Exception as e:
+                                logger.warning(f"任务 {task_id} 第 {slide_number} 张幻灯片分析失败: {e}")
+                                failed_slides.append(slide_number)
+                                return
+                            finally:
+                                in_flight.dec()
+                                work.remaining -= 1
+                        content["vision_content"] = result["vision_content"]
+                        task["slide_results"][slide_number] = result
+                    
+                    await asyncio.gather(*[run_slide(c) for c in vision_slides])
+                
+                if failed_slides:
+                    task["error"] = f"Slides failed: {sorted(failed_slides)}"
+                    self._update_task_status(task_id, TaskStatus.FAILED)
+                    return [SlideContent(**c) for c in contents]
+            
+            self._update_task_status(task_id, TaskStatus.COMPLETED)
+            return [SlideContent(**c) for c in contents]
+            
+        except Exception as e:
+            self.tasks[task_id]["error"] = str(e)
+            self._update_task_status(task_id, TaskStatus.FAILED)
+            raise
+    
+    async def _render_slides(self, task_id: str, file_path: str, slide_numbers: List[int]) -> Dict[int, str]:
+        """将演示文稿转换为 PDF 后只渲染指定的幻灯片"""
+        image_dir = os.path.join(self.output_dir, task_id, 'slides')
+        Path(image_dir).mkdir(parents=True, exist_ok=True)
+        
+        with tempfile.TemporaryDirectory() as temp_dir:
+            temp_file = os.path.join(temp_dir, "presentation.pptx")
+            await self.render_pool.run(shutil.copy2, file_path, temp_file)
+            pdf_path = os.path.join(temp_dir, "presentation.pdf")
+            await self.office_pool.convert(temp_file, pdf_path, "pdf")
+            
+            paths = await asyncio.gather(*[
+                self.render_pool.render_page(
+                    pdf_path,
+                    slide_number,
+                    os.path.join(image_dir, f"slide_{slide_number}.{self.image_format}"),
+                    dpi=self.dpi,
+                    image_format=self.image_format
+                )
+                for slide_number in slide_numbers
+            ])
+        
+        return dict(zip(slide_numbers, paths))
+    
+    async def _convert_to_images(self, input_path: str, output_dir: str, work_dir: str):
+        """
+        转换PPT为逐页图片
+        
+        LibreOffice 直接导出图片只会得到第一页，因此先用 worker 池将整个演示文稿
+        转换为 PDF，再通过与 PDF 共用的渲染池按 self.render_dpi 并行渲染每一页。
+        """
+        pdf_path = os.path.join(work_dir, f"{Path(input_path).stem}.pdf")
+        await self.office_pool.convert(input_path, pdf_path, "pdf")
         
-        if process.returncode != 0:
-            raise RuntimeError(f"Conversion failed: {stderr.decode()}")
+        await self.render_pool.render_pages(
+            pdf_path,
+            output_dir,
+            dpi=self.render_dpi,
+            image_format=self.image_format,
+            name_template="render_{:04d}"
+        )
+    
+    async def close(self):
+        """释放 LibreOffice worker 池"""
+        await self.office_pool.close()
     
     async def _organize_images(self, image_dir: str, total_slides: int) -> List[str]:
         """整理和重命名转换后的图片"""
@@ -162,46 +491,47 @@ class PPTXProcessingService:
                 f"Expected {total_slides} images, but got {len(images)}"
             )
         
-        # 重命名图片
+        # 重命名图片（需要重采样时并行处理）
+        jobs = []
         for i, image in enumerate(images, 1):
             old_path = os.path.join(image_dir, image)
             new_path = os.path.join(image_dir, f"slide_{i}.{self.image_format}")
             
             # 如果需要，调整图片大小和DPI
-            await self._process_image(old_path, new_path)
+            jobs.append(self._process_image(old_path, new_path))
             image_paths.append(new_path)
         
+        await asyncio.gather(*jobs)
         return image_paths
     
     async def _process_image(self, input_path: str, output_path: str):
-        """处理图片（调整大小和DPI）"""
-        # 读取图片
-        img = Image.open(input_path)
+        """
+        处理图片（调整大小和DPI）
         
-        # 设置DPI
-        img.info['dpi'] = (self.dpi, self.dpi)
+        渲染时已按 render_dpi 写入 DPI 信息，两者一致时直接重命名，无需解码和重新编码；
+        不一致时才在渲染线程池中重采样。
+        """
+        if self.render_dpi == self.dpi:
+            if input_path != output_path:
+                os.replace(input_path, output_path)
+            return
         
-        # 保存图片
-        await self._save_image(img, output_path)
+        await self.render_pool.run(self._resample_image, input_path, output_path)
+    
+    def _resample_image(self, input_path: str, output_path: str):
+        """按目标 DPI 重采样图片（在渲染线程中执行）"""
+        scale = self.dpi / self.render_dpi
+        with Image.open(input_path) as img:
+            size = (max(1, round(img.width * scale)), max(1, round(img.height * scale)))
+            resized = img.resize(size, Image.LANCZOS)
         
-        # 关闭图片
-        img.close()
+        resized.save(output_path, format=self.image_format.upper(), dpi=(self.dpi, self.dpi))
+        resized.close()
         
         # 如果输出路径与输入路径不同，删除原图片
         if input_path != output_path:
             os.remove(input_path)
     
-    async def _save_image(self, image: Image.Image, path: str):
-        """异步保存图片"""
-        # 转换为字节流
-        img_byte_arr = io.BytesIO()
-        image.save(img_byte_arr, format=self.image_format.upper(), dpi=(self.dpi, self.dpi))
-        img_byte_arr = img_byte_arr.getvalue()
-        
-        # 异步写入文件
-        async with aiofiles.open(path, 'wb') as f:
-            await f.write(img_byte_arr)
-    
     def _update_task_status(self, task_id: str, status: TaskStatus):
         """更新任务状态"""
         self.tasks[task_id]["status"] = status
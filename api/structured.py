@@ -0,0 +1,43 @@
+import json
+from typing import Optional
+
+from pydantic import ValidationError
+
+from .models import BlockType, StructuredPage
+
+
+def parse_structured(text: str) -> Optional[StructuredPage]:
+    """
+    解析结构化输出（响应 schema 约束下的 JSON）
+
+    Returns:
+        StructuredPage；输出被截断或不符合 schema 时返回 None
+    """
+    try:
+        return StructuredPage.model_validate(json.loads(text))
+    except (json.JSONDecodeError, ValidationError, TypeError):
+        return None
+
+
+def blocks_to_text(page: StructuredPage) -> str:
+    """将内容块转换为纯文本（缩进的列表项、制表符分隔的表格和图表数据）"""
+    lines = []
+    for block in page.blocks:
+        if block.type == BlockType.TABLE:
+            lines.extend("\t".join(row) for row in block.cells or [])
+        elif block.type == BlockType.CHART:
+            chart = block.chart
+            title = (chart.title or chart.chart_type) if chart else None
+            lines.append(f"[图表] {title or block.text or ''}".rstrip())
+            if chart and chart.categories:
+                lines.append("\t" + "\t".join(chart.categories))
+            for series in chart.series if chart else []:
+                values = ["" if v is None else f"{v:g}" for v in series.values]
+                lines.append("\t".join([series.name or ""] + values))
+        elif block.type == BlockType.FIGURE:
+            lines.append(f"[图片] {block.text or ''}".rstrip())
+        elif block.type == BlockType.LIST_ITEM:
+            lines.append("  " * (block.level or 0) + (block.text or ""))
+        elif block.text:
+            lines.append(block.text)
+    return "\n".join(lines)
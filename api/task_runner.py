@@ -0,0 +1,48 @@
+import asyncio
+from collections import defaultdict
+from typing import Coroutine, Dict, Set
+
+
+class TaskRunner:
+    """
+    后台运行的任务协程（按任务ID登记），用于取消任务
+
+    取消时对任务的协程调用 cancel()，CancelledError 沿 gather / await 传播到子协程：
+    排队中的页面（页面名额、模型调度、渲染线程池中未开始的调用）直接丢弃，进行中的模型调用被中断。
+    """
+
+    def __init__(self):
+        self._tasks: Dict[str, Set[asyncio.Task]] = defaultdict(set)
+
+    def start(self, task_id: str, coro: Coroutine) -> asyncio.Task:
+        """在后台运行任务的协程（持有引用，运行结束后自动移除）"""
+        task = asyncio.create_task(coro)
+        self._tasks[task_id].add(task)
+        task.add_done_callback(lambda t: self._discard(task_id, t))
+        return task
+
+    def _discard(self, task_id: str, task: asyncio.Task):
+        tasks = self._tasks.get(task_id)
+        if tasks is None:
+            return
+        tasks.discard(task)
+        if not tasks:
+            del self._tasks[task_id]
+
+    def running(self, task_id: str) -> bool:
+        return bool(self._tasks.get(task_id))
+
+    async def cancel(self, task_id: str, timeout: float = 10.0) -> bool:
+        """
+        取消任务的所有协程并等待其结束
+
+        Returns:
+            是否在 timeout 秒内全部结束
+        """
+        tasks = list(self._tasks.get(task_id, ()))
+        if not tasks:
+            return True
+        for task in tasks:
+            task.cancel()
+        _, pending = await asyncio.wait(tasks, timeout=timeout)
+        return not pending
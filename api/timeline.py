@@ -0,0 +1,54 @@
+import math
+import statistics
+from typing import Any, Dict, List, Optional
+
+
+def empty_timing() -> Dict[str, Any]:
+    """空的任务耗时记录（保存在任务清单中，汇总见 summarize_timing）"""
+    return {
+        "queued_seconds": None,
+        "render_seconds": None,
+        "analysis_seconds": None,
+        "model_latencies": [],
+        "retries": 0,
+        "bytes_uploaded": 0,
+        "cache_hits": 0
+    }
+
+
+def record_call(timing: Dict[str, Any], call_stats: Dict[str, Any]):
+    """累计一次模型调用的统计（PageAnalyzer.generate_with_cache_info 写入的 call_stats）"""
+    if call_stats.get("cache_hit"):
+        timing["cache_hits"] += 1
+        return
+    if call_stats.get("latency") is not None:
+        timing["model_latencies"].append(round(call_stats["latency"], 3))
+    timing["retries"] += call_stats.get("retries", 0)
+    timing["bytes_uploaded"] += call_stats.get("bytes_uploaded", 0)
+
+
+def percentile(values: List[float], fraction: float) -> Optional[float]:
+    """最近秩法计算分位数，values 为空时返回 None"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def summarize_timing(timing: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """汇总为 TaskTimeline 的字段：各阶段耗时、模型调用耗时的最小值/中位数/P95 等"""
+    if not timing:
+        return None
+    latencies = timing.get("model_latencies") or []
+    return {
+        "queued_seconds": timing.get("queued_seconds"),
+        "render_seconds": timing.get("render_seconds"),
+        "analysis_seconds": timing.get("analysis_seconds"),
+        "model_calls": len(latencies),
+        "model_latency_min": min(latencies) if latencies else None,
+        "model_latency_median": statistics.median(latencies) if latencies else None,
+        "model_latency_p95": percentile(latencies, 0.95),
+        "retries": timing.get("retries", 0),
+        "bytes_uploaded": timing.get("bytes_uploaded", 0),
+        "cache_hits": timing.get("cache_hits", 0)
+    }
@@ -0,0 +1,260 @@
+import os
+import json
+import time
+import uuid
+import asyncio
+import logging
+import threading
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Span:
+    """
+    一段计时的操作（接口参照 OpenTelemetry 的 Span）
+
+    trace_id 标识一次完整的处理（如一个任务），parent_id 指向外层 span；
+    lane 是所在的 asyncio 任务（或线程），并行处理的页面落在不同的 lane 上。
+    """
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: Optional[str] = None
+    depth: int = 0
+    lane: int = 0
+    start_ns: int = 0
+    end_ns: Optional[int] = None
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    status: str = "ok"
+
+    @property
+    def duration_ms(self) -> Optional[float]:
+        if self.end_ns is None:
+            return None
+        return (self.end_ns - self.start_ns) / 1e6
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def set_attributes(self, **attributes):
+        self.attributes.update(attributes)
+
+    def record_error(self, error: BaseException):
+        self.status = "error"
+        self.attributes["error"] = f"{type(error).__name__}: {error}"
+
+
+class _NoopSpan:
+    """未启用追踪时使用的空 span"""
+
+    def set_attribute(self, key: str, value: Any):
+        pass
+
+    def set_attributes(self, **attributes):
+        pass
+
+    def record_error(self, error: BaseException):
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+class SpanExporter(ABC):
+    """span 导出器基类：span 结束时调用 export"""
+
+    @abstractmethod
+    def export(self, span: Span):
+        """导出一个已结束的 span"""
+        pass
+
+    def shutdown(self):
+        pass
+
+
+class ConsoleExporter(SpanExporter):
+    """按层级缩进输出到日志（logger 为 api.tracing）"""
+
+    def export(self, span: Span):
+        attributes = " ".join(f"{k}={v}" for k, v in span.attributes.items())
+        logger.info(
+            f"[trace {span.trace_id[:8]}] {'  ' * span.depth}{span.name} "
+            f"{span.duration_ms:.1f}ms {span.status} {attributes}".rstrip()
+        )
+
+
+class JSONFileExporter(SpanExporter):
+    """
+    以 Chrome Trace Event 格式写入文件，可在 chrome://tracing 或 Perfetto 中查看瀑布图
+
+    每个 span 写一个完整事件（ph=X），pid 区分 trace，tid 区分并行的 lane。
+    文件以 "[" 开头、逐行追加事件，该格式允许省略结尾的 "]"，进程中断时已写入的内容仍可读取。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._pids: Dict[str, int] = {}
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(path, "w", encoding="utf-8")
+        self._file.write("[\n")
+        self._file.flush()
+
+    def export(self, span: Span):
+        with self._lock:
+            pid = self._pids.setdefault(span.trace_id, len(self._pids) + 1)
+            event = {
+                "name": span.name,
+                "cat": span.status,
+                "ph": "X",
+                "ts": span.start_ns / 1000,
+                "dur": (span.end_ns - span.start_ns) / 1000,
+                "pid": pid,
+                "tid": span.lane,
+                "args": {
+                    "trace_id": span.trace_id,
+                    "span_id": span.span_id,
+                    "parent_id": span.parent_id,
+                    **span.attributes
+                }
+            }
+            self._file.write(json.dumps(event, ensure_ascii=False, default=str) + ",\n")
+            self._file.flush()
+
+    def shutdown(self):
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+
+
+class InMemoryExporter(SpanExporter):
+    """保存在内存中（用于测试）"""
+
+    def __init__(self):
+        self.spans: List[Span] = []
+
+    def export(self, span: Span):
+        self.spans.append(span)
+
+
+def _lane() -> int:
+    """当前 asyncio 任务（不在事件循环中时为线程）的标识"""
+    try:
+        task = asyncio.current_task()
+    except RuntimeError:
+        task = None
+    return id(task) if task is not None else threading.get_ident()
+
+
+class Tracer:
+    """
+    轻量的 span 追踪器
+
+    span 的父子关系通过 contextvars 传递：asyncio.gather / create_task 创建的子任务
+    继承创建时的当前 span，因此 任务 → 阶段 → 页面 → 模型调用 的层级在并行处理时也保持正确。
+    未配置导出器时 span() 直接返回空 span，几乎没有开销。
+    """
+
+    # lane 编号表的上限，超过后重新编号
+    MAX_LANES = 4096
+
+    def __init__(self, exporters: Optional[List[SpanExporter]] = None):
+        self.exporters: List[SpanExporter] = list(exporters or [])
+        self._lanes: Dict[int, int] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.exporters)
+
+    def add_exporter(self, exporter: SpanExporter):
+        self.exporters.append(exporter)
+
+    def shutdown(self):
+        for exporter in self.exporters:
+            exporter.shutdown()
+        self.exporters = []
+
+    def current_span(self) -> Optional[Span]:
+        return _current_span.get()
+
+    def _lane_number(self) -> int:
+        # 把任务 id 映射为从 1 开始的小整数，便于在瀑布图中阅读
+        key = _lane()
+        if key not in self._lanes and len(self._lanes) >= self.MAX_LANES:
+            self._lanes.clear()
+        return self._lanes.setdefault(key, len(self._lanes) + 1)
+
+    @contextmanager
+    def span(self, name: str, trace_id: Optional[str] = None, **attributes) -> Iterator[Any]:
+        """
+        记录一个 span
+
+        Args:
+            name: 操作名称
+            trace_id: 可选，指定 trace 标识（如任务ID）；未指定时沿用外层 span 的 trace
+            **attributes: span 属性
+        """
+        if not self.exporters:
+            yield _NOOP_SPAN
+            return
+
+        parent = _current_span.get()
+        span = Span(
+            name=name,
+            trace_id=trace_id or (parent.trace_id if parent else uuid.uuid4().hex),
+            span_id=uuid.uuid4().hex[:16],
+            parent_id=parent.span_id if parent else None,
+            depth=parent.depth + 1 if parent else 0,
+            lane=self._lane_number(),
+            start_ns=time.perf_counter_ns(),
+            attributes=dict(attributes)
+        )
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.record_error(e)
+            raise
+        finally:
+            span.end_ns = time.perf_counter_ns()
+            _current_span.reset(token)
+            for exporter in self.exporters:
+                try:
+                    exporter.export(span)
+                except Exception as e:
+                    logger.warning(f"导出 span 失败: {e}")
+
+
+tracer = Tracer()
+
+
+def configure_tracing(spec: Optional[str]) -> Tracer:
+    """
+    按配置添加导出器（逗号分隔）：
+
+    - ``console``：输出到日志
+    - ``json:<path>``：写入 Chrome Trace Event 格式的文件
+
+    Returns:
+        全局 tracer
+    """
+    for item in (spec or "").split(","):
+        item = item.strip()
+        if not item:
+            continue
+        if item == "console":
+            tracer.add_exporter(ConsoleExporter())
+        elif item.startswith("json:"):
+            tracer.add_exporter(JSONFileExporter(item[len("json:"):]))
+        else:
+            raise ValueError(f"Unknown trace exporter: {item}")
+    return tracer
@@ -0,0 +1,188 @@
+import os
+import json
+import hashlib
+import threading
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows：单进程部署，不加文件锁
+    fcntl = None
+
+# 单张图片的输入 token 数（Gemini 1.5 按每张图片固定计费）
+IMAGE_TOKENS = 258
+
+USAGE_FIELDS = ("prompt_tokens", "output_tokens", "cached_tokens", "total_tokens", "model_calls")
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估计 token 数：中日韩字符约 1 token/字，其余约 4 字符/token"""
+    cjk = sum(1 for ch in text if ord(ch) >= 0x2E80)
+    return cjk + (len(text) - cjk) // 4
+
+
+def tenant_id(api_key: Optional[str]) -> str:
+    """API key 对应的租户标识（只保存哈希，不落盘明文 key）"""
+    if not api_key:
+        return "anonymous"
+    return "key-" + hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:12]
+
+
+def empty_usage() -> Dict[str, Any]:
+    """空的用量统计"""
+    usage: Dict[str, Any] = {field: 0 for field in USAGE_FIELDS}
+    usage["cost"] = 0.0
+    return usage
+
+
+def usage_from_response(response: Any) -> Dict[str, Any]:
+    """
+    从模型响应的 usage_metadata 中读取 token 用量
+
+    响应没有 usage_metadata 时（例如测试用的模拟模型）只记录调用次数。
+    """
+    usage = empty_usage()
+    usage["model_calls"] = 1
+    metadata = getattr(response, "usage_metadata", None)
+    if metadata is None:
+        return usage
+
+    usage["prompt_tokens"] = getattr(metadata, "prompt_token_count", 0) or 0
+    usage["output_tokens"] = getattr(metadata, "candidates_token_count", 0) or 0
+    usage["cached_tokens"] = getattr(metadata, "cached_content_token_count", 0) or 0
+    usage["total_tokens"] = (
+        getattr(metadata, "total_token_count", 0) or usage["prompt_tokens"] + usage["output_tokens"]
+    )
+    return usage
+
+
+def add_usage(total: Dict[str, Any], usage: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """把 usage 累加到 total 上（原地修改并返回 total）"""
+    if not usage:
+        return total
+    for field in USAGE_FIELDS:
+        total[field] = total.get(field, 0) + usage.get(field, 0)
+    total["cost"] = round(total.get("cost", 0.0) + usage.get("cost", 0.0), 6)
+    return total
+
+
+class UsageTracker:
+    """
+    token 用量和费用统计
+
+    - 按租户（API key 的哈希，见 tenant_id）累计用量，保存在 ``{root_dir}/usage.json``
+    - 按单价（美元 / 百万 token）估算费用，缓存命中的输入 token 按 cached_input_price 计费
+    - 可选的按租户配额（token 数），任务开始前用预估值检查
+
+    API 进程和多个 worker 进程共享同一个 usage.json：每个进程只累计自己尚未保存的增量，
+    保存时在文件锁内读取最新内容、加上增量后原子替换；读取用量（含配额检查）前重新加载
+    其他进程保存的内容，因此各进程看到的是全部进程的累计用量。
+    """
+
+    FILE_NAME = "usage.json"
+
+    def __init__(self,
+                 root_dir: str = "outputs",
+                 input_price: float = 1.25,
+                 output_price: float = 5.0,
+                 cached_input_price: float = 0.3125,
+                 quota_tokens: Optional[int] = None):
+        self.path = os.path.join(root_dir, self.FILE_NAME)
+        self.input_price = input_price
+        self.output_price = output_price
+        self.cached_input_price = cached_input_price
+        self.quota_tokens = quota_tokens
+        self._lock = threading.Lock()
+        # 最近一次从文件加载的用量（及文件的修改时间和大小），以及本进程尚未保存的增量
+        self._saved: Dict[str, Dict[str, Any]] = {}
+        self._saved_stat: Optional[tuple] = None
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        self._refresh()
+
+    def _file_stat(self) -> Optional[tuple]:
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def _refresh(self):
+        """文件被（其他进程）更新后重新加载"""
+        stat = self._file_stat()
+        if stat == self._saved_stat:
+            return
+        totals = self._load()
+        with self._lock:
+            self._saved, self._saved_stat = totals, stat
+
+    def save(self):
+        """在文件锁内合并最新内容和本进程的增量，先写临时文件再原子替换"""
+        Path(os.path.dirname(self.path) or ".").mkdir(parents=True, exist_ok=True)
+        with open(f"{self.path}.lock", "w") as lock_file:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            with self._lock:
+                pending, self._pending = self._pending, {}
+            totals = self._load()
+            for tenant, usage in pending.items():
+                add_usage(totals.setdefault(tenant, empty_usage()), usage)
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(json.dumps(totals, ensure_ascii=False))
+            os.replace(tmp_path, self.path)
+            stat = self._file_stat()
+        with self._lock:
+            self._saved, self._saved_stat = totals, stat
+
+    def price(self, usage: Dict[str, Any]) -> Dict[str, Any]:
+        """按单价计算一次调用的费用，写入 usage["cost"] 并返回 usage"""
+        billable_input = usage["prompt_tokens"] - usage["cached_tokens"]
+        usage["cost"] = round((
+            billable_input * self.input_price
+            + usage["cached_tokens"] * self.cached_input_price
+            + usage["output_tokens"] * self.output_price
+        ) / 1_000_000, 6)
+        return usage
+
+    def record(self, tenant: str, usage: Dict[str, Any]):
+        """累计某个租户的用量（调用 save 后写入文件）"""
+        with self._lock:
+            add_usage(self._pending.setdefault(tenant, empty_usage()), usage)
+
+    def get(self, tenant: str) -> Dict[str, Any]:
+        """获取某个租户的累计用量（所有进程已保存的用量加上本进程未保存的增量）"""
+        self._refresh()
+        with self._lock:
+            return add_usage(dict(self._saved.get(tenant) or empty_usage()), self._pending.get(tenant))
+
+    def all(self) -> Dict[str, Dict[str, Any]]:
+        """获取全部租户的累计用量"""
+        self._refresh()
+        with self._lock:
+            return {
+                tenant: add_usage(dict(self._saved.get(tenant) or empty_usage()), self._pending.get(tenant))
+                for tenant in {**self._saved, **self._pending}
+            }
+
+    def remaining(self, tenant: str) -> Optional[int]:
+        """剩余配额（token 数），未设置配额时返回 None"""
+        if self.quota_tokens is None:
+            return None
+        return max(0, self.quota_tokens - self.get(tenant)["total_tokens"])
+
+    @staticmethod
+    def estimate_task(total_pages: int, prompt_tokens: int, max_output_tokens: int) -> int:
+        """
+        预估任务的 token 用量（上限）
+
+        每页：图片 + 提示词作为输入，输出按 max_output_tokens 计。
+        """
+        return total_pages * (IMAGE_TOKENS + prompt_tokens + max_output_tokens)
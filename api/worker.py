@@ -0,0 +1,231 @@
+"""
+任务队列 worker
+
+从 JOB_QUEUE_URL 指定的队列领取任务并处理，与 API 进程共享 uploads/ 和 outputs/ 目录
+（多台主机时放在共享存储上，队列使用 redis://）：
+
+    JOB_QUEUE_URL=sqlite:///outputs/jobs.db python -m api.worker --concurrency 2 --processes 4
+
+模型后端、结构化输出等配置与 API 相同（MODEL_BACKEND、PDF_STRUCTURED_OUTPUT）。
+收到 SIGTERM / SIGINT 后不再领取新任务，等待处理中的任务完成后退出。
+"""
+import os
+import signal
+import socket
+import asyncio
+import logging
+import argparse
+import multiprocessing
+from typing import Optional, Set
+
+from .admission import AdmissionController
+from .job_queue import Job, JobQueue, job_queue_from_env
+from .models import TaskStatus
+from .services import PDFProcessingService
+from .model_client import model_client_from_env
+from .tracing import configure_tracing, tracer
+
+logger = logging.getLogger(__name__)
+
+
+class Worker:
+    """
+    从队列领取任务并调用 PDFProcessingService 处理
+
+    - 同时处理 concurrency 个任务，每个任务处理期间按租约时长的 1/3 续约
+    - 续约失败（租约已过期并被其他 worker 领取）时放弃本次处理
+    - 每 cancel_check_interval 秒检查任务的取消标记（DELETE /tasks/{task_id}），已取消时停止处理并清理文件
+    - 重试（上次 worker 崩溃或处理失败）以续跑方式执行，只处理缺失或失败的页面
+    - 处理失败（异常或有页面失败）时交回队列，retry_delay 秒后重试，超过最大尝试次数后不再重试
+
+    Args:
+        queue: 任务队列
+        service: PDF 处理服务
+        worker_id: worker 标识，默认 主机名-进程号
+        concurrency: 同时处理的任务数
+        poll_interval: 队列为空时的轮询间隔（秒）
+        retry_delay: 失败任务重新可见前的等待时间（秒）
+        cancel_check_interval: 检查取消标记的间隔（秒）
+    """
+
+    def __init__(self,
+                 queue: JobQueue,
+                 service: PDFProcessingService,
+                 worker_id: Optional[str] = None,
+                 concurrency: int = 1,
+                 poll_interval: float = 1.0,
+                 retry_delay: float = 5.0,
+                 cancel_check_interval: float = 1.0):
+        self.queue = queue
+        self.service = service
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.retry_delay = retry_delay
+        self.cancel_check_interval = cancel_check_interval
+
+    async def run(self, stop: Optional[asyncio.Event] = None):
+        """循环领取任务直到 stop 被设置，然后等待处理中的任务完成"""
+        stop = stop or asyncio.Event()
+        slots = asyncio.Semaphore(self.concurrency)
+        running: Set[asyncio.Task] = set()
+
+        def finished(task: asyncio.Task):
+            running.discard(task)
+            slots.release()
+
+        while not stop.is_set():
+            await slots.acquire()
+            job = await asyncio.to_thread(self.queue.claim, self.worker_id)
+            if job is None:
+                slots.release()
+                try:
+                    await asyncio.wait_for(stop.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            task = asyncio.create_task(self.handle(job))
+            running.add(task)
+            task.add_done_callback(finished)
+
+        if running:
+            await asyncio.gather(*running, return_exceptions=True)
+
+    async def handle(self, job: Job):
+        """处理一个任务，结束后确认或交回队列"""
+        if job.kind != "pdf":
+            await asyncio.to_thread(self.queue.fail, job, f"Unknown job kind: {job.kind}")
+            return
+
+        task_id = job.payload["task_id"]
+        file_path = job.payload["file_path"]
+        with tracer.span("job", trace_id=task_id, task_id=task_id, worker=self.worker_id, attempt=job.attempts):
+            if self.service.get_task_status(task_id) is None:
+                await asyncio.to_thread(self.queue.fail, job, "Task not found")
+                return
+            
+            if self.service.checkpoints.cancel_requested(task_id):
+                await self._cancel(job, task_id)
+                return
+
+            resume = job.payload.get("resume", False) or job.attempts > 1
+            if resume:
+                self.service.resume_task(task_id)
+
+            processing = asyncio.create_task(self.service.process_pdf(task_id, file_path, resume=resume))
+            watch = asyncio.create_task(self._watch(job, task_id, processing))
+            try:
+                await processing
+            except asyncio.CancelledError:
+                reason = watch.result() if watch.done() else None
+                if reason == "cancelled":
+                    logger.info(f"任务 {task_id} 已取消")
+                    await self._cancel(job, task_id)
+                    return
+                if reason != "lease_lost":
+                    raise
+                logger.warning(f"任务 {task_id} 的租约已被其他 worker 接管，放弃本次处理")
+                return
+            except Exception as e:
+                await asyncio.to_thread(self.queue.fail, job, str(e), self.retry_delay)
+                return
+            finally:
+                watch.cancel()
+                # worker 长期运行，处理完的任务不留在内存中（需要时从检查点恢复）
+                self.service.tasks.pop(task_id, None)
+
+            task = self.service.checkpoints.load_task(task_id) or {}
+            if task.get("status") == TaskStatus.FAILED:
+                await asyncio.to_thread(self.queue.fail, job, task.get("error") or "Task failed", self.retry_delay)
+            else:
+                await asyncio.to_thread(self.queue.complete, job)
+
+    async def _watch(self, job: Job, task_id: str, processing: asyncio.Task) -> str:
+        """
+        处理期间定期续约并检查取消标记
+
+        Returns:
+            停止处理的原因：lease_lost（租约已被其他 worker 接管）或 cancelled（任务已取消）
+        """
+        loop = asyncio.get_running_loop()
+        renew_at = loop.time() + self.queue.visibility_timeout / 3
+        while True:
+            await asyncio.sleep(min(self.cancel_check_interval, max(0.0, renew_at - loop.time())))
+            if self.service.checkpoints.cancel_requested(task_id):
+                processing.cancel()
+                return "cancelled"
+            if loop.time() >= renew_at:
+                if not await asyncio.to_thread(self.queue.extend, job):
+                    processing.cancel()
+                    return "lease_lost"
+                renew_at = loop.time() + self.queue.visibility_timeout / 3
+
+    async def _cancel(self, job: Job, task_id: str):
+        """标记任务已取消、清理文件并确认队列中的任务"""
+        await self.service.cancel_task(task_id)
+        await asyncio.to_thread(self.queue.complete, job)
+
+
+def create_worker(concurrency: int = 1, poll_interval: float = 1.0, worker_id: Optional[str] = None) -> Worker:
+    """按环境变量创建队列和服务（与 api.main 的配置相同）"""
+    queue = job_queue_from_env()
+    if queue is None:
+        raise SystemExit("JOB_QUEUE_URL is not set")
+    service = PDFProcessingService(
+        structured_output=os.getenv("PDF_STRUCTURED_OUTPUT", "").lower() in ("1", "true", "yes"),
+        model_client=model_client_from_env(),
+        admission=AdmissionController(max_tasks=concurrency)
+    )
+    return Worker(queue, service, worker_id=worker_id, concurrency=concurrency, poll_interval=poll_interval)
+
+
+def run_worker_process(concurrency: int, poll_interval: float, worker_id: Optional[str] = None):
+    """运行一个 worker 进程，SIGTERM / SIGINT 时处理完当前任务后退出"""
+    configure_tracing(os.getenv("TRACE_EXPORTER"))
+    worker = create_worker(concurrency, poll_interval, worker_id)
+
+    async def main():
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(sig, stop.set)
+        logger.info(f"worker {worker.worker_id} 开始领取任务（并发 {concurrency}）")
+        await worker.run(stop)
+
+    try:
+        asyncio.run(main())
+    finally:
+        worker.queue.close()
+        tracer.shutdown()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="任务队列 worker")
+    parser.add_argument("--concurrency", type=int, default=1, help="每个进程同时处理的任务数")
+    parser.add_argument("--processes", type=int, default=1, help="启动的 worker 进程数")
+    parser.add_argument("--poll-interval", type=float, default=1.0, help="队列为空时的轮询间隔（秒）")
+    parser.add_argument("--worker-id", help="worker 标识（单进程时有效），默认 主机名-进程号")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(levelname)s %(message)s")
+
+    if args.processes == 1:
+        run_worker_process(args.concurrency, args.poll_interval, args.worker_id)
+        return
+
+    processes = [
+        multiprocessing.Process(target=run_worker_process, args=(args.concurrency, args.poll_interval))
+        for _ in range(args.processes)
+    ]
+    for process in processes:
+        process.start()
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        # 子进程同样收到 SIGINT，等待其处理完当前任务
+        for process in processes:
+            process.join()
+
+
+if __name__ == "__main__":
+    main()
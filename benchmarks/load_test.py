@@ -0,0 +1,399 @@
+"""
+HTTP 压测
+
+在本进程的后台线程中用 uvicorn 启动 API（默认使用模拟模型），由多个异步虚拟客户端循环执行
+完整流程：上传 PDF（POST /tasks/）→ 轮询状态 → 下载页面图片（/images/{task_id}/{page}）→ 获取结果。
+客户端数在 --ramp 秒内线性增加到 --clients，按固定间隔输出时间序列：
+
+- 请求数、错误率和请求耗时 P50/P95（按接口汇总见最终报告）
+- 服务端事件循环延迟（定时器实际唤醒时间与预期的差值，有阻塞调用时会明显升高）
+- 进程常驻内存
+
+请求耗时 P95 首次超过 --slo 时的客户端数记为单 worker 的饱和点：
+
+    python -m benchmarks.load_test --clients 50 --ramp 60 --duration 120
+    python -m benchmarks.load_test --pdf docs/pdf/ari_vr_2024.pdf --fake-latency lognormal:1.5,0.5 --output load.json
+
+指定 --url 时压测已启动的服务，此时不测量事件循环延迟和内存。
+需要 uvicorn、httpx 和 poppler，不需要 Vertex 凭据。
+"""
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import resource
+import tempfile
+import threading
+from glob import glob
+from pathlib import Path
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+import httpx
+
+project_root = str(Path(__file__).parent.parent)
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from api.timeline import percentile
+
+TERMINAL_STATUSES = ("completed", "failed")
+IMAGE_STATUSES = ("converted", "analyzing", "completed")
+
+
+def current_rss_mb() -> float:
+    """进程当前常驻内存（MB），非 Linux 平台退化为峰值"""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+async def probe_loop_lag(samples: List[float], interval: float = 0.05):
+    """每隔 interval 秒休眠一次，记录实际唤醒时间比预期晚了多少秒"""
+    loop = asyncio.get_running_loop()
+    while True:
+        expected = loop.time() + interval
+        await asyncio.sleep(interval)
+        samples.append(max(0.0, loop.time() - expected))
+
+
+class ServerThread(threading.Thread):
+    """
+    在后台线程中运行 uvicorn，同一事件循环上运行延迟探针
+
+    Args:
+        app: ASGI 应用的导入路径（如 api.main:app）
+        host: 监听地址
+        port: 监听端口
+    """
+
+    def __init__(self, app: str, host: str = "127.0.0.1", port: int = 8765):
+        super().__init__(daemon=True, name="load-test-server")
+        import uvicorn
+
+        self.url = f"http://{host}:{port}"
+        self.server = uvicorn.Server(uvicorn.Config(app, host=host, port=port, log_level="warning"))
+        self.lag_samples: List[float] = []
+
+    def run(self):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        loop.create_task(probe_loop_lag(self.lag_samples))
+        try:
+            loop.run_until_complete(self.server.serve())
+        finally:
+            # 取消延迟探针和压测结束时仍在处理的任务
+            pending = asyncio.all_tasks(loop)
+            for task in pending:
+                task.cancel()
+            loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+            loop.close()
+
+    def wait_started(self, timeout: float = 30.0):
+        deadline = time.monotonic() + timeout
+        while not self.server.started:
+            if not self.is_alive() or time.monotonic() > deadline:
+                raise RuntimeError("Server failed to start")
+            time.sleep(0.05)
+        # 启动时在事件循环上导入应用，这段延迟不计入压测
+        self.lag_samples.clear()
+
+    def stop(self):
+        self.server.should_exit = True
+        self.join(timeout=10)
+
+
+@dataclass
+class RequestRecord:
+    at: float  # 相对压测开始的秒数
+    endpoint: str
+    seconds: float
+    ok: bool
+
+
+@dataclass
+class LoadStats:
+    """所有虚拟客户端共享的请求记录（均在压测事件循环中追加，无需加锁）"""
+    start: float = field(default_factory=time.monotonic)
+    requests: List[RequestRecord] = field(default_factory=list)
+    tasks_completed: int = 0
+    tasks_failed: int = 0
+    active_clients: int = 0
+
+
+async def timed_request(client: httpx.AsyncClient,
+                        stats: LoadStats,
+                        endpoint: str,
+                        method: str,
+                        url: str,
+                        **kwargs) -> Optional[httpx.Response]:
+    """发送请求并记录耗时；状态码 >= 400 或网络错误记为失败"""
+    start = time.monotonic()
+    try:
+        response = await client.request(method, url, **kwargs)
+    except httpx.HTTPError:
+        response = None
+    stats.requests.append(RequestRecord(
+        at=start - stats.start,
+        endpoint=endpoint,
+        seconds=time.monotonic() - start,
+        ok=response is not None and response.status_code < 400
+    ))
+    return response
+
+
+async def virtual_client(client: httpx.AsyncClient,
+                         stats: LoadStats,
+                         pdfs: List[str],
+                         deadline: float,
+                         poll_interval: float,
+                         images_per_task: int,
+                         rng: random.Random):
+    """循环执行 上传 → 轮询 → 下载图片 → 获取结果，直到压测结束"""
+    stats.active_clients += 1
+    try:
+        while time.monotonic() < deadline:
+            pdf_path = rng.choice(pdfs)
+            with open(pdf_path, "rb") as f:
+                files = {"file": (os.path.basename(pdf_path), f.read(), "application/pdf")}
+            response = await timed_request(client, stats, "POST /tasks/", "POST", "/tasks/", files=files)
+            if response is None or response.status_code >= 400:
+                await asyncio.sleep(poll_interval)
+                continue
+            task_id = response.json()["task_id"]
+
+            fetched = 0
+            status = {}
+            while time.monotonic() < deadline:
+                await asyncio.sleep(poll_interval)
+                response = await timed_request(
+                    client, stats, "GET /tasks/{id}/status", "GET", f"/tasks/{task_id}/status"
+                )
+                if response is None or response.status_code >= 400:
+                    continue
+                status = response.json()
+                # 转换完成后下载前几页图片（与前端预览一致）
+                total_pages = status.get("total_pages") or 0
+                if status["status"] in IMAGE_STATUSES and fetched < min(images_per_task, total_pages):
+                    fetched += 1
+                    await timed_request(
+                        client, stats, "GET /images/{id}/{page}", "GET", f"/images/{task_id}/{fetched}"
+                    )
+                if status["status"] in TERMINAL_STATUSES:
+                    break
+
+            if status.get("status") == "completed":
+                stats.tasks_completed += 1
+                await timed_request(client, stats, "GET /tasks/{id}/result", "GET", f"/tasks/{task_id}/result")
+            elif status.get("status") == "failed":
+                stats.tasks_failed += 1
+    finally:
+        stats.active_clients -= 1
+
+
+def summarize_window(requests: List[RequestRecord]) -> Dict:
+    seconds = [r.seconds for r in requests]
+    errors = sum(1 for r in requests if not r.ok)
+    return {
+        "requests": len(requests),
+        "error_rate": round(errors / len(requests), 4) if requests else 0.0,
+        "latency_p50": round(percentile(seconds, 0.5), 4) if seconds else None,
+        "latency_p95": round(percentile(seconds, 0.95), 4) if seconds else None
+    }
+
+
+async def sample(stats: LoadStats,
+                 server: Optional[ServerThread],
+                 interval: float,
+                 timeline: List[Dict]):
+    """每隔 interval 秒汇总一次本时间窗的请求、事件循环延迟和内存"""
+    seen_requests = 0
+    seen_lag = 0
+    while True:
+        await asyncio.sleep(interval)
+        window = stats.requests[seen_requests:]
+        seen_requests += len(window)
+        row = {
+            "t": round(time.monotonic() - stats.start, 1),
+            "clients": stats.active_clients,
+            **summarize_window(window),
+            "tasks_completed": stats.tasks_completed
+        }
+        if server is not None:
+            lag = server.lag_samples[seen_lag:]
+            seen_lag += len(lag)
+            row["loop_lag_max"] = round(max(lag), 4) if lag else None
+            row["loop_lag_p95"] = round(percentile(lag, 0.95), 4) if lag else None
+            row["rss_mb"] = round(current_rss_mb(), 1)
+        timeline.append(row)
+        print_row(row)
+
+
+async def run_load(url: str,
+                   pdfs: List[str],
+                   clients: int,
+                   ramp: float,
+                   duration: float,
+                   poll_interval: float = 0.5,
+                   images_per_task: int = 3,
+                   sample_interval: float = 1.0,
+                   server: Optional[ServerThread] = None,
+                   seed: int = 0) -> Dict:
+    """
+    压测运行中的服务
+
+    Args:
+        url: 服务地址
+        pdfs: 上传的 PDF 路径（每次随机选择）
+        clients: 虚拟客户端数上限
+        ramp: 客户端数从 1 线性增加到 clients 所用的秒数
+        duration: 压测总时长（秒）
+        poll_interval: 状态轮询间隔（秒）
+        images_per_task: 每个任务下载的页面图片数
+        sample_interval: 时间序列采样间隔（秒）
+        server: 本进程启动的服务，用于读取事件循环延迟
+        seed: 随机种子
+
+    Returns:
+        时间序列和按接口汇总的统计
+    """
+    stats = LoadStats()
+    deadline = stats.start + duration
+    timeline: List[Dict] = []
+    rng = random.Random(seed)
+    limits = httpx.Limits(max_connections=clients * 2, max_keepalive_connections=clients)
+
+    async with httpx.AsyncClient(base_url=url, timeout=60.0, limits=limits) as client:
+        sampler = asyncio.create_task(sample(stats, server, sample_interval, timeline))
+        workers = []
+        for i in range(clients):
+            start_at = stats.start + (ramp * i / max(clients - 1, 1) if clients > 1 else 0)
+            await asyncio.sleep(max(0.0, start_at - time.monotonic()))
+            if time.monotonic() >= deadline:
+                break
+            workers.append(asyncio.create_task(virtual_client(
+                client, stats, pdfs, deadline, poll_interval, images_per_task, random.Random(rng.random())
+            )))
+        await asyncio.gather(*workers)
+        sampler.cancel()
+
+    by_endpoint: Dict[str, List[RequestRecord]] = defaultdict(list)
+    for record in stats.requests:
+        by_endpoint[record.endpoint].append(record)
+    return {
+        "clients": clients,
+        "duration": duration,
+        "tasks_completed": stats.tasks_completed,
+        "tasks_failed": stats.tasks_failed,
+        "endpoints": {name: summarize_window(records) for name, records in by_endpoint.items()},
+        "timeline": timeline
+    }
+
+
+def saturation_point(timeline: List[Dict], slo: float) -> Optional[int]:
+    """请求耗时 P95 首次超过 slo 秒时的客户端数，未饱和时返回 None"""
+    for row in timeline:
+        if row["latency_p95"] is not None and row["latency_p95"] > slo:
+            return row["clients"]
+    return None
+
+
+COLUMNS = [
+    ("t", 7), ("clients", 8), ("requests", 9), ("error_rate", 11), ("latency_p50", 12),
+    ("latency_p95", 12), ("loop_lag_max", 13), ("rss_mb", 8), ("tasks_completed", 15)
+]
+
+
+def print_header():
+    print(" ".join(name.ljust(width) for name, width in COLUMNS), flush=True)
+
+
+def print_row(row: Dict):
+    print(" ".join(str(row.get(name))[:width].ljust(width) for name, width in COLUMNS), flush=True)
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="HTTP 压测（模拟模型）")
+    parser.add_argument("--pdf", nargs="+", default=sorted(glob(os.path.join(project_root, "docs", "pdf", "*.pdf"))),
+                        help="上传的 PDF，默认 docs/pdf 下的样例")
+    parser.add_argument("--clients", type=int, default=20, help="虚拟客户端数上限")
+    parser.add_argument("--ramp", type=float, default=30.0, help="客户端数增加到上限所用的秒数")
+    parser.add_argument("--duration", type=float, default=60.0, help="压测总时长（秒）")
+    parser.add_argument("--poll-interval", type=float, default=0.5, help="状态轮询间隔（秒）")
+    parser.add_argument("--images-per-task", type=int, default=3, help="每个任务下载的页面图片数")
+    parser.add_argument("--sample-interval", type=float, default=1.0, help="时间序列采样间隔（秒）")
+    parser.add_argument("--slo", type=float, default=1.0, help="请求耗时 P95 上限（秒），用于判定饱和点")
+    parser.add_argument("--url", help="压测已启动的服务，不在本进程启动")
+    parser.add_argument("--app", default="api.main:app", help="本进程启动的 ASGI 应用")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--fake-latency", default="lognormal:0.5,0.5", help="模拟模型的调用耗时分布")
+    parser.add_argument("--fake-rate-limit", type=float, default=0.0, help="模拟模型的 429 注入比例")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="把时间序列和汇总写入 JSON 文件")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None):
+    args = parse_args(argv)
+    pdfs = [os.path.abspath(p) for p in args.pdf]
+    output = os.path.abspath(args.output) if args.output else None
+    if not pdfs:
+        raise SystemExit("No PDF files to upload")
+
+    server = None
+    work_dir = None
+    url = args.url
+    if url is None:
+        # 服务的 uploads/outputs 目录相对于工作目录，在临时目录中运行
+        work_dir = tempfile.TemporaryDirectory(prefix="load-test-")
+        os.chdir(work_dir.name)
+        os.environ.setdefault("MODEL_BACKEND", "fake")
+        os.environ["FAKE_MODEL_LATENCY"] = args.fake_latency
+        os.environ["FAKE_MODEL_RATE_LIMIT_RATE"] = str(args.fake_rate_limit)
+        server = ServerThread(args.app, port=args.port)
+        server.start()
+        server.wait_started()
+        url = server.url
+
+    print_header()
+    try:
+        result = asyncio.run(run_load(
+            url,
+            pdfs,
+            clients=args.clients,
+            ramp=args.ramp,
+            duration=args.duration,
+            poll_interval=args.poll_interval,
+            images_per_task=args.images_per_task,
+            sample_interval=args.sample_interval,
+            server=server,
+            seed=args.seed
+        ))
+    finally:
+        if server is not None:
+            server.stop()
+        if work_dir is not None:
+            os.chdir(project_root)
+            work_dir.cleanup()
+
+    result["saturation_clients"] = saturation_point(result["timeline"], args.slo)
+    print()
+    for name, summary in sorted(result["endpoints"].items()):
+        print(f"{name.ljust(26)} {json.dumps(summary)}")
+    print(f"tasks completed={result['tasks_completed']} failed={result['tasks_failed']} "
+          f"saturation_clients(p95>{args.slo}s)={result['saturation_clients']}")
+    if output:
+        with open(output, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+"""
+离线流水线基准测试
+
+用 FakeModelClient 代替 Vertex AI，按上传接口的流程（预估 → 创建任务 → process_pdf）
+处理 docs/pdf 下的样例和合成的 500 页 PDF，报告每种配置的吞吐（页/秒）、
+单页耗时 P50/P99、模型调用耗时和进程峰值 RSS。
+
+每种配置在独立的子进程中运行，峰值 RSS 互不影响：
+
+    python -m benchmarks.pipeline
+    python -m benchmarks.pipeline --pdf docs/pdf/ari_vr_2024.pdf --concurrency 4 16 \\
+        --latency lognormal:1.5,0.5 --rate-limit 0 0.05 --output benchmarks/results.json
+
+指定 --replay 时改为回放录制的真实响应（见 api.recording），按原始耗时乘以 --time-scale 等待：
+
+    python -m benchmarks.pipeline --pdf docs/pdf/ari_vr_2024.pdf --replay recordings/ari.jsonl.gz --time-scale 1
+
+依赖 poppler（pdftoppm、pdfinfo），不需要 Vertex 凭据。
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import itertools
+import resource
+import statistics
+import subprocess
+import tempfile
+from glob import glob
+from pathlib import Path
+from typing import Dict, List, Optional
+
+project_root = str(Path(__file__).parent.parent)
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from api.model_client import FakeModelClient, LatencyModel, ModelClient
+from api.recording import ReplayModelClient
+from api.rendering import RenderPool
+from api.services import PDFProcessingService
+from api.timeline import percentile
+from api.tracing import InMemoryExporter, tracer
+from api.usage import UsageTracker
+from benchmarks.synthetic import write_synthetic_pdf
+
+SYNTHETIC = "synthetic-500"
+
+
+def peak_rss_mb() -> float:
+    """进程峰值常驻内存（MB）"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 以 KB 为单位，macOS 以字节为单位
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+async def run_pipeline(pdf_path: str,
+                       work_dir: str,
+                       model: ModelClient,
+                       concurrency: int,
+                       render_workers: Optional[int],
+                       structured_output: bool) -> Dict:
+    """处理一个 PDF，返回吞吐、耗时分位数和模型调用统计"""
+    service = PDFProcessingService(
+        upload_dir=os.path.join(work_dir, "uploads"),
+        output_dir=os.path.join(work_dir, "outputs"),
+        render_pool=RenderPool(render_workers),
+        max_concurrent=concurrency,
+        structured_output=structured_output,
+        usage_tracker=UsageTracker(os.path.join(work_dir, "outputs")),
+        model_client=model
+    )
+    spans = InMemoryExporter()
+    tracer.add_exporter(spans)
+
+    start = time.perf_counter()
+    estimate = await service.estimate_task(pdf_path)
+    task = service.create_task(os.path.basename(pdf_path), estimate=estimate)
+    await service.process_pdf(task.task_id, pdf_path)
+    elapsed = time.perf_counter() - start
+
+    status = service.get_task_status(task.task_id)
+    page_seconds = [s.duration_ms / 1000 for s in spans.spans if s.name == "page"]
+    timeline = status.timeline
+    return {
+        "status": status.status.value,
+        "pages": status.total_pages,
+        "seconds": round(elapsed, 3),
+        "pages_per_second": round(status.total_pages / elapsed, 3) if elapsed else None,
+        "page_p50": round(statistics.median(page_seconds), 3) if page_seconds else None,
+        "page_p99": round(percentile(page_seconds, 0.99), 3) if page_seconds else None,
+        "render_seconds": timeline.render_seconds,
+        "model_calls": timeline.model_calls,
+        "model_latency_median": timeline.model_latency_median,
+        "model_latency_p95": timeline.model_latency_p95,
+        "retries": timeline.retries,
+        "total_tokens": status.usage.total_tokens if status.usage else 0,
+        "injected": model.stats() if isinstance(model, FakeModelClient) else None,
+        "peak_rss_mb": round(peak_rss_mb(), 1)
+    }
+
+
+def run_single(args: argparse.Namespace) -> Dict:
+    """在当前进程中运行一种配置"""
+    with tempfile.TemporaryDirectory(prefix="bench-") as work_dir:
+        pdf_path = args.pdf[0]
+        if pdf_path == SYNTHETIC:
+            pdf_path = write_synthetic_pdf(os.path.join(work_dir, "synthetic.pdf"), pages=500, seed=args.seed)
+        if args.replay:
+            model = ReplayModelClient(args.replay, time_scale=args.time_scale)
+        else:
+            model = FakeModelClient(
+                latency=LatencyModel.parse(args.latency[0]),
+                rate_limit_rate=args.rate_limit[0],
+                error_rate=args.error_rate,
+                seed=args.seed
+            )
+        result = asyncio.run(run_pipeline(
+            pdf_path,
+            work_dir,
+            model,
+            concurrency=args.concurrency[0],
+            render_workers=args.render_workers,
+            structured_output=args.structured
+        ))
+    return {
+        "pdf": args.pdf[0],
+        "concurrency": args.concurrency[0],
+        "latency": args.latency[0],
+        "rate_limit": args.rate_limit[0],
+        **result
+    }
+
+
+def run_matrix(args: argparse.Namespace) -> List[Dict]:
+    """每种配置启动一个子进程运行，汇总结果"""
+    results = []
+    for pdf, concurrency, latency, rate_limit in itertools.product(
+        args.pdf, args.concurrency, args.latency, args.rate_limit
+    ):
+        command = [
+            sys.executable, "-m", "benchmarks.pipeline", "--single",
+            "--pdf", pdf,
+            "--concurrency", str(concurrency),
+            "--latency", latency,
+            "--rate-limit", str(rate_limit),
+            "--error-rate", str(args.error_rate),
+            "--seed", str(args.seed)
+        ]
+        if args.render_workers:
+            command += ["--render-workers", str(args.render_workers)]
+        if args.structured:
+            command.append("--structured")
+        if args.replay:
+            command += ["--replay", args.replay, "--time-scale", str(args.time_scale)]
+        completed = subprocess.run(command, cwd=project_root, capture_output=True, text=True)
+        if completed.returncode != 0:
+            print(f"FAILED {pdf} concurrency={concurrency}: {completed.stderr.strip()[-500:]}", file=sys.stderr)
+            continue
+        result = json.loads(completed.stdout.strip().splitlines()[-1])
+        results.append(result)
+        print_row(result)
+    return results
+
+
+COLUMNS = [
+    ("pdf", 24), ("concurrency", 11), ("latency", 20), ("rate_limit", 10), ("pages", 6),
+    ("pages_per_second", 16), ("page_p50", 9), ("page_p99", 9), ("retries", 8), ("peak_rss_mb", 11)
+]
+
+
+def print_header():
+    print(" ".join(name.ljust(width) for name, width in COLUMNS))
+
+
+def print_row(result: Dict):
+    values = []
+    for name, width in COLUMNS:
+        value = result.get(name)
+        if name == "pdf":
+            value = os.path.basename(str(value))
+        values.append(str(value)[:width].ljust(width))
+    print(" ".join(values), flush=True)
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="离线流水线基准测试（FakeModelClient）")
+    parser.add_argument("--pdf", nargs="+",
+                        default=sorted(glob(os.path.join(project_root, "docs", "pdf", "*.pdf"))) + [SYNTHETIC],
+                        help=f"PDF 路径，{SYNTHETIC} 表示合成的 500 页 PDF")
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[4, 16], help="模型调用并发上限")
+    parser.add_argument("--latency", nargs="+", default=["lognormal:0.5,0.5"],
+                        help="模拟的调用耗时分布，如 lognormal:1.5,0.5、constant:0.2")
+    parser.add_argument("--rate-limit", nargs="+", type=float, default=[0.0, 0.05], help="429 注入比例")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="503 注入比例")
+    parser.add_argument("--render-workers", type=int, default=None, help="渲染线程数")
+    parser.add_argument("--structured", action="store_true", help="结构化输出模式")
+    parser.add_argument("--replay", help="回放录制的存档（gzip JSONL），代替模拟模型")
+    parser.add_argument("--time-scale", type=float, default=1.0, help="回放耗时倍数，0 为不等待")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="把全部结果写入 JSON 文件")
+    parser.add_argument("--single", action="store_true", help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None):
+    args = parse_args(argv)
+    if args.single:
+        print(json.dumps(run_single(args), ensure_ascii=False))
+        return
+
+    print_header()
+    results = run_matrix(args)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+import random
+from typing import List
+
+# 用于生成正文的词表（仅 ASCII，基础 14 字体无需嵌入）
+WORDS = (
+    "lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod tempor "
+    "incididunt ut labore et dolore magna aliqua enim ad minim veniam quis nostrud "
+    "exercitation ullamco laboris nisi aliquip ex ea commodo consequat revenue growth "
+    "quarter margin forecast segment region total market share operating income"
+).split()
+
+PAGE_WIDTH, PAGE_HEIGHT = 612, 792
+PAGE_KINDS = ("text", "text", "table", "chart", "mixed", "blank")
+
+
+def _text_block(rng: random.Random, x: int, y: int, lines: int, size: int = 11) -> List[str]:
+    ops = [f"BT /F1 {size} Tf {size + 3} TL {x} {y} Td"]
+    for _ in range(lines):
+        line = " ".join(rng.choice(WORDS) for _ in range(rng.randint(9, 13)))
+        ops.append(f"({line}) Tj T*")
+    ops.append("ET")
+    return ops
+
+
+def _table(rng: random.Random, x: int, y: int, rows: int, cols: int) -> List[str]:
+    cell_w, cell_h = (PAGE_WIDTH - 2 * x) // cols, 22
+    ops = ["0.8 w"]
+    for r in range(rows + 1):
+        ops.append(f"{x} {y - r * cell_h} m {x + cols * cell_w} {y - r * cell_h} l S")
+    for c in range(cols + 1):
+        ops.append(f"{x + c * cell_w} {y} m {x + c * cell_w} {y - rows * cell_h} l S")
+    for r in range(rows):
+        for c in range(cols):
+            value = rng.choice(WORDS) if r == 0 else f"{rng.uniform(0, 1000):.1f}"
+            ops.append(
+                f"BT /F1 9 Tf {x + c * cell_w + 4} {y - (r + 1) * cell_h + 7} Td ({value}) Tj ET"
+            )
+    return ops
+
+
+def _chart(rng: random.Random, x: int, y: int, width: int, height: int) -> List[str]:
+    bars = rng.randint(4, 8)
+    bar_w = width // (bars * 2)
+    ops = ["1 w", f"{x} {y} m {x} {y + height} l S", f"{x} {y} m {x + width} {y} l S"]
+    for i in range(bars):
+        bar_h = rng.randint(height // 6, height - 10)
+        shade = 0.2 + 0.1 * (i % 5)
+        ops.append(f"{shade:.1f} 0.4 0.8 rg {x + bar_w // 2 + i * 2 * bar_w} {y} {bar_w} {bar_h} re f")
+    ops.append("0 0 0 rg")
+    return ops
+
+
+def page_content(kind: str, rng: random.Random) -> str:
+    """生成一页的内容流（文字、表格、图表或混合版式）"""
+    ops: List[str] = []
+    if kind == "text":
+        ops += _text_block(rng, 72, 720, 40)
+    elif kind == "table":
+        ops += _text_block(rng, 72, 730, 2, size=14)
+        ops += _table(rng, 72, 680, rows=18, cols=5)
+    elif kind == "chart":
+        ops += _text_block(rng, 72, 730, 2, size=14)
+        ops += _chart(rng, 90, 220, 430, 420)
+    elif kind == "mixed":
+        ops += _text_block(rng, 72, 730, 14)
+        ops += _table(rng, 72, 510, rows=6, cols=4)
+        ops += _chart(rng, 90, 90, 430, 220)
+    return "\n".join(ops)
+
+
+def write_synthetic_pdf(path: str, pages: int = 500, seed: int = 0) -> str:
+    """
+    生成合成的多页 PDF（矢量文字、表格线和柱状图，文件很小，渲染开销接近真实文档）
+
+    页面版式按 PAGE_KINDS 随机选择，包含少量空白页；同一 seed 生成的文件完全相同。
+
+    Args:
+        path: 输出路径
+        pages: 页数
+        seed: 随机种子
+
+    Returns:
+        输出路径
+    """
+    rng = random.Random(seed)
+    objects: List[bytes] = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"",  # 页面树，所有页面生成后填充
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    page_ids = []
+    for _ in range(pages):
+        content = page_content(rng.choice(PAGE_KINDS), rng).encode("latin-1")
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(content), content))
+        content_id = len(objects)
+        objects.append((
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {PAGE_WIDTH} {PAGE_HEIGHT}] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {content_id} 0 R >>"
+        ).encode("latin-1"))
+        page_ids.append(len(objects))
+    kids = " ".join(f"{i} 0 R" for i in page_ids)
+    objects[1] = f"<< /Type /Pages /Kids [{kids}] /Count {pages} >>".encode("latin-1")
+
+    with open(path, "wb") as f:
+        f.write(b"%PDF-1.4\n")
+        offsets = []
+        for number, body in enumerate(objects, 1):
+            offsets.append(f.tell())
+            f.write(b"%d 0 obj\n%s\nendobj\n" % (number, body))
+        xref = f.tell()
+        f.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+        for offset in offsets:
+            f.write(b"%010d 00000 n \n" % offset)
+        f.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref))
+    return path
@@ -2,7 +2,7 @@ import os
 import json
 import argparse
 import asyncio
-from typing import Dict, List, Optional
+from typing import Callable, Dict, List, Optional, Set, Tuple
 from pathlib import Path
 import tempfile
 from concurrent.futures import ThreadPoolExecutor
@@ -15,10 +15,13 @@ import vertexai
 from vertexai.generative_models import GenerativeModel, Part, GenerationConfig, Image as VertexImage, SafetySetting
 
 # PDF处理
-from pdf2image import convert_from_path
+from pdf2image import convert_from_path, pdfinfo_from_path
 from PIL import Image as PILImage
 import pytesseract
 
+from api.model_client import model_client_from_env
+from api.profiling import profile_task
+
 def setup_vertex_ai():
     """初始化 Vertex AI"""
     try:
@@ -30,13 +33,64 @@ def setup_vertex_ai():
         print(f"Vertex AI 初始化失败: {str(e)}")
         raise
 
-def process_with_pdf2image(pdf_path: str, output_dir: str) -> List[Dict]:
+def render_pages(pdf_path: str, skip_pages: Optional[Set[int]] = None) -> List[Tuple[int, PILImage.Image]]:
+    """
+    将 PDF 渲染为图片，跳过已完成的页面
+    
+    Args:
+        pdf_path: PDF文件路径
+        skip_pages: 需要跳过的页码集合（从1开始）
+    
+    Returns:
+        List[Tuple[int, PILImage.Image]]: (页码, 图片) 列表
+    """
+    if not skip_pages:
+        return list(enumerate(convert_from_path(pdf_path), start=1))
+    
+    # 续跑时只渲染缺失的页面
+    total_pages = pdfinfo_from_path(pdf_path)["Pages"]
+    return [
+        (page_num, convert_from_path(pdf_path, first_page=page_num, last_page=page_num)[0])
+        for page_num in range(1, total_pages + 1)
+        if page_num not in skip_pages
+    ]
+
+def load_completed_pages(output_dir: str) -> Dict[int, Dict]:
+    """
+    读取输出目录中已成功处理的页面（用于断点续跑）
+    
+    Args:
+        output_dir: 输出目录
+    
+    Returns:
+        Dict[int, Dict]: 页码到页面结果的映射，不包含出错的页面
+    """
+    completed = {}
+    if not os.path.isdir(output_dir):
+        return completed
+    
+    for name in os.listdir(output_dir):
+        if not (name.startswith('page_') and name.endswith('.json')):
+            continue
+        try:
+            with open(os.path.join(output_dir, name), 'r', encoding='utf-8') as f:
+                page_content = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            continue
+        if 'error' not in page_content:
+            completed[page_content['page_number']] = page_content
+    return completed
+
+def process_with_pdf2image(pdf_path: str, output_dir: str, skip_pages: Optional[Set[int]] = None,
+                           on_page_done: Optional[Callable[[Dict], None]] = None) -> List[Dict]:
     """
     将 PDF 转换为图片并进行处理
     
     Args:
         pdf_path: PDF文件路径
         output_dir: 输出目录
+        skip_pages: 需要跳过的页码集合（续跑时为已完成页面）
+        on_page_done: 每页完成后的回调（用于立即写出检查点）
     
     Returns:
         List[Dict]: 每页的处理结果
@@ -46,10 +100,10 @@ def process_with_pdf2image(pdf_path: str, output_dir: str) -> List[Dict]:
     os.makedirs(images_dir, exist_ok=True)
     
     # 转换PDF为图片
-    images = convert_from_path(pdf_path)
+    images = render_pages(pdf_path, skip_pages)
     pages_content = []
     
-    for i, image in enumerate(images, start=1):
+    for i, image in images:
         # 保存图片
         image_path = os.path.join(images_dir, f'page_{i}.png')
         image.save(image_path, 'PNG')
@@ -87,6 +141,8 @@ def process_with_pdf2image(pdf_path: str, output_dir: str) -> List[Dict]:
         }
         
         pages_content.append(page_content)
+        if on_page_done:
+            on_page_done(page_content)
     
     return pages_content
 
@@ -188,7 +244,10 @@ async def process_single_page(model: GenerativeModel, page_num: int, image: PILI
             "error": str(e)
         }
 
-async def process_with_vllm(pdf_path: str, output_dir: str, max_concurrent: int = 3) -> List[Dict]:
+async def process_with_vllm(pdf_path: str, output_dir: str, max_concurrent: int = 3,
+                            skip_pages: Optional[Set[int]] = None,
+                            on_page_done: Optional[Callable[[Dict], None]] = None,
+                            backend: Optional[str] = None) -> List[Dict]:
     """
     将 PDF 转换为图片并使用 Vertex AI Vision 进行分析
     
@@ -196,6 +255,10 @@ async def process_with_vllm(pdf_path: str, output_dir: str, max_concurrent: int
         pdf_path: PDF文件路径
         output_dir: 输出目录
         max_concurrent: 最大并发数
+        skip_pages: 需要跳过的页码集合（续跑时为已完成页面）
+        on_page_done: 每页完成后的回调（用于立即写出检查点）
+        backend: 模型后端（vertex、fake、record 或 replay，参数见 api.model_client.model_client_from_env），
+            未指定时使用环境变量 MODEL_BACKEND
     
     Returns:
         List[Dict]: 每页的处理结果
@@ -208,17 +271,20 @@ async def process_with_vllm(pdf_path: str, output_dir: str, max_concurrent: int
     
     # 将PDF转换为图片
     print("开始转换 PDF 为图片...")
-    images = convert_from_path(pdf_path)
+    images = render_pages(pdf_path, skip_pages)
     total_pages = len(images)
-    print(f"PDF共有 {total_pages} 页")
-    
-    # 初始化 Vertex AI
-    print("初始化 Vertex AI...")
-    setup_vertex_ai()
+    print(f"待处理 {total_pages} 页")
     
-    # 初始化 Gemini Pro Vision 模型
-    print("初始化 Gemini Pro Vision 模型...")
-    model = GenerativeModel("gemini-1.5-pro-002")
+    # 初始化模型（fake 后端不需要 Vertex AI）
+    model = model_client_from_env(backend)
+    if model is None:
+        print("初始化 Vertex AI...")
+        setup_vertex_ai()
+        
+        print("初始化 Gemini Pro Vision 模型...")
+        model = GenerativeModel("gemini-1.5-pro-002")
+    else:
+        print(f"使用模型后端: {backend or os.getenv('MODEL_BACKEND')}")
     
     # 设置生成配置
     generation_config = GenerationConfig(
@@ -252,7 +318,7 @@ async def process_with_vllm(pdf_path: str, output_dir: str, max_concurrent: int
     
     # 创建所有任务
     print("创建处理任务...")
-    for i, image in enumerate(images, start=1):
+    for i, image in images:
         task = asyncio.create_task(process_with_semaphore(i, image))
         tasks.append(task)
     print(f"已创建 {len(tasks)} 个任务")
@@ -264,6 +330,8 @@ async def process_with_vllm(pdf_path: str, output_dir: str, max_concurrent: int
         for coro in asyncio.as_completed(tasks):
             result = await coro
             pages_content.append(result)
+            if on_page_done:
+                on_page_done(result)
             pbar.update(1)
             print(f"已完成 {len(pages_content)}/{total_pages} 页")
     
@@ -304,7 +372,34 @@ def create_markdown_output(content: Dict, method: str) -> str:
     
     return markdown
 
-async def async_process_pdf(pdf_path: str, output_dir: str = "output", method: str = "pdf2image", max_concurrent: int = 5) -> None:
+def save_page_output(page_content: Dict, output_dir: str, method: str) -> None:
+    """
+    保存单页的 Markdown 和 JSON 输出（每页完成即写出，作为续跑的检查点）
+    
+    Args:
+        page_content: 页面内容
+        output_dir: 输出目录路径
+        method: 处理方法 ('pdf2image' 或 'vllm')
+    """
+    page_num = page_content['page_number']
+    
+    # 生成Markdown
+    markdown_content = create_markdown_output(page_content, method)
+    
+    # 保存Markdown文件
+    markdown_file = os.path.join(output_dir, f'page_{page_num}.md')
+    with open(markdown_file, 'w', encoding='utf-8') as f:
+        f.write(markdown_content)
+    
+    # 保存JSON文件（先写临时文件再替换，避免中断时留下不完整的检查点）
+    json_file = os.path.join(output_dir, f'page_{page_num}.json')
+    with open(f'{json_file}.tmp', 'w', encoding='utf-8') as f:
+        json.dump(page_content, f, ensure_ascii=False, indent=2)
+    os.replace(f'{json_file}.tmp', json_file)
+
+async def async_process_pdf(pdf_path: str, output_dir: str = "output", method: str = "pdf2image",
+                            max_concurrent: int = 5, resume: bool = False,
+                            backend: Optional[str] = None, profile: bool = False) -> None:
     """
     异步处理PDF文件
     
@@ -313,34 +408,33 @@ async def async_process_pdf(pdf_path: str, output_dir: str = "output", method: s
         output_dir: 输出目录路径
         method: 处理方法 ('pdf2image' 或 'vllm')
         max_concurrent: 最大并发数
+        resume: 是否续跑（跳过输出目录中已成功处理的页面）
+        backend: 模型后端（vertex、fake、record 或 replay），未指定时使用环境变量 MODEL_BACKEND
+        profile: 是否采样剖析处理过程，结果（folded stacks）写入输出目录的 profile.folded
     """
     try:
         os.makedirs(output_dir, exist_ok=True)
         
-        # 根据选择的方法处理PDF
-        if method == "pdf2image":
-            pages_content = process_with_pdf2image(pdf_path, output_dir)
-        else:  # vllm
-            pages_content = await process_with_vllm(pdf_path, output_dir, max_concurrent)
+        completed_pages = load_completed_pages(output_dir) if resume else {}
+        if completed_pages:
+            print(f"续跑模式：跳过已完成的 {len(completed_pages)} 页")
         
-        # 处理每一页
-        for page_content in pages_content:
-            page_num = page_content['page_number']
-            
-            # 生成Markdown
-            markdown_content = create_markdown_output(page_content, method)
-            
-            # 保存Markdown文件
-            markdown_file = os.path.join(output_dir, f'page_{page_num}.md')
-            with open(markdown_file, 'w', encoding='utf-8') as f:
-                f.write(markdown_content)
-            
-            # 保存JSON文件
-            json_file = os.path.join(output_dir, f'page_{page_num}.json')
-            with open(json_file, 'w', encoding='utf-8') as f:
-                json.dump(page_content, f, ensure_ascii=False, indent=2)
+        # 每页完成后立即写出结果
+        def on_page_done(page_content: Dict) -> None:
+            save_page_output(page_content, output_dir, method)
+        
+        # 根据选择的方法处理PDF
+        profile_path = os.path.join(output_dir, "profile.folded") if profile else None
+        with profile_task(profile_path):
+            if method == "pdf2image":
+                process_with_pdf2image(pdf_path, output_dir, set(completed_pages), on_page_done)
+            else:  # vllm
+                await process_with_vllm(pdf_path, output_dir, max_concurrent,
+                                        set(completed_pages), on_page_done, backend)
         
         print(f"处理完成。输出目录: {output_dir}")
+        if profile_path:
+            print(f"采样剖析结果: {profile_path}")
         
     except Exception as e:
         print(f"处理PDF时出错: {e}")
@@ -354,6 +448,13 @@ def main():
                        default='pdf2image', help='PDF处理方法')
     parser.add_argument('--max_concurrent', type=int, default=5, 
                        help='最大并发数（仅适用于vllm方法）')
+    parser.add_argument('--resume', action='store_true',
+                       help='续跑：只处理输出目录中缺失或失败的页面')
+    parser.add_argument('--backend', choices=['vertex', 'fake', 'record', 'replay'], default=None,
+                       help='模型后端（fake 为本地模拟模型；record / replay 录制或回放 MODEL_ARCHIVE），'
+                            '默认使用环境变量 MODEL_BACKEND')
+    parser.add_argument('--profile', action='store_true',
+                       help='采样剖析处理过程，火焰图数据写入输出目录的 profile.folded')
     args = parser.parse_args()
     
     # 运行异步主函数
@@ -361,7 +462,10 @@ def main():
         args.pdf_path, 
         args.output_dir, 
         args.method,
-        args.max_concurrent
+        args.max_concurrent,
+        args.resume,
+        args.backend,
+        args.profile
     ))
 
 if __name__ == "__main__":
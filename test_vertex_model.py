@@ -14,6 +14,8 @@ from pdf2image import convert_from_path
 from PIL import Image
 import io
 
+from api.model_client import model_client_from_env
+
 class TestVertexModelParsing(unittest.TestCase):
     def setUp(self):
         """测试初始化"""
@@ -29,6 +31,11 @@ class TestVertexModelParsing(unittest.TestCase):
         # 创建输出目录
         Path(self.output_dir).mkdir(parents=True, exist_ok=True)
         
+        # 设置 MODEL_BACKEND=replay 和 MODEL_ARCHIVE 时离线回放录制的响应（record 为录制）
+        self.model = model_client_from_env()
+        if self.model is not None:
+            return
+        
         # 初始化 Vertex AI
         try:
             vertexai.init(project=self.project_id, location=self.location)
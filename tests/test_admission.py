@@ -0,0 +1,84 @@
+import sys
+import asyncio
+from pathlib import Path
+
+import pytest
+
+# 添加项目根目录到 Python 路径
+project_root = str(Path(__file__).parent.parent)
+sys.path.insert(0, project_root)
+
+from api.admission import AdmissionController, AdmissionRejected
+
+def test_tasks_queue_beyond_max_tasks():
+    """测试超过并发上限的任务排队，按接收顺序在名额空出后开始"""
+    admission = AdmissionController(max_tasks=2, seconds_per_page=1.0)
+    started = []
+
+    async def run_task(task_id: str, release: asyncio.Event):
+        async with admission.slot(task_id):
+            started.append(task_id)
+            await release.wait()
+
+    async def run():
+        releases = {task_id: asyncio.Event() for task_id in "abcd"}
+        for task_id in "abcd":
+            assert admission.admit(task_id, pages=10) == (None if task_id in "ab" else "abcd".index(task_id) - 2)
+        tasks = [asyncio.create_task(run_task(t, releases[t])) for t in "abcd"]
+        await asyncio.sleep(0.01)
+        assert started == ["a", "b"]
+        assert admission.position("c") == 0 and admission.position("d") == 1
+        assert admission.stats() == {"running": 2, "queued": 2, "pages": 40, "bytes": 0}
+        # c 等 a、b 中先结束的一个（约 10 秒），d 再等 c 或另一个
+        assert 9 < admission.estimated_wait("c") <= 10
+        assert admission.estimated_wait("d") >= admission.estimated_wait("c")
+        assert admission.estimated_start("a") is None and admission.estimated_start("c") is not None
+
+        releases["b"].set()
+        await asyncio.sleep(0.01)
+        assert started == ["a", "b", "c"]
+        assert admission.position("d") == 0
+
+        for release in releases.values():
+            release.set()
+        await asyncio.gather(*tasks)
+        assert admission.stats()["running"] == 0
+
+    asyncio.run(run())
+
+def test_rejects_when_saturated():
+    """测试超过排队数、页数或字节数上限时拒绝，系统空闲时总是接收"""
+    admission = AdmissionController(max_tasks=1, max_pages=100, max_bytes=1000, max_queued=1)
+
+    # 超大文档在系统空闲时也接收
+    admission.admit("big", pages=500, size=5000)
+    with pytest.raises(AdmissionRejected) as error:
+        admission.admit("small", pages=1, size=1)
+    assert error.value.reason == "pages" and error.value.retry_after >= 1
+    admission.release("big")
+
+    admission.admit("a", pages=10, size=100)
+    admission.admit("b", pages=10, size=100)
+    with pytest.raises(AdmissionRejected) as error:
+        admission.admit("c", pages=10, size=100)
+    assert error.value.reason == "queue_full"
+    admission.release("a")
+    assert admission.admit("c", pages=10, size=100) == 0
+
+def test_cancelled_waiter_frees_its_place():
+    """测试排队中被取消的任务不再占用位置"""
+    admission = AdmissionController(max_tasks=1)
+
+    async def run():
+        await admission.acquire("a")
+        waiting = asyncio.create_task(admission.acquire("b"))
+        await asyncio.sleep(0.01)
+        assert admission.position("b") == 0
+        waiting.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+        assert admission.position("b") is None and admission.stats()["queued"] == 0
+        admission.release("a")
+        await asyncio.wait_for(admission.acquire("c"), 1)
+
+    asyncio.run(run())
@@ -0,0 +1,76 @@
+import sys
+import asyncio
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+project_root = str(Path(__file__).parent.parent)
+sys.path.insert(0, project_root)
+
+from api.analysis import PageAnalyzer
+
+class FakeResponse:
+    def __init__(self, text: str):
+        self.text = text
+
+class FakeModel:
+    """模拟模型：记录调用次数和最大并发数，可注入前若干次失败"""
+
+    def __init__(self, failures: int = 0):
+        self.calls = 0
+        self.failures = failures
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def generate_content_async(self, contents, generation_config=None):
+        self.calls += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(0.01)
+            if self.failures:
+                self.failures -= 1
+                raise RuntimeError("429 rate limit exceeded")
+            return FakeResponse(f"response {self.calls}")
+        finally:
+            self.in_flight -= 1
+
+CONFIG = {"max_output_tokens": 2048, "temperature": 0.1}
+
+def test_concurrency_is_bounded():
+    """测试模型调用并发数不超过上限"""
+    model = FakeModel()
+    analyzer = PageAnalyzer(model, max_concurrent=2)
+
+    async def run():
+        await asyncio.gather(*[
+            analyzer.generate("prompt", f"page {i}".encode(), CONFIG) for i in range(8)
+        ])
+
+    asyncio.run(run())
+    assert model.calls == 8
+    assert model.max_in_flight == 2
+
+def test_identical_requests_are_cached():
+    """测试相同图片和提示词只调用一次模型"""
+    model = FakeModel()
+    analyzer = PageAnalyzer(model)
+
+    async def run():
+        first = await analyzer.generate("prompt", b"image", CONFIG)
+        second = await analyzer.generate("prompt", b"image", CONFIG)
+        other = await analyzer.generate("other prompt", b"image", CONFIG)
+        return first, second, other
+
+    first, second, other = asyncio.run(run())
+    assert first is second
+    assert other.text != first.text
+    assert model.calls == 2
+
+def test_retries_after_failure():
+    """测试失败后重试"""
+    model = FakeModel(failures=1)
+    analyzer = PageAnalyzer(model, max_retries=3)
+
+    response = asyncio.run(analyzer.generate("prompt", b"image", CONFIG))
+    assert response.text == "response 2"
+    assert model.calls == 2
@@ -0,0 +1,93 @@
+import os
+import sys
+import time
+import asyncio
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+project_root = str(Path(__file__).parent.parent)
+sys.path.insert(0, project_root)
+
+from api.admission import AdmissionController
+from api.model_client import FakeModelClient
+from api.models import TaskStatus
+from api.services import PDFProcessingService
+from api.task_runner import TaskRunner
+from api.usage import UsageTracker, empty_usage
+
+def test_runner_cancel_waits_for_cleanup():
+    """测试取消任务的所有协程并等待 finally 中的清理完成"""
+    runner = TaskRunner()
+    cleaned = []
+
+    async def work(name: str):
+        try:
+            await asyncio.sleep(60)
+        finally:
+            await asyncio.sleep(0.01)
+            cleaned.append(name)
+
+    async def run():
+        runner.start("t1", work("a"))
+        runner.start("t1", work("b"))
+        runner.start("t2", work("c"))
+        await asyncio.sleep(0)
+        assert runner.running("t1")
+        assert await runner.cancel("t1", timeout=1)
+        assert sorted(cleaned) == ["a", "b"] and not runner.running("t1")
+        assert runner.running("t2")
+        assert await runner.cancel("missing")
+        await runner.cancel("t2")
+
+    asyncio.run(run())
+
+def test_service_cancel_stops_work_and_frees_resources(tmp_path):
+    """测试取消运行中和排队中的任务：协程立即停止，名额交还，文件删除"""
+    service = PDFProcessingService(
+        upload_dir=str(tmp_path / "uploads"),
+        output_dir=str(tmp_path / "outputs"),
+        model_client=FakeModelClient(),
+        admission=AdmissionController(max_tasks=1)
+    )
+    started = []
+
+    async def slow_process(task_id, file_path, resume, work):
+        # 模拟渲染出页面图片后等待模型调用
+        image_dir = os.path.join(service.output_dir, task_id, "images")
+        os.makedirs(image_dir, exist_ok=True)
+        Path(image_dir, "page_1.png").write_bytes(b"png")
+        service.checkpoints.save_page(task_id, 1, {"page_number": 1, "content": "x"})
+        service._record_usage(task_id, dict(empty_usage(), total_tokens=100, model_calls=1))
+        started.append(task_id)
+        await asyncio.sleep(60)
+
+    service._process_pdf = slow_process
+
+    async def run():
+        tasks = [service.create_task("a.pdf").task_id, service.create_task("b.pdf").task_id]
+        for task_id in tasks:
+            file_path = os.path.join(service.upload_dir, f"{task_id}.pdf")
+            Path(file_path).write_bytes(b"%PDF")
+            service.runner.start(task_id, service.process_pdf(task_id, file_path))
+        await asyncio.sleep(0.05)
+        assert started == tasks[:1] and service.admission.position(tasks[1]) == 0
+
+        # 先取消排队中的任务，它不会再开始
+        start = time.perf_counter()
+        for task_id in reversed(tasks):
+            response = await service.cancel_task(task_id, timeout=1)
+            assert response.status == TaskStatus.CANCELLED and response.error == "Cancelled"
+        assert time.perf_counter() - start < 1
+        assert service.admission.stats() == {"running": 0, "queued": 0, "pages": 0, "bytes": 0}
+        assert started == tasks[:1]
+        return tasks
+
+    tasks = asyncio.run(run())
+    for task_id in tasks:
+        assert not os.path.exists(os.path.join(service.upload_dir, f"{task_id}.pdf"))
+        assert os.listdir(os.path.join(service.output_dir, task_id)) == ["checkpoints"]
+        assert service.checkpoints.load_pages(task_id) == {}
+        assert service.checkpoints.load_task(task_id)["status"] == TaskStatus.CANCELLED
+    assert "image_paths" not in service.tasks[tasks[0]]
+    # 已取消任务的用量写入共享的 usage.json
+    assert UsageTracker(service.output_dir).get("anonymous")["total_tokens"] == 100
@@ -0,0 +1,41 @@
+import os
+import sys
+import pytest
+from datetime import datetime
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+project_root = str(Path(__file__).parent.parent)
+sys.path.insert(0, project_root)
+
+from api.checkpoint import CheckpointStore
+
+@pytest.fixture
+def store(tmp_path):
+    """创建检查点存储实例"""
+    return CheckpointStore(str(tmp_path))
+
+def test_manifest_round_trip(store):
+    """测试任务清单的保存和读取"""
+    now = datetime.now()
+    store.save_task("task-1", {
+        "task_id": "task-1",
+        "status": "analyzing",
+        "created_at": now,
+        "total_pages": 3
+    })
+
+    manifest = store.load_task("task-1")
+    assert manifest["status"] == "analyzing"
+    assert manifest["created_at"] == now.isoformat()
+    assert manifest["total_pages"] == 3
+    assert store.load_task("missing") is None
+
+def test_failed_page_overwritten_on_success(store):
+    """测试失败页面重跑成功后覆盖检查点，且不残留临时文件"""
+    store.save_page_error("task-1", 1, "rate limit exceeded")
+    store.save_page("task-1", 1, {"page_number": 1, "content": "ok", "confidence": 0.9})
+
+    assert store.load_pages("task-1")[1]["content"] == "ok"
+    checkpoint_dir = os.path.join(store.root_dir, "task-1", "checkpoints")
+    assert not [f for f in os.listdir(checkpoint_dir) if f.endswith(".tmp")]
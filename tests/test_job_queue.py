@@ -0,0 +1,222 @@
+import sys
+import time
+import asyncio
+import threading
+from pathlib import Path
+
+import pytest
+
+# 添加项目根目录到 Python 路径
+project_root = str(Path(__file__).parent.parent)
+sys.path.insert(0, project_root)
+
+from api.checkpoint import CheckpointStore
+from api.job_queue import JobStatus, RedisJobQueue, SQLiteJobQueue, create_job_queue
+from api.models import TaskStatus
+from api.worker import Worker
+
+@pytest.fixture(params=["sqlite", "redis"])
+def make_queue(request, tmp_path):
+    """
+    返回创建队列的函数；每次调用得到同一个队列的新连接（模拟不同进程）
+
+    redis 后端使用 fakeredis（需要 pip install "fakeredis[lua]"，未安装时跳过）
+    """
+    if request.param == "sqlite":
+        path = str(tmp_path / "jobs.db")
+        return lambda **kwargs: SQLiteJobQueue(path, **kwargs)
+
+    fakeredis = pytest.importorskip("fakeredis")
+    pytest.importorskip("lupa")
+    server = fakeredis.FakeServer()
+    return lambda **kwargs: RedisJobQueue(
+        client=fakeredis.FakeRedis(server=server, decode_responses=True), **kwargs
+    )
+
+def test_claim_is_exclusive_across_connections(make_queue):
+    """测试多个进程（各自的连接）同时领取时每个任务只被领取一次"""
+    queue = make_queue()
+    job_ids = [queue.enqueue("pdf", {"n": i}) for i in range(50)]
+    assert queue.depth() == 50
+    assert queue.position(job_ids[0]) == 0
+    assert queue.position(job_ids[10]) == 10
+
+    claimed = []
+
+    def worker(name: str):
+        own_queue = make_queue()
+        while True:
+            job = own_queue.claim(name)
+            if job is None:
+                return
+            claimed.append(job.job_id)
+
+    threads = [threading.Thread(target=worker, args=(f"w{i}",)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(claimed) == sorted(job_ids)
+    assert queue.depth() == 0
+    assert queue.position(job_ids[0]) is None
+
+def test_lease_expiry_and_retries(make_queue):
+    """测试租约过期后重新可见、过期的租约不能再确认、超过最大尝试次数后标记失败"""
+    queue = make_queue(visibility_timeout=0.1, max_attempts=2)
+    job_id = queue.enqueue("pdf", {"task_id": "t1"})
+
+    first = queue.claim("w1")
+    assert first.attempts == 1
+    assert queue.claim("w2") is None
+
+    # w1 崩溃，租约过期后 w2 领取
+    time.sleep(0.15)
+    second = queue.claim("w2")
+    assert second.job_id == job_id and second.attempts == 2
+    assert not queue.extend(first)
+    queue.complete(first)
+    assert queue.status(job_id)["status"] == JobStatus.RUNNING
+
+    # 最后一次尝试失败后不再重试
+    queue.fail(second, "boom")
+    assert queue.status(job_id) == {"status": "failed", "attempts": 2, "error": "boom"}
+    assert queue.claim("w3") is None
+
+def test_redis_expired_lease_cannot_be_finished(make_queue):
+    """测试 Redis 队列中租约过期被移回队列后（尚未被其他 worker 领取），原 worker 不能续租、确认或标记失败"""
+    queue = make_queue(visibility_timeout=0.1, max_attempts=3)
+    if not isinstance(queue, RedisJobQueue):
+        pytest.skip("SQLite 队列在重新领取时才回收过期的租约")
+    job_id = queue.enqueue("pdf", {})
+    job = queue.claim("w1")
+    time.sleep(0.15)
+    queue._requeue_due()
+
+    assert not queue.extend(job)
+    queue.complete(job)
+    queue.fail(job, "boom")
+    assert queue.status(job_id) == {"status": "queued", "attempts": 1, "error": None}
+    assert queue.position(job_id) == 0 and queue.depth() == 1
+
+def test_fail_with_retry_delay(make_queue):
+    """测试失败的任务在重试延迟之后重新可见"""
+    queue = make_queue(max_attempts=3)
+    job_id = queue.enqueue("pdf", {})
+    queue.fail(queue.claim("w1"), "503", retry_delay=0.1)
+    assert queue.claim("w1") is None
+    time.sleep(0.15)
+    job = queue.claim("w1")
+    assert job.job_id == job_id and job.attempts == 2
+    queue.complete(job)
+    assert queue.status(job_id)["status"] == JobStatus.DONE
+
+class FakeService:
+    """模拟 PDFProcessingService：第一次处理有页面失败，续跑时成功"""
+
+    def __init__(self, output_dir: str):
+        self.checkpoints = CheckpointStore(output_dir)
+        self.tasks = {}
+        self.calls = []
+        self.cancelled = []
+        self.delay = 0.01
+
+    def get_task_status(self, task_id):
+        task = self.checkpoints.load_task(task_id)
+        if task:
+            self.tasks[task_id] = task
+        return task
+
+    def resume_task(self, task_id):
+        self.tasks[task_id]["status"] = TaskStatus.PENDING
+
+    async def cancel_task(self, task_id):
+        self.cancelled.append(task_id)
+        self.checkpoints.save_task(task_id, {"task_id": task_id, "status": TaskStatus.CANCELLED})
+
+    async def process_pdf(self, task_id, file_path, resume=False):
+        self.calls.append((task_id, resume))
+        await asyncio.sleep(self.delay)
+        status = TaskStatus.COMPLETED if resume else TaskStatus.FAILED
+        self.checkpoints.save_task(task_id, {"task_id": task_id, "status": status})
+
+def test_worker_retries_failed_task_as_resume(make_queue, tmp_path):
+    """测试 worker 处理失败的任务交回队列，重试时以续跑方式处理"""
+    queue = make_queue(max_attempts=3)
+    service = FakeService(str(tmp_path / "outputs"))
+    service.checkpoints.save_task("t1", {"task_id": "t1", "status": TaskStatus.PENDING})
+    queue.enqueue("pdf", {"task_id": "t1", "file_path": "t1.pdf"}, job_id="t1")
+    queue.enqueue("pdf", {"task_id": "missing", "file_path": "missing.pdf"}, job_id="missing")
+
+    worker = Worker(queue, service, worker_id="w1", concurrency=2, poll_interval=0.01, retry_delay=0)
+
+    async def run():
+        stop = asyncio.Event()
+        runner = asyncio.create_task(worker.run(stop))
+        for _ in range(200):
+            if queue.status("t1")["status"] == JobStatus.DONE:
+                break
+            await asyncio.sleep(0.01)
+        stop.set()
+        await runner
+
+    asyncio.run(run())
+    assert service.calls == [("t1", False), ("t1", True)]
+    assert queue.status("t1") == {"status": "done", "attempts": 2, "error": None}
+    assert queue.status("missing")["error"] == "Task not found"
+    assert service.tasks == {}
+
+def test_worker_stops_cancelled_task(make_queue, tmp_path):
+    """测试 worker 在检查间隔内停止已写入取消标记的任务并确认队列中的任务"""
+    queue = make_queue()
+    service = FakeService(str(tmp_path / "outputs"))
+    service.delay = 60
+    service.checkpoints.save_task("t1", {"task_id": "t1", "status": TaskStatus.PENDING})
+    queue.enqueue("pdf", {"task_id": "t1", "file_path": "t1.pdf"}, job_id="t1")
+
+    worker = Worker(queue, service, worker_id="w1", poll_interval=0.01, cancel_check_interval=0.05)
+
+    async def run():
+        stop = asyncio.Event()
+        runner = asyncio.create_task(worker.run(stop))
+        for _ in range(200):
+            if service.calls:
+                break
+            await asyncio.sleep(0.01)
+        assert not queue.cancel("t1")
+        service.checkpoints.request_cancel("t1")
+        start = time.perf_counter()
+        for _ in range(200):
+            if queue.status("t1")["status"] == JobStatus.DONE:
+                break
+            await asyncio.sleep(0.01)
+        assert time.perf_counter() - start < 1
+        stop.set()
+        await runner
+
+    asyncio.run(run())
+    assert service.cancelled == ["t1"]
+    assert service.checkpoints.load_task("t1")["status"] == TaskStatus.CANCELLED
+
+def test_cancel_only_when_not_claimed(make_queue):
+    """测试等待中和等待重试的任务可以直接取消，worker 持有租约的任务交由 worker 停止"""
+    queue = make_queue()
+    queue.enqueue("pdf", {}, job_id="running")
+    assert queue.claim("w1").job_id == "running"
+    queue.enqueue("pdf", {}, job_id="retrying")
+    queue.fail(queue.claim("w1"), "503", retry_delay=60)
+    queue.enqueue("pdf", {}, job_id="waiting")
+
+    assert not queue.cancel("running")
+    assert queue.status("running")["status"] == JobStatus.RUNNING
+    assert queue.cancel("waiting") and queue.cancel("retrying")
+    assert queue.status("waiting")["status"] == JobStatus.CANCELLED
+    assert queue.status("retrying")["status"] == JobStatus.CANCELLED
+    assert queue.depth() == 0
+    assert queue.claim("w2") is None
+
+def test_create_job_queue_from_url(tmp_path):
+    """测试按地址选择队列后端"""
+    assert isinstance(create_job_queue(f"sqlite:///{tmp_path}/jobs.db"), SQLiteJobQueue)
+    with pytest.raises(ValueError):
+        create_job_queue("memcached://localhost")
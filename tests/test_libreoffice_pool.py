@@ -0,0 +1,204 @@
+import sys
+import stat
+import socket
+import asyncio
+import pytest
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+project_root = str(Path(__file__).parent.parent)
+sys.path.insert(0, project_root)
+
+from api.services.libreoffice_pool import LibreOfficePool
+
+FAKE_SOFFICE = """#!/bin/sh
+# 模拟 soffice：记录 profile 参数，把输入文件复制为 outdir/<stem>.<fmt>
+profile="$1"; fmt="$4"; outdir="$6"; input="$7"
+echo "$profile" >> "$FAKE_SOFFICE_LOG"
+[ -n "$FAKE_SOFFICE_SLEEP" ] && sleep "$FAKE_SOFFICE_SLEEP"
+name=$(basename "$input"); stem="${name%.*}"
+cp "$input" "$outdir/$stem.$fmt"
+"""
+
+FAKE_UNOSERVER = """#!{python}
+# 模拟 unoserver：常驻进程，通过 XML-RPC 转换（复制）文件；文件名含 slow 的任务会卡住
+import os, sys, time, shutil, argparse
+from xmlrpc.server import SimpleXMLRPCServer
+
+parser = argparse.ArgumentParser()
+for name in ("--interface", "--port", "--uno-port", "--user-installation"):
+    parser.add_argument(name)
+args = parser.parse_args()
+
+def log(line):
+    with open(os.environ["FAKE_UNOSERVER_LOG"], "a") as f:
+        f.write(line + "\\n")
+
+def convert(inpath, indata, outpath, convert_to):
+    if "slow" in os.path.basename(inpath):
+        time.sleep(30)
+    shutil.copy(inpath, outpath)
+    log(f"convert {{os.getpid()}}")
+
+server = SimpleXMLRPCServer((args.interface, int(args.port)), allow_none=True, logRequests=False)
+server.register_function(convert)
+log(f"start {{os.getpid()}} {{args.user_installation}}")
+server.serve_forever()
+"""
+
+def free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+@pytest.fixture
+def fake_unoserver(tmp_path, monkeypatch):
+    """在 PATH 中放置一个假的 unoserver，worker 以常驻模式运行"""
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    script = bin_dir / "unoserver"
+    script.write_text(FAKE_UNOSERVER.format(python=sys.executable))
+    script.chmod(script.stat().st_mode | stat.S_IEXEC)
+
+    log_path = tmp_path / "unoserver.log"
+    log_path.write_text("")
+    monkeypatch.setenv("PATH", f"{bin_dir}:/bin:/usr/bin")
+    monkeypatch.setenv("FAKE_UNOSERVER_LOG", str(log_path))
+    return log_path
+
+def log_lines(log_path, kind: str):
+    return [line.split()[1:] for line in log_path.read_text().splitlines() if line.startswith(kind)]
+
+@pytest.fixture
+def fake_soffice(tmp_path, monkeypatch):
+    """在 PATH 中放置一个假的 soffice（且不提供 unoserver）"""
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    script = bin_dir / "soffice"
+    script.write_text(FAKE_SOFFICE)
+    script.chmod(script.stat().st_mode | stat.S_IEXEC)
+
+    log_path = tmp_path / "soffice.log"
+    monkeypatch.setenv("PATH", f"{bin_dir}:/bin:/usr/bin")
+    monkeypatch.setenv("FAKE_SOFFICE_LOG", str(log_path))
+    return log_path
+
+def test_each_worker_uses_own_profile(tmp_path, fake_soffice):
+    """测试并发转换时每个 worker 使用独立的 profile 目录"""
+    pool = LibreOfficePool(pool_size=2, profile_root=str(tmp_path / "profiles"))
+
+    async def run():
+        jobs = []
+        for i in range(4):
+            input_path = tmp_path / f"deck_{i}.pptx"
+            input_path.write_text(f"deck {i}")
+            jobs.append(pool.convert(str(input_path), str(tmp_path / f"out_{i}.pdf"), "pdf"))
+        await asyncio.gather(*jobs)
+        await pool.close()
+
+    asyncio.run(run())
+
+    for i in range(4):
+        assert (tmp_path / f"out_{i}.pdf").read_text() == f"deck {i}"
+    profiles = set(fake_soffice.read_text().split())
+    assert profiles == {
+        f"-env:UserInstallation={(tmp_path / 'profiles' / f'worker_{i}').as_uri()}"
+        for i in range(2)
+    }
+
+def test_job_timeout(tmp_path, fake_soffice, monkeypatch):
+    """测试单个任务超时后报错，worker 仍可继续使用"""
+    monkeypatch.setenv("FAKE_SOFFICE_SLEEP", "2")
+    pool = LibreOfficePool(pool_size=1, job_timeout=0.5, profile_root=str(tmp_path / "profiles"))
+    input_path = tmp_path / "deck.pptx"
+    input_path.write_text("deck")
+
+    async def run():
+        with pytest.raises(RuntimeError, match="timed out"):
+            await pool.convert(str(input_path), str(tmp_path / "out.pdf"), "pdf")
+        monkeypatch.setenv("FAKE_SOFFICE_SLEEP", "")
+        await pool.convert(str(input_path), str(tmp_path / "out.pdf"), "pdf")
+        await pool.close()
+
+    asyncio.run(run())
+    assert (tmp_path / "out.pdf").exists()
+
+def test_close_during_conversion(tmp_path, fake_soffice, monkeypatch):
+    """测试转换期间关闭池：转换正常结束，worker 不再归还"""
+    monkeypatch.setenv("FAKE_SOFFICE_SLEEP", "0.3")
+    pool = LibreOfficePool(pool_size=1, profile_root=str(tmp_path / "profiles"))
+    input_path = tmp_path / "deck.pptx"
+    input_path.write_text("deck")
+
+    async def run():
+        job = asyncio.ensure_future(pool.convert(str(input_path), str(tmp_path / "out.pdf"), "pdf"))
+        await asyncio.sleep(0.1)
+        await pool.close()
+        assert await job == str(tmp_path / "out.pdf")
+        assert pool._idle is None
+
+    asyncio.run(run())
+
+def test_persistent_worker_recycled_after_max_jobs(tmp_path, fake_unoserver):
+    """测试常驻 worker：启动后健康检查通过，多个任务复用同一进程，达到任务上限后回收重启"""
+    pool = LibreOfficePool(
+        pool_size=1, base_port=free_port(), max_jobs_per_worker=2,
+        profile_root=str(tmp_path / "profiles")
+    )
+
+    async def run():
+        await pool.start()
+        worker = pool.workers[0]
+        assert worker.persistent and await worker.is_healthy()
+
+        for i in range(3):
+            input_path = tmp_path / f"deck_{i}.pptx"
+            input_path.write_text(f"deck {i}")
+            await pool.convert(str(input_path), str(tmp_path / f"out_{i}.pdf"), "pdf")
+        assert worker.jobs_done == 1
+
+        await pool.close()
+        assert not await worker.is_healthy()
+
+    asyncio.run(run())
+
+    for i in range(3):
+        assert (tmp_path / f"out_{i}.pdf").read_text() == f"deck {i}"
+    starts = log_lines(fake_unoserver, "start")
+    converts = [pid for pid, in log_lines(fake_unoserver, "convert")]
+    assert len(starts) == 2
+    assert starts[0][1] == (tmp_path / "profiles" / "worker_0").absolute().as_uri()
+    # 前两个任务在第一个进程中完成，达到上限后重启，第三个任务在新进程中完成
+    assert converts == [starts[0][0], starts[0][0], starts[1][0]]
+
+def test_persistent_worker_restarts_on_timeout_and_crash(tmp_path, fake_unoserver):
+    """测试常驻 worker 超时后被强制重启，进程退出后在下次任务前重启"""
+    pool = LibreOfficePool(
+        pool_size=1, base_port=free_port(), job_timeout=1,
+        profile_root=str(tmp_path / "profiles")
+    )
+    slow_path = tmp_path / "slow.pptx"
+    slow_path.write_text("slow")
+    input_path = tmp_path / "deck.pptx"
+    input_path.write_text("deck")
+
+    async def run():
+        with pytest.raises(RuntimeError, match="timed out"):
+            await pool.convert(str(slow_path), str(tmp_path / "slow.pdf"), "pdf")
+        worker = pool.workers[0]
+        assert await worker.is_healthy()
+        await pool.convert(str(input_path), str(tmp_path / "out.pdf"), "pdf")
+
+        # 进程意外退出：健康检查失败，下次任务前重启
+        worker._process.kill()
+        await worker._process.wait()
+        assert not await worker.is_healthy()
+        await pool.convert(str(input_path), str(tmp_path / "again.pdf"), "pdf")
+        await pool.close()
+
+    asyncio.run(run())
+
+    assert (tmp_path / "out.pdf").read_text() == "deck"
+    assert (tmp_path / "again.pdf").read_text() == "deck"
+    assert not (tmp_path / "slow.pdf").exists()
+    assert len(log_lines(fake_unoserver, "start")) == 3
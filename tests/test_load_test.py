@@ -0,0 +1,43 @@
+import sys
+import time
+import asyncio
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+project_root = str(Path(__file__).parent.parent)
+sys.path.insert(0, project_root)
+
+from benchmarks.load_test import RequestRecord, probe_loop_lag, saturation_point, summarize_window
+
+def test_probe_detects_blocking_call():
+    """测试事件循环被同步调用阻塞时延迟探针记录到延迟"""
+    samples = []
+
+    async def run():
+        probe = asyncio.create_task(probe_loop_lag(samples, interval=0.01))
+        await asyncio.sleep(0.05)
+        time.sleep(0.2)  # 阻塞事件循环
+        await asyncio.sleep(0.05)
+        probe.cancel()
+
+    asyncio.run(run())
+    assert max(samples) >= 0.15
+    assert sorted(samples)[len(samples) // 2] < 0.05
+
+def test_summarize_window_and_saturation():
+    """测试时间窗汇总和饱和点判定"""
+    requests = [RequestRecord(at=0, endpoint="GET /", seconds=0.1 * i, ok=i != 3) for i in range(1, 11)]
+    summary = summarize_window(requests)
+    assert summary["requests"] == 10
+    assert summary["error_rate"] == 0.1
+    assert summary["latency_p95"] == 1.0
+    assert summarize_window([])["latency_p50"] is None
+
+    timeline = [
+        {"clients": 5, "latency_p95": 0.2},
+        {"clients": 10, "latency_p95": None},
+        {"clients": 15, "latency_p95": 1.4},
+        {"clients": 20, "latency_p95": 3.0}
+    ]
+    assert saturation_point(timeline, slo=1.0) == 15
+    assert saturation_point(timeline, slo=5.0) is None
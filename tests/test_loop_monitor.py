@@ -0,0 +1,50 @@
+import sys
+import time
+import asyncio
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+project_root = str(Path(__file__).parent.parent)
+sys.path.insert(0, project_root)
+
+from api.loop_monitor import LoopMonitor
+
+def blocking_encode():
+    time.sleep(0.3)
+
+async def handle_upload():
+    blocking_encode()
+
+def test_reports_blocking_call():
+    """测试同步调用阻塞事件循环时记录阻塞时长、协程和调用栈"""
+    monitor = LoopMonitor(threshold=0.05)
+
+    async def run():
+        monitor.start()
+        await asyncio.sleep(0.2)
+        await asyncio.create_task(handle_upload(), name="upload")
+        await asyncio.sleep(0.2)
+        monitor.stop()
+
+    asyncio.run(run())
+    reports = monitor.recent_reports()
+    assert len(reports) == 1
+    report = reports[0]
+    assert 0.15 <= report["seconds"] <= 0.35
+    assert report["task"].startswith("upload (handle_upload")
+    assert "blocking_encode" in report["stack"]
+    assert report["samples"] >= 5
+
+def test_idle_loop_has_no_reports():
+    """测试空闲和只有短暂阻塞的事件循环不产生报告"""
+    monitor = LoopMonitor(threshold=0.1)
+
+    async def run():
+        monitor.start()
+        for _ in range(10):
+            time.sleep(0.01)
+            await asyncio.sleep(0.02)
+        monitor.stop()
+
+    asyncio.run(run())
+    assert monitor.recent_reports() == []
@@ -0,0 +1,82 @@
+import sys
+import asyncio
+from pathlib import Path
+
+import pytest
+
+# 添加项目根目录到 Python 路径
+project_root = str(Path(__file__).parent.parent)
+sys.path.insert(0, project_root)
+
+prometheus_client = pytest.importorskip("prometheus_client")
+
+from api.analysis import PageAnalyzer
+from api.checkpoint import CheckpointStore
+from api.metrics import is_rate_limited, render_latest, set_task_counts
+from api.models import TaskStatus
+
+REGISTRY = prometheus_client.REGISTRY
+
+class FakeResponse:
+    def __init__(self, text: str):
+        self.text = text
+
+class RateLimitedModel:
+    """模拟模型：前若干次调用返回 429"""
+
+    def __init__(self, failures: int):
+        self.failures = failures
+
+    async def generate_content_async(self, contents, generation_config=None):
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError("429 Resource exhausted")
+        return FakeResponse("ok")
+
+def sample(name: str, **labels) -> float:
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+def test_model_call_metrics():
+    """测试模型调用按提示词类型和结果记录耗时、重试和限流次数"""
+    labels = {"prompt_type": "metrics-test"}
+    before_success = sample("docproc_model_call_seconds_count", outcome="success", **labels)
+    before_limited = sample("docproc_model_call_seconds_count", outcome="rate_limited", **labels)
+
+    analyzer = PageAnalyzer(RateLimitedModel(failures=1), max_retries=2)
+    response = asyncio.run(analyzer.generate(
+        "prompt", b"image", {"temperature": 0.1}, prompt_type="metrics-test"
+    ))
+
+    assert response.text == "ok"
+    assert sample("docproc_model_call_seconds_count", outcome="success", **labels) == before_success + 1
+    assert sample("docproc_model_call_seconds_count", outcome="rate_limited", **labels) == before_limited + 1
+    assert sample("docproc_model_retries_total", **labels) >= 1
+    assert sample("docproc_rate_limit_hits_total", **labels) >= 1
+
+def test_result_write_and_task_counts(tmp_path):
+    """测试结果写入耗时和各状态任务数"""
+    before = sample("docproc_result_write_seconds_count")
+    CheckpointStore(str(tmp_path)).save_page("task", 1, {"content": "text"})
+    assert sample("docproc_result_write_seconds_count") == before + 1
+
+    set_task_counts("metrics-test", [
+        {"status": TaskStatus.COMPLETED},
+        {"status": TaskStatus.COMPLETED},
+        {"status": "failed"}
+    ])
+    assert sample("docproc_tasks", service="metrics-test", status="completed") == 2
+    assert sample("docproc_tasks", service="metrics-test", status="failed") == 1
+    assert sample("docproc_tasks", service="metrics-test", status="pending") == 0
+
+    body, content_type = render_latest()
+    assert content_type.startswith("text/plain")
+    assert b"docproc_model_call_seconds_bucket" in body
+
+def test_is_rate_limited():
+    """测试限流异常识别"""
+    class ResourceExhausted(Exception):
+        pass
+
+    assert is_rate_limited(ResourceExhausted("quota"))
+    assert is_rate_limited(RuntimeError("HTTP 429 Too Many Requests"))
+    assert not is_rate_limited(RuntimeError("invalid argument"))
@@ -0,0 +1,83 @@
+import sys
+import json
+import asyncio
+from pathlib import Path
+
+import pytest
+
+# 添加项目根目录到 Python 路径
+project_root = str(Path(__file__).parent.parent)
+sys.path.insert(0, project_root)
+
+from api.analysis import PageAnalyzer
+from api.metrics import is_rate_limited
+from api.model_client import (
+    FakeModelClient, FakeRateLimitError, LatencyModel, create_model_client, model_client_from_env
+)
+from api.usage import IMAGE_TOKENS, usage_from_response
+
+def test_latency_model():
+    """测试耗时分布的解析和采样"""
+    import random
+    rng = random.Random(0)
+    assert LatencyModel.parse("constant:0.2").sample(rng) == 0.2
+    uniform = LatencyModel.parse("uniform:1.0,0.5")
+    assert all(0.5 <= uniform.sample(rng) <= 1.5 for _ in range(100))
+    lognormal = LatencyModel.parse("lognormal:1.0,0.5")
+    samples = sorted(lognormal.sample(rng) for _ in range(1001))
+    assert 0.8 < samples[500] < 1.25
+    with pytest.raises(ValueError):
+        LatencyModel("pareto").sample(rng)
+
+def test_fake_client_tokens_and_json():
+    """测试模拟模型的 token 计数和 JSON 输出"""
+    client = FakeModelClient(latency=LatencyModel("constant", 0.0), output_tokens=50)
+    response = asyncio.run(client.generate_content_async(["abcdefgh", object()]))
+    usage = usage_from_response(response)
+    assert usage["prompt_tokens"] == 2 + IMAGE_TOKENS
+    assert usage["output_tokens"] == 50
+
+    structured = client.generate_content(["prompt"], {"response_mime_type": "application/json"})
+    assert json.loads(structured.text)["blocks"][0]["type"] == "paragraph"
+    assert client.stats()["calls"] == 2
+    assert client.stats()["candidates_tokens"] == 100
+
+def test_fake_client_rate_limit_injection():
+    """测试注入的 429 被识别为限流，并由 PageAnalyzer 重试"""
+    client = FakeModelClient(latency=LatencyModel("constant", 0.0), rate_limit_rate=1.0)
+    with pytest.raises(FakeRateLimitError) as error:
+        asyncio.run(client.generate_content_async(["prompt"]))
+    assert is_rate_limited(error.value)
+
+    # 部分调用被限流：重试次数与注入的限流次数一致
+    flaky = FakeModelClient(latency=LatencyModel("constant", 0.0), rate_limit_rate=0.5, seed=3)
+    analyzer = PageAnalyzer(flaky, max_retries=5)
+    stats = {}
+    asyncio.run(analyzer.generate_with_cache_info("prompt", b"image", {}, call_stats=stats))
+    assert flaky.stats()["calls"] == stats["retries"] + 1
+    assert flaky.stats()["rate_limited"] == stats["retries"]
+
+def test_fake_client_concurrency_limit():
+    """测试模拟的服务端并发上限"""
+    client = FakeModelClient(latency=LatencyModel("constant", 0.05), max_concurrency=2)
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        await asyncio.gather(*[client.generate_content_async(["p"]) for _ in range(4)])
+        return loop.time() - start
+
+    assert asyncio.run(run()) >= 0.1
+
+def test_create_model_client(monkeypatch):
+    """测试按名称和环境变量创建模型客户端"""
+    client = create_model_client("fake", latency="constant:0.1", error_rate=0.5)
+    assert isinstance(client, FakeModelClient)
+    assert client.latency == LatencyModel("constant", 0.1)
+    with pytest.raises(ValueError):
+        create_model_client("openai")
+
+    monkeypatch.setenv("MODEL_BACKEND", "fake")
+    monkeypatch.setenv("FAKE_MODEL_RATE_LIMIT_RATE", "0.1")
+    assert model_client_from_env().rate_limit_rate == 0.1
+    assert model_client_from_env("vertex") is None
@@ -0,0 +1,146 @@
+import sys
+import asyncio
+from pathlib import Path
+
+from PIL import Image, ImageDraw, ImageFont
+
+# 添加项目根目录到 Python 路径
+project_root = str(Path(__file__).parent.parent)
+sys.path.insert(0, project_root)
+
+from api.models import PageType
+from api.page_classifier import page_features, classify_page, detect_regions, parse_text_layout, text_outside_regions
+from api.model_client import FakeModelClient
+from api.rendering import RenderPool
+from api.services import PDFProcessingService
+
+SIZE = (1200, 1600)
+
+FONT = ImageFont.load_default(size=28)
+
+def draw_text_lines(draw: ImageDraw.ImageDraw, top: int, bottom: int, left: int = 100):
+    """绘制若干行正文"""
+    for y in range(top, bottom, 45):
+        draw.text((left, y), "The quick brown fox jumps over the lazy dog 0123456789", fill="black", font=FONT)
+
+def make_text_page() -> Image.Image:
+    image = Image.new("RGB", SIZE, "white")
+    draw_text_lines(ImageDraw.Draw(image), 100, 1500)
+    return image
+
+def make_table_page() -> Image.Image:
+    image = Image.new("RGB", SIZE, "white")
+    draw = ImageDraw.Draw(image)
+    draw_text_lines(draw, 100, 200)
+    for y in range(300, 1101, 100):
+        draw.line([100, y, 1100, y], fill="black", width=2)
+    for x in range(100, 1101, 250):
+        draw.line([x, 300, x, 1100], fill="black", width=2)
+    for y in range(330, 1100, 100):
+        for x in range(130, 1100, 250):
+            draw.text((x, y), "12.5%", fill="black", font=FONT)
+    return image
+
+def make_chart_page() -> Image.Image:
+    image = Image.new("RGB", SIZE, "white")
+    draw = ImageDraw.Draw(image)
+    draw_text_lines(draw, 100, 200)
+    for i, height in enumerate([300, 500, 200, 650]):
+        x = 200 + i * 200
+        draw.rectangle([x, 1200 - height, x + 120, 1200], fill=(30, 120, 220))
+    draw.line([150, 1200, 1050, 1200], fill="black", width=2)
+    return image
+
+def test_classifies_page_types():
+    """测试文本、表格、图表和空白页的分类"""
+    assert classify_page(page_features(make_text_page())) == PageType.TEXT
+    assert classify_page(page_features(make_table_page())) == PageType.TABLE
+    assert classify_page(page_features(make_chart_page())) == PageType.CHART
+    assert classify_page(page_features(Image.new("RGB", SIZE, "white"))) == PageType.BLANK
+
+def test_table_lines_are_counted():
+    """测试表格线检测（文字行不会被当作表格线）"""
+    table = page_features(make_table_page())
+    assert table["h_lines"] == 9
+    assert table["v_lines"] == 5
+
+    text = page_features(make_text_page())
+    assert text["h_lines"] == 0
+    assert text["v_lines"] == 0
+
+def test_text_layer_marks_chart_with_prose_as_mixed():
+    """测试文字层较多的图表页归为混合页"""
+    features = page_features(make_chart_page())
+    assert classify_page(features, text="") == PageType.CHART
+    assert classify_page(features, text="正文" * 300) == PageType.MIXED
+
+def contains(outer, inner) -> bool:
+    return outer[0] <= inner[0] and outer[1] <= inner[1] and outer[2] >= inner[2] and outer[3] >= inner[3]
+
+def test_detect_regions():
+    """测试表格和图表区域检测：整张图表合并为一个区域，正文不产生区域"""
+    assert detect_regions(make_text_page()) == []
+
+    tables = detect_regions(make_table_page())
+    assert [r["region_type"] for r in tables] == ["table"]
+    assert contains(tables[0]["bbox"], (100, 300, 1100, 1100))
+    assert tables[0]["bbox"][1] > 200  # 不包含表格上方的正文
+
+    charts = detect_regions(make_chart_page())
+    assert [r["region_type"] for r in charts] == ["chart"]
+    assert contains(charts[0]["bbox"], (200, 550, 920, 1200))
+
+# pdftotext -bbox-layout 的输出：正文一段，表格（72dpi 下位于 100-400pt）两行单元格
+TEXT_LAYOUT = """<?xml version="1.0" encoding="UTF-8"?>
+<!DOCTYPE html PUBLIC "-//W3C//DTD XHTML 1.0 Transitional//EN" "http://www.w3.org/TR/xhtml1/DTD/xhtml1-transitional.dtd">
+<html xmlns="http://www.w3.org/1999/xhtml"><head><title></title></head><body><doc>
+<page width="612.000000" height="792.000000"><flow>
+<block xMin="50" yMin="40" xMax="300" yMax="80">
+<line xMin="50" yMin="40" xMax="300" yMax="55"><word xMin="50" yMin="40" xMax="120" yMax="55">Quarterly</word><word xMin="125" yMin="40" xMax="200" yMax="55">revenue</word></line>
+<line xMin="50" yMin="60" xMax="300" yMax="75"><word xMin="50" yMin="60" xMax="120" yMax="75">grew&amp;held</word></line>
+</block>
+<block xMin="110" yMin="110" xMax="380" yMax="160">
+<line xMin="110" yMin="110" xMax="380" yMax="125"><word xMin="110" yMin="110" xMax="180" yMax="125">Region</word><word xMin="200" yMin="110" xMax="260" yMax="125">Sales</word></line>
+<line xMin="110" yMin="140" xMax="380" yMax="155"><word xMin="110" yMin="140" xMax="180" yMax="155">North</word><word xMin="200" yMin="140" xMax="260" yMax="155">4711</word></line>
+</block>
+</flow></page></doc></body></html>"""
+
+def test_text_outside_regions():
+    """测试按单词位置去掉区域内的文字，保留段落结构"""
+    layout = parse_text_layout(TEXT_LAYOUT)
+    assert len(layout) == 2 and layout[0][1][0][4] == "grew&held"
+    assert text_outside_regions(layout, [], 1.0) == "Quarterly revenue\ngrew&held\n\nRegion Sales\nNorth 4711"
+
+    # 区域坐标为 144dpi 图片像素（每点 2 像素）
+    table = {"region_type": "table", "bbox": [200, 200, 800, 800]}
+    assert text_outside_regions(layout, [table], 2.0) == "Quarterly revenue\ngrew&held"
+
+def test_prose_excludes_region_text(tmp_path, monkeypatch):
+    """测试按区域处理时正文只包含区域之外的文字，表格单元格的文字只出现在表格结果中"""
+    render_pool = RenderPool(max_workers=1)
+    service = PDFProcessingService(
+        upload_dir=str(tmp_path / "uploads"), output_dir=str(tmp_path / "outputs"),
+        dpi=144, render_pool=render_pool, model_client=FakeModelClient()
+    )
+    pdf_path = tmp_path / "doc.pdf"
+    pdf_path.write_bytes(b"%PDF")
+    service.tasks["t1"] = {
+        "file_path": str(pdf_path),
+        "page_texts": ["Quarterly revenue\ngrew&held\n\nRegion   Sales\nNorth    4711"]
+    }
+
+    async def page_layout(file_path, page_number):
+        return parse_text_layout(TEXT_LAYOUT)
+
+    async def analyze(task_id, page_num, page_type, image_bytes):
+        return {"content": "| Region | Sales |\n| North | 4711 |", "structured": None, "usage": None}
+
+    monkeypatch.setattr(render_pool, "page_layout", page_layout)
+    monkeypatch.setattr(service, "_analyze", analyze)
+    table = {"region_type": "table", "bbox": [200, 200, 800, 800]}
+    result = asyncio.run(service._process_regions("t1", 0, Image.new("RGB", (1224, 1584), "white"), PageType.MIXED, [table]))
+
+    prose, region_text = result["content"].split("\n\n[表格", 1)
+    assert prose == "Quarterly revenue\ngrew&held"
+    assert "4711" not in prose and "Region" not in prose
+    assert result["content"].count("4711") == 1 and "4711" in region_text
@@ -0,0 +1,72 @@
+import sys
+import asyncio
+from pathlib import Path
+
+from PIL import Image, ImageDraw
+
+# 添加项目根目录到 Python 路径
+project_root = str(Path(__file__).parent.parent)
+sys.path.insert(0, project_root)
+
+from api.page_hash import content_hash, perceptual_hash, hamming_distance, is_blank_page, fingerprint_page
+from api.model_client import FakeModelClient
+from api.services import PDFProcessingService
+
+def make_page(text: str = "Contract", size=(400, 560)) -> Image.Image:
+    """生成一张带文字和色块的测试页面"""
+    image = Image.new("RGB", size, "white")
+    draw = ImageDraw.Draw(image)
+    draw.rectangle([40, 40, 360, 120], fill="black")
+    draw.text((50, 200), text, fill="black")
+    return image
+
+def test_content_hash_is_exact():
+    """测试内容哈希对相同页面稳定、对微小修改敏感"""
+    assert content_hash(make_page()) == content_hash(make_page())
+    assert content_hash(make_page()) != content_hash(make_page("Contract v2"))
+
+def test_perceptual_hash_tolerates_small_changes():
+    """测试感知哈希对细微改动不敏感、对不同页面敏感"""
+    original = perceptual_hash(make_page())
+    revised = perceptual_hash(make_page("Contract v2"))
+    blank = perceptual_hash(Image.new("RGB", (400, 560), "white"))
+
+    assert len(original) == 16
+    assert hamming_distance(original, revised) <= 4
+    assert hamming_distance(original, blank) > 4
+
+def test_is_blank_page():
+    """测试空白页与纯色分隔页识别"""
+    assert is_blank_page(Image.new("RGB", (400, 560), "white"))
+    assert is_blank_page(Image.new("RGB", (400, 560), (30, 60, 120)))
+    assert not is_blank_page(make_page())
+
+def test_fingerprint_page_keys():
+    """测试页面指纹包含哈希和空白页标记"""
+    fingerprint = fingerprint_page(make_page())
+    assert set(fingerprint) == {"content_hash", "perceptual_hash", "dedup_hash", "blank"}
+    assert len(fingerprint["dedup_hash"]) == 64
+    assert fingerprint["blank"] is False
+
+def test_near_duplicates_need_matching_text_layer(tmp_path):
+    """测试感知哈希相近但文字不同的页面（如章节分隔页）不复用结果，文字层相同时才复用"""
+    service = PDFProcessingService(
+        upload_dir=str(tmp_path / "uploads"), output_dir=str(tmp_path / "outputs"), model_client=FakeModelClient()
+    )
+    pages = [make_page("Chapter 1"), make_page("Chapter 2"), make_page("Chapter 1"), make_page("Chapter 1")]
+    # 第 4 页与第 1 页文字相同、像素略有差异
+    pages[3].putpixel((300, 500), (0, 0, 0))
+    fingerprints = [fingerprint_page(page) for page in pages]
+    assert hamming_distance(fingerprints[0]["dedup_hash"], fingerprints[1]["dedup_hash"]) <= service.duplicate_max_distance
+    assert fingerprints[3]["content_hash"] != fingerprints[0]["content_hash"]
+
+    service.tasks["t1"] = {
+        "page_hashes": fingerprints,
+        "page_texts": ["Chapter 1", "Chapter 2", "Chapter 1", "Chapter  1\n"]
+    }
+    plan = asyncio.run(service._plan_dedup("t1", "t1.pdf"))
+    assert plan == {3: 1, 4: 1}
+
+    # 没有文字层时只按内容哈希复用
+    service.tasks["t1"]["page_texts"] = ["", "", "", ""]
+    assert asyncio.run(service._plan_dedup("t1", "t1.pdf")) == {3: 1}
@@ -1,9 +1,13 @@
+import io
 import os
 import sys
+import time
 import asyncio
 import pytest
 from pathlib import Path
 
+from PIL import Image, ImageDraw
+
 # 添加项目根目录到 Python 路径
 project_root = str(Path(__file__).parent.parent)
 sys.path.insert(0, project_root)
@@ -33,6 +37,75 @@ def pptx_service(test_dirs):
         dpi=300
     )
 
+@pytest.fixture
+def offline_pptx_service(test_dirs, monkeypatch):
+    """创建不依赖 LibreOffice 的服务实例（仅用于图片处理测试）"""
+    monkeypatch.setattr(PPTXProcessingService, "_check_libreoffice", lambda self: None)
+    upload_dir, output_dir = test_dirs
+    return PPTXProcessingService(
+        upload_dir=upload_dir,
+        output_dir=output_dir,
+        dpi=300
+    )
+
+def make_rendered_slides(image_dir: Path, count: int, dpi: int):
+    """生成模拟的渲染结果（13.33 x 7.5 英寸的幻灯片）"""
+    paths = []
+    for i in range(1, count + 1):
+        image = Image.new("RGB", (int(13.33 * dpi), int(7.5 * dpi)), "white")
+        draw = ImageDraw.Draw(image)
+        draw.rectangle([dpi, dpi, 6 * dpi, 3 * dpi], fill=(30, 60, 120))
+        draw.text((dpi, 4 * dpi), f"Slide {i}", fill="black")
+        path = image_dir / f"render_{i:04d}.png"
+        image.save(path, "PNG", dpi=(dpi, dpi))
+        paths.append(path)
+    return paths
+
+def test_process_image_fast_path_timing(offline_pptx_service, tmp_path):
+    """测试渲染 DPI 与目标 DPI 一致时跳过重新编码，并对比耗时"""
+    service = offline_pptx_service
+    count = 3
+
+    # 旧实现：解码 -> 写入 BytesIO 重新编码 -> 写文件 -> 删除原图
+    legacy_dir = tmp_path / "legacy"
+    legacy_dir.mkdir()
+    start = time.perf_counter()
+    for i, path in enumerate(make_rendered_slides(legacy_dir, count, service.dpi), 1):
+        with Image.open(path) as img:
+            buffer = io.BytesIO()
+            img.save(buffer, format="PNG", dpi=(service.dpi, service.dpi))
+        (legacy_dir / f"slide_{i}.png").write_bytes(buffer.getvalue())
+        os.remove(path)
+    legacy_seconds = time.perf_counter() - start
+
+    # 新实现：直接重命名
+    fast_dir = tmp_path / "fast"
+    fast_dir.mkdir()
+    rendered = make_rendered_slides(fast_dir, count, service.dpi)
+    start = time.perf_counter()
+    image_paths = asyncio.run(service._organize_images(str(fast_dir), count))
+    fast_seconds = time.perf_counter() - start
+
+    print(f"\n{count} 张幻灯片: 重新编码 {legacy_seconds * 1000:.1f} ms, "
+          f"快速路径 {fast_seconds * 1000:.1f} ms")
+    assert fast_seconds < legacy_seconds
+    assert not any(path.exists() for path in rendered)
+    for path in image_paths:
+        with Image.open(path) as img:
+            assert round(img.info["dpi"][0]) == service.dpi
+
+def test_process_image_resamples_when_dpi_differs(offline_pptx_service, tmp_path):
+    """测试渲染 DPI 与目标 DPI 不同时按比例重采样"""
+    service = offline_pptx_service
+    service.render_dpi = 150
+    make_rendered_slides(tmp_path, 1, service.render_dpi)
+
+    image_paths = asyncio.run(service._organize_images(str(tmp_path), 1))
+
+    with Image.open(image_paths[0]) as img:
+        assert img.size == (round(int(13.33 * 150) * 2), round(int(7.5 * 150) * 2))
+        assert round(img.info["dpi"][0]) == 300
+
 @pytest.fixture
 def test_pptx():
     """获取测试用的 PPT 文件路径"""
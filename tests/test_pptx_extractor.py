@@ -0,0 +1,126 @@
+import sys
+import asyncio
+import pytest
+from pathlib import Path
+
+from PIL import Image
+from pptx import Presentation
+from pptx.chart.data import CategoryChartData
+from pptx.enum.chart import XL_CHART_TYPE
+from pptx.util import Inches
+
+# 添加项目根目录到 Python 路径
+project_root = str(Path(__file__).parent.parent)
+sys.path.insert(0, project_root)
+
+from api.models import TaskStatus
+from api.model_client import FakeModelClient
+from api.services.pptx_extractor import extract_presentation, content_to_text
+from api.services.pptx_service import PPTXProcessingService
+
+@pytest.fixture
+def test_deck(tmp_path):
+    """生成包含列表、表格、图表和图片的测试 PPT"""
+    prs = Presentation()
+
+    # 1. 多级列表
+    slide = prs.slides.add_slide(prs.slide_layouts[1])
+    slide.shapes.title.text = "季度回顾"
+    body = slide.placeholders[1].text_frame
+    body.text = "收入增长"
+    sub = body.add_paragraph()
+    sub.text = "华东 +12%"
+    sub.level = 1
+
+    # 2. 表格 + 图表
+    slide = prs.slides.add_slide(prs.slide_layouts[5])
+    slide.shapes.title.text = "区域数据"
+    table = slide.shapes.add_table(2, 2, Inches(0.5), Inches(1.5), Inches(4), Inches(1)).table
+    for r, row in enumerate([["区域", "收入"], ["华东", "120"]]):
+        for c, text in enumerate(row):
+            table.cell(r, c).text = text
+    chart_data = CategoryChartData()
+    chart_data.categories = ["Q1", "Q2"]
+    chart_data.add_series("收入", (100, 120))
+    slide.shapes.add_chart(
+        XL_CHART_TYPE.COLUMN_CLUSTERED, Inches(5), Inches(1.5), Inches(4), Inches(3), chart_data
+    )
+
+    # 3. 图片
+    slide = prs.slides.add_slide(prs.slide_layouts[5])
+    slide.shapes.title.text = "现场照片"
+    image_path = tmp_path / "photo.png"
+    Image.new("RGB", (20, 20), "red").save(image_path)
+    slide.shapes.add_picture(str(image_path), Inches(1), Inches(2))
+
+    path = tmp_path / "deck.pptx"
+    prs.save(path)
+    return str(path)
+
+def test_extract_bullets_tables_and_charts(test_deck):
+    """测试直接从对象模型提取列表层级、表格和图表数据"""
+    slides = extract_presentation(test_deck)
+    assert len(slides) == 3
+
+    first = slides[0]
+    assert first["title"] == "季度回顾"
+    assert first["bullets"] == [
+        {"text": "收入增长", "level": 0},
+        {"text": "华东 +12%", "level": 1}
+    ]
+    assert not first["needs_vision"]
+
+    second = slides[1]
+    assert second["tables"] == [[["区域", "收入"], ["华东", "120"]]]
+    chart = second["charts"][0]
+    assert chart["chart_type"] == "COLUMN_CLUSTERED"
+    assert chart["categories"] == ["Q1", "Q2"]
+    assert chart["series"] == [{"name": "收入", "values": [100.0, 120.0]}]
+    assert not second["needs_vision"]
+
+def test_pictures_fall_back_to_vision(test_deck):
+    """测试含图片的幻灯片标记为需要视觉模型"""
+    slides = extract_presentation(test_deck)
+    assert slides[2]["needs_vision"]
+
+def test_content_to_text(test_deck):
+    """测试结构化内容转换为缩进文本"""
+    slides = extract_presentation(test_deck)
+    assert content_to_text(slides[0]) == "季度回顾\n收入增长\n  华东 +12%"
+    assert "收入\t100\t120" in content_to_text(slides[1])
+
+def test_analyze_slides_isolates_failed_slides(test_deck, tmp_path, monkeypatch):
+    """测试单张幻灯片分析失败不影响其他幻灯片，再次分析时只处理失败的幻灯片"""
+    monkeypatch.setattr(PPTXProcessingService, "_check_libreoffice", lambda self: None)
+    service = PPTXProcessingService(
+        upload_dir=str(tmp_path / "uploads"), output_dir=str(tmp_path / "outputs"), model_client=FakeModelClient()
+    )
+    task_id = service.create_task("deck.pptx").task_id
+    slide_texts = PPTXProcessingService._read_slide_texts(test_deck)
+    assert [t["has_visuals"] for t in slide_texts] == [False, False, True]
+    service.tasks[task_id].update(
+        status=TaskStatus.COMPLETED, image_paths=["slide_1.png", "slide_2.png", "slide_3.png"], slide_texts=slide_texts
+    )
+
+    calls = []
+    failing = {2}
+
+    async def analyze_slide(analyzer, slide_number, image_path, slide_text):
+        calls.append(slide_number)
+        if slide_number in failing:
+            raise RuntimeError("503")
+        return {"slide_number": slide_number, "content": slide_text["text"], "source": "text"}
+
+    monkeypatch.setattr(service, "_analyze_slide", analyze_slide)
+    results = asyncio.run(service.analyze_slides(task_id))
+    assert [r.slide_number for r in results] == [1, 3]
+    status = service.get_task_status(task_id)
+    assert status.status == TaskStatus.FAILED and status.error == "Slides failed: [2]"
+
+    failing.clear()
+    calls.clear()
+    results = asyncio.run(service.analyze_slides(task_id))
+    assert calls == [2]
+    assert [r.slide_number for r in results] == [1, 2, 3]
+    assert service.get_task_status(task_id).status == TaskStatus.COMPLETED
+    assert service.get_task_status(task_id).error is None
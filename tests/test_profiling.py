@@ -0,0 +1,74 @@
+import sys
+import time
+import asyncio
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+project_root = str(Path(__file__).parent.parent)
+sys.path.insert(0, project_root)
+
+from api.profiling import profile_task
+from api.rendering import RenderPool
+
+def spin(seconds: float):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+def profiled_page():
+    spin(0.02)
+
+def profiled_render():
+    spin(0.2)
+
+def other_task_work():
+    spin(0.02)
+
+def load_folded(path):
+    samples = {}
+    for line in Path(path).read_text().splitlines():
+        stack, count = line.rsplit(" ", 1)
+        samples[stack] = int(count)
+    return samples
+
+def test_profile_only_includes_task_work(tmp_path):
+    """测试剖析结果包含任务的子协程和渲染线程中的调用，不包含同时运行的其他任务"""
+    output_path = tmp_path / "task-1" / "profile.folded"
+    pool = RenderPool(max_workers=2)
+
+    async def analyze_pages():
+        for _ in range(10):
+            profiled_page()
+            await asyncio.sleep(0)
+
+    async def task():
+        with profile_task(str(output_path), interval=0.002):
+            await asyncio.gather(analyze_pages(), analyze_pages())
+            await pool.run(profiled_render)
+
+    async def other():
+        for _ in range(20):
+            other_task_work()
+            await asyncio.sleep(0)
+        await pool.run(other_task_work)
+
+    async def run():
+        await asyncio.gather(task(), other())
+
+    asyncio.run(run())
+    samples = load_folded(output_path)
+
+    assert all(stack.startswith(("event-loop;", "render-worker;")) for stack in samples)
+    assert any(stack.startswith("event-loop;") and "profiled_page (" in stack for stack in samples)
+    assert any(stack.startswith("render-worker;") and "profiled_render (" in stack for stack in samples)
+    assert not any("other_task_work (" in stack for stack in samples)
+
+def test_profile_disabled(tmp_path):
+    """测试未指定输出路径时不剖析"""
+    async def run():
+        with profile_task(None) as profiler:
+            assert profiler is None
+            await RenderPool(max_workers=1).run(spin, 0.01)
+
+    asyncio.run(run())
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,28 @@
+import sys
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+project_root = str(Path(__file__).parent.parent)
+sys.path.insert(0, project_root)
+
+from api.prompts import PDFExtractionPrompt, ChartExtractionPrompt
+
+def test_rendered_prompts_are_memoized():
+    """测试相同参数的提示词只渲染一次"""
+    prompt = PDFExtractionPrompt()
+    first = prompt.get_prompt(page_number=1, total_pages=3, language="auto")
+    assert prompt.get_prompt(page_number=1, total_pages=3, language="auto") is first
+    assert first.endswith("当前是第 1 页，共 3 页。")
+
+    # 不同页只有后缀不同，前缀复用
+    second = prompt.get_prompt(page_number=2, total_pages=3, language="auto")
+    assert prompt.get_prefix(page_number=1, language="auto") is prompt.get_prefix(page_number=2, language="auto")
+    assert second.startswith(prompt.get_prefix(language="auto"))
+
+def test_chart_prompt_sections():
+    """测试复合图表类型解析和额外说明放在后缀"""
+    chart = ChartExtractionPrompt()
+    prompt = chart.get_prompt(chart_type="饼图+柱状图", additional_instructions="已提取文字")
+    assert "扇区" in prompt and "柱子" in prompt
+    assert prompt.endswith("\n\n已提取文字")
+    assert "已提取文字" not in chart.get_prefix(chart_type="饼图+柱状图", additional_instructions="已提取文字")
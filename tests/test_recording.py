@@ -0,0 +1,102 @@
+import sys
+import time
+import asyncio
+from pathlib import Path
+
+import pytest
+
+# 添加项目根目录到 Python 路径
+project_root = str(Path(__file__).parent.parent)
+sys.path.insert(0, project_root)
+
+from vertexai.generative_models import Part
+
+from api.analysis import PageAnalyzer
+from api.metrics import is_rate_limited
+from api.model_client import FakeModelClient, LatencyModel, create_model_client
+from api.recording import (
+    RecordingModelClient, ReplayedError, ReplayMissError, ReplayModelClient, request_fingerprint
+)
+
+CONFIG = {"max_output_tokens": 2048, "temperature": 0.1}
+
+def image_part(data: bytes):
+    return Part.from_data(data, mime_type="image/png")
+
+def test_request_fingerprint():
+    """测试指纹区分提示词、图片和生成配置"""
+    base = request_fingerprint(["prompt", image_part(b"page 1")], CONFIG)
+    assert base == request_fingerprint(["prompt", image_part(b"page 1")], dict(CONFIG))
+    assert base != request_fingerprint(["prompt", image_part(b"page 2")], CONFIG)
+    assert base != request_fingerprint(["prompt!", image_part(b"page 1")], CONFIG)
+    assert base != request_fingerprint(["prompt", image_part(b"page 1")], {**CONFIG, "temperature": 0})
+
+def test_record_and_replay(tmp_path, monkeypatch):
+    """测试录制后回放：响应文本、用量和限流重试顺序与录制时一致"""
+    archive = str(tmp_path / "calls.jsonl.gz")
+    inner = FakeModelClient(latency=LatencyModel("constant", 0.02), rate_limit_rate=0.3, output_tokens=5, seed=7)
+    recorder = RecordingModelClient(inner, archive)
+
+    async def run(model):
+        analyzer = PageAnalyzer(model, max_retries=10)
+        results = []
+        for page in range(6):
+            stats = {}
+            response, _ = await analyzer.generate_with_cache_info(
+                f"page {page}", f"image {page}".encode(), CONFIG, call_stats=stats
+            )
+            results.append((response.text, response.usage_metadata.total_token_count, stats["retries"]))
+        return results
+
+    # 重试间隔按指数退避，测试中跳过等待
+    original_sleep = asyncio.sleep
+
+    async def no_backoff(delay, *args, **kwargs):
+        await original_sleep(min(delay, 0.02))
+
+    monkeypatch.setattr(asyncio, "sleep", no_backoff)
+    recorded = asyncio.run(run(recorder))
+    recorder.close()
+    assert recorder.recorded == inner.stats()["calls"]
+
+    replay = ReplayModelClient(archive, time_scale=0)
+    assert len(replay) == recorder.recorded
+    start = time.perf_counter()
+    replayed = asyncio.run(run(replay))
+
+    assert replayed == recorded
+    assert replay.misses == 0
+    assert time.perf_counter() - start < 1.0
+
+def test_replay_errors_timing_and_misses(tmp_path):
+    """测试回放录制的错误、按比例缩放的耗时和未录制的请求"""
+    archive = str(tmp_path / "calls.jsonl.gz")
+    recorder = RecordingModelClient(
+        FakeModelClient(latency=LatencyModel("constant", 0.1), rate_limit_rate=1.0), archive
+    )
+    with pytest.raises(Exception):
+        recorder.generate_content(["limited"], CONFIG)
+    recorder.inner = FakeModelClient(latency=LatencyModel("constant", 0.1))
+    recorder.generate_content(["ok"], CONFIG)
+    recorder.close()
+
+    replay = ReplayModelClient(archive, time_scale=0.5)
+    with pytest.raises(ReplayedError) as error:
+        replay.generate_content(["limited"], CONFIG)
+    assert is_rate_limited(error.value)
+
+    start = time.perf_counter()
+    response = asyncio.run(replay.generate_content_async(["ok"], CONFIG))
+    assert 0.04 <= time.perf_counter() - start < 0.1
+    assert response.usage_metadata.candidates_token_count == 400
+
+    with pytest.raises(ReplayMissError):
+        replay.generate_content(["never recorded"], CONFIG)
+
+    fallback = ReplayModelClient(archive, fallback=FakeModelClient(latency=LatencyModel("constant", 0.0)))
+    assert fallback.generate_content(["never recorded"], CONFIG).text
+    assert fallback.misses == 1
+
+    assert isinstance(create_model_client("replay", archive_path=archive, time_scale=0), ReplayModelClient)
+    with pytest.raises(ValueError):
+        create_model_client("replay")
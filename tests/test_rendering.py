@@ -0,0 +1,75 @@
+import os
+import sys
+import stat
+import time
+import asyncio
+import pytest
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+project_root = str(Path(__file__).parent.parent)
+sys.path.insert(0, project_root)
+
+from PIL import Image
+
+from api.rendering import RenderPool
+
+FAKE_PDFTOPPM = """#!/bin/sh
+# 模拟 pdftoppm：输出 2x1 的 PPM；设置了 FAKE_PDFTOPPM_PID 时记录进程号并一直运行
+if [ -n "$FAKE_PDFTOPPM_PID" ]; then
+    echo $$ > "$FAKE_PDFTOPPM_PID"
+    exec sleep 30
+fi
+printf 'P6\\n2 1\\n255\\n\\377\\000\\000\\000\\377\\000'
+"""
+
+@pytest.fixture
+def fake_pdftoppm(tmp_path, monkeypatch):
+    """在 PATH 中放置一个假的 pdftoppm"""
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    script = bin_dir / "pdftoppm"
+    script.write_text(FAKE_PDFTOPPM)
+    script.chmod(script.stat().st_mode | stat.S_IEXEC)
+    monkeypatch.setenv("PATH", f"{bin_dir}:/bin:/usr/bin")
+    return tmp_path
+
+def test_render_page_with_pdftoppm(fake_pdftoppm):
+    """测试渲染单页：pdftoppm 的输出保存为图片并传给 postprocess"""
+    output_path = fake_pdftoppm / "page_1.png"
+    size = asyncio.run(RenderPool(max_workers=1).render_page(
+        str(fake_pdftoppm / "doc.pdf"), 1, str(output_path), postprocess=lambda image: image.size
+    ))
+    assert size == (2, 1)
+    with Image.open(output_path) as image:
+        assert image.format == "PNG" and image.getpixel((0, 0)) == (255, 0, 0)
+
+def test_cancel_kills_pdftoppm(fake_pdftoppm, monkeypatch):
+    """测试取消渲染时结束正在运行的 pdftoppm 进程"""
+    pid_path = fake_pdftoppm / "pdftoppm.pid"
+    monkeypatch.setenv("FAKE_PDFTOPPM_PID", str(pid_path))
+    pool = RenderPool(max_workers=1)
+
+    async def run():
+        job = asyncio.ensure_future(
+            pool.render_page(str(fake_pdftoppm / "doc.pdf"), 1, str(fake_pdftoppm / "page_1.png"))
+        )
+        while not pid_path.exists() or not pid_path.read_text().strip():
+            await asyncio.sleep(0.01)
+        job.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await job
+
+    asyncio.run(run())
+    pid = int(pid_path.read_text())
+    deadline = time.monotonic() + 5
+    while time.monotonic() < deadline:
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            break
+        time.sleep(0.05)
+    else:
+        pytest.fail("pdftoppm is still running after cancel")
+    pool.executor.shutdown(wait=True)
+    assert not (fake_pdftoppm / "page_1.png").exists()
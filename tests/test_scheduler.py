@@ -0,0 +1,148 @@
+import sys
+import asyncio
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+project_root = str(Path(__file__).parent.parent)
+sys.path.insert(0, project_root)
+
+from PIL import Image
+
+from api.model_client import FakeModelClient, LatencyModel
+from api.scheduler import PageScheduler, Priority, WorkContext, scheduling
+from api.services.pptx_service import PPTXProcessingService
+
+def run_order(scheduler: PageScheduler, calls):
+    """
+    先占满所有名额，再按顺序提交 calls（(名称, WorkContext) 列表），返回获得名额的顺序
+    """
+    order = []
+
+    async def call(name: str, work: WorkContext):
+        async with scheduler.slot(work):
+            order.append(name)
+            await asyncio.sleep(0)
+
+    async def run():
+        blocker = asyncio.Event()
+
+        async def hold():
+            async with scheduler.slot(WorkContext(Priority.BATCH, "blocker")):
+                await blocker.wait()
+
+        holders = [asyncio.create_task(hold()) for _ in range(scheduler.max_concurrent)]
+        await asyncio.sleep(0)
+        waiting = []
+        for name, work in calls:
+            waiting.append(asyncio.create_task(call(name, work)))
+            await asyncio.sleep(0)
+        blocker.set()
+        await asyncio.gather(*holders, *waiting)
+
+    asyncio.run(run())
+    return order
+
+def test_interactive_before_batch():
+    """测试交互请求优先于先到的批量调用"""
+    scheduler = PageScheduler(max_concurrent=1)
+    batch = WorkContext(Priority.BATCH, "big-tenant", remaining=1000)
+    order = run_order(scheduler, [
+        ("batch-1", batch), ("batch-2", batch), ("interactive", WorkContext(Priority.INTERACTIVE, "user"))
+    ])
+    assert order == ["interactive", "batch-1", "batch-2"]
+
+def test_fair_queuing_across_tenants():
+    """测试大批量租户不会挤占后到的其他租户，租户权重按比例分配"""
+    scheduler = PageScheduler(max_concurrent=1, weights={"gold": 2})
+    big = WorkContext(Priority.BATCH, "big", remaining=1000)
+    small = WorkContext(Priority.BATCH, "small", remaining=2)
+    order = run_order(scheduler, [(f"big-{i}", big) for i in range(4)] + [("small-0", small), ("small-1", small)])
+    # 虚拟完成时间相同时剩余工作少的租户优先
+    assert order == ["small-0", "big-0", "small-1", "big-1", "big-2", "big-3"]
+
+    scheduler = PageScheduler(max_concurrent=1, weights={"gold": 2})
+    gold = WorkContext(Priority.BATCH, "gold", remaining=10)
+    order = run_order(scheduler, [(f"big-{i}", big) for i in range(3)] + [(f"gold-{i}", gold) for i in range(4)])
+    assert [name.split("-")[0] for name in order] == ["gold", "gold", "big", "gold", "gold", "big", "big"]
+
+def test_shortest_remaining_work_within_tenant():
+    """测试同一租户内剩余页数少的任务优先"""
+    scheduler = PageScheduler(max_concurrent=1)
+    large = WorkContext(Priority.BATCH, "tenant", remaining=500)
+    short = WorkContext(Priority.BATCH, "tenant", remaining=3)
+    order = run_order(scheduler, [("large-0", large), ("large-1", large), ("short-0", short)])
+    assert order == ["short-0", "large-0", "large-1"]
+
+def test_reserved_interactive_slot():
+    """测试批量调用占满其余名额时交互请求立即开始"""
+    scheduler = PageScheduler(max_concurrent=2, reserved_interactive=1)
+    started = []
+
+    async def call(name: str, priority: Priority, release: asyncio.Event):
+        with scheduling(priority, "tenant"):
+            async with scheduler.slot():
+                started.append(name)
+                await release.wait()
+
+    async def run():
+        release = asyncio.Event()
+        tasks = [
+            asyncio.create_task(call("batch-1", Priority.BATCH, release)),
+            asyncio.create_task(call("batch-2", Priority.BATCH, release)),
+        ]
+        await asyncio.sleep(0.01)
+        assert started == ["batch-1"]
+        tasks.append(asyncio.create_task(call("interactive", Priority.INTERACTIVE, release)))
+        await asyncio.sleep(0.01)
+        assert started == ["batch-1", "interactive"]
+        release.set()
+        await asyncio.gather(*tasks)
+        assert started[-1] == "batch-2" and scheduler.running == 0
+
+    asyncio.run(run())
+
+def test_pptx_slides_use_shared_scheduler(tmp_path, monkeypatch):
+    """测试幻灯片的模型调用使用注入的共享调度器：受全局并发上限约束，交互请求优先"""
+    monkeypatch.setattr(PPTXProcessingService, "_check_libreoffice", lambda self: None)
+    scheduler = PageScheduler(max_concurrent=1)
+    service = PPTXProcessingService(
+        upload_dir=str(tmp_path / "uploads"),
+        output_dir=str(tmp_path / "outputs"),
+        model_client=FakeModelClient(LatencyModel("constant", 0.01)),
+        scheduler=scheduler
+    )
+    assert service._get_analyzer().scheduler is scheduler
+
+    task_id = service.create_task("deck.pptx", api_key="key").task_id
+    image_paths = []
+    for i in range(3):
+        path = str(tmp_path / f"slide_{i}.png")
+        Image.new("RGB", (32, 32), "white").save(path)
+        image_paths.append(path)
+    service.tasks[task_id].update(
+        status="completed",
+        image_paths=image_paths,
+        slide_texts=[{"text": "", "has_visuals": True}] * 3
+    )
+    order = []
+
+    async def interactive():
+        async with scheduler.slot(WorkContext(Priority.INTERACTIVE, "user")):
+            order.append("interactive")
+
+    async def run():
+        # PDF 页面占用唯一的名额时幻灯片排队
+        async with scheduler.slot(WorkContext(Priority.BATCH, "pdf-tenant")):
+            analysis = asyncio.create_task(service.analyze_slides(task_id))
+            await asyncio.sleep(0.05)
+            assert scheduler.waiting >= 1 and not service.tasks[task_id]["slide_results"]
+            waiting = asyncio.create_task(interactive())
+            await asyncio.sleep(0)
+        await waiting
+        assert not service.tasks[task_id]["slide_results"]
+        await analysis
+
+    asyncio.run(run())
+    assert order == ["interactive"]
+    assert sorted(service.tasks[task_id]["slide_results"]) == [1, 2, 3]
+    assert scheduler.running == 0
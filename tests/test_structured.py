@@ -0,0 +1,51 @@
+import sys
+import json
+from pathlib import Path
+
+from vertexai.generative_models import GenerationConfig
+
+# 添加项目根目录到 Python 路径
+project_root = str(Path(__file__).parent.parent)
+sys.path.insert(0, project_root)
+
+from api.analysis import PageAnalyzer
+from api.prompts import PDFExtractionPrompt, PDFTableExtractionPrompt, ChartExtractionPrompt
+from api.structured import parse_structured, blocks_to_text
+
+RESPONSE = {
+    "blocks": [
+        {"type": "heading", "text": "季度报告", "level": 1},
+        {"type": "list_item", "text": "收入增长", "level": 0},
+        {"type": "list_item", "text": "华东 +12%", "level": 1},
+        {"type": "table", "cells": [["区域", "收入"], ["华东", "120"]]},
+        {"type": "chart", "chart": {
+            "chart_type": "柱状图", "title": "收入", "categories": ["Q1", "Q2"],
+            "series": [{"name": "收入", "values": [100, 120]}]
+        }}
+    ]
+}
+
+def test_parse_and_render_blocks():
+    """测试结构化输出解析为内容块并转换为文本"""
+    page = parse_structured(json.dumps(RESPONSE, ensure_ascii=False))
+    assert [b.type.value for b in page.blocks] == ["heading", "list_item", "list_item", "table", "chart"]
+    assert page.blocks[4].chart.series[0].values == [100.0, 120.0]
+    assert blocks_to_text(page) == (
+        "季度报告\n收入增长\n  华东 +12%\n区域\t收入\n华东\t120\n[图表] 收入\n\tQ1\tQ2\n收入\t100\t120"
+    )
+
+def test_invalid_output_is_rejected():
+    """测试截断或不符合 schema 的输出返回 None"""
+    assert parse_structured('{"blocks": [{"type": "paragraph", "text": "截断') is None
+    assert parse_structured('{"blocks": [{"type": "unknown"}]}') is None
+
+def test_structured_generation_config():
+    """测试各提示词的结构化生成配置可转换为 GenerationConfig"""
+    for prompt in (PDFExtractionPrompt(), PDFTableExtractionPrompt(), ChartExtractionPrompt()):
+        config = prompt.get_structured_generation_config()
+        assert config["response_mime_type"] == "application/json"
+        assert config["max_output_tokens"] == prompt.get_generation_config()["max_output_tokens"]
+        assert isinstance(PageAnalyzer._generation_config(config), GenerationConfig)
+
+    plain = PDFExtractionPrompt().get_generation_config()
+    assert PageAnalyzer._generation_config(plain) is plain
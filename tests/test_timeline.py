@@ -0,0 +1,87 @@
+import sys
+import asyncio
+import pytest
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+project_root = str(Path(__file__).parent.parent)
+sys.path.insert(0, project_root)
+
+from api.analysis import PageAnalyzer
+from api.models import TaskTimeline
+from api.timeline import empty_timing, percentile, record_call, summarize_timing
+
+class FakeResponse:
+    def __init__(self, text: str):
+        self.text = text
+
+class FlakyModel:
+    """模拟模型：前若干次调用失败"""
+
+    def __init__(self, failures: int = 0):
+        self.failures = failures
+
+    async def generate_content_async(self, contents, generation_config=None):
+        await asyncio.sleep(0.01)
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError("503 unavailable")
+        return FakeResponse("ok")
+
+def test_call_stats_and_timeline():
+    """测试调用统计（重试、上传字节数、缓存命中）累计到任务耗时记录"""
+    analyzer = PageAnalyzer(FlakyModel(failures=1), max_retries=2)
+    timing = empty_timing()
+
+    async def run():
+        for _ in range(2):
+            stats = {}
+            await analyzer.generate_with_cache_info("prompt", b"image", {}, call_stats=stats)
+            record_call(timing, stats)
+
+    asyncio.run(run())
+
+    # 第一次调用重试一次，两次尝试都上传了提示词和图片；第二次命中结果缓存
+    assert timing["retries"] == 1
+    assert timing["bytes_uploaded"] == 2 * (len("prompt") + len(b"image"))
+    assert timing["cache_hits"] == 1
+    assert len(timing["model_latencies"]) == 1
+    assert timing["model_latencies"][0] >= 0.01
+
+def test_summarize_timing():
+    """测试模型调用耗时的最小值、中位数和 P95"""
+    timing = {**empty_timing(), "render_seconds": 1.5, "model_latencies": list(range(1, 101))}
+    timeline = TaskTimeline(**summarize_timing(timing))
+
+    assert timeline.render_seconds == 1.5
+    assert timeline.model_calls == 100
+    assert timeline.model_latency_min == 1
+    assert timeline.model_latency_median == 50.5
+    assert timeline.model_latency_p95 == 95
+
+    assert percentile([], 0.95) is None
+    assert summarize_timing(None) is None
+    assert TaskTimeline(**summarize_timing(empty_timing())).model_latency_p95 is None
+
+def test_queued_seconds_for_restored_task(tmp_path):
+    """测试 worker 从任务清单恢复的任务也能计算排队时间"""
+    from api.model_client import FakeModelClient
+    from api.services import PDFProcessingService
+
+    def make_service(**kwargs):
+        return PDFProcessingService(
+            upload_dir=str(tmp_path / "uploads"), output_dir=str(tmp_path / "outputs"),
+            model_client=FakeModelClient(), **kwargs
+        )
+
+    task_id = make_service().create_task("a.pdf").task_id
+    worker = make_service(shared_state=True)
+    assert worker.get_task_status(task_id).timeline.queued_seconds is None
+
+    async def convert_pdf_to_images(task_id, file_path):
+        raise RuntimeError("stop after queueing")
+
+    worker.convert_pdf_to_images = convert_pdf_to_images
+    with pytest.raises(RuntimeError):
+        asyncio.run(worker.process_pdf(task_id, str(tmp_path / "a.pdf")))
+    assert worker.get_task_status(task_id).timeline.queued_seconds >= 0
@@ -0,0 +1,72 @@
+import sys
+import json
+import asyncio
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+project_root = str(Path(__file__).parent.parent)
+sys.path.insert(0, project_root)
+
+from api.tracing import InMemoryExporter, JSONFileExporter, Tracer
+
+def test_span_hierarchy_across_tasks():
+    """测试并行子任务中的 span 继承创建时的父 span，并落在不同的 lane 上"""
+    exporter = InMemoryExporter()
+    tracer = Tracer([exporter])
+
+    async def page(number: int):
+        with tracer.span("page", page_number=number):
+            with tracer.span("model_attempt", attempt=1) as span:
+                await asyncio.sleep(0.01)
+                span.set_attribute("outcome", "success")
+
+    async def run():
+        with tracer.span("process_pdf", trace_id="task-1"):
+            with tracer.span("analyze_pages"):
+                await asyncio.gather(page(1), page(2))
+
+    asyncio.run(run())
+
+    spans = {(s.name, s.attributes.get("page_number")): s for s in exporter.spans}
+    root = spans[("process_pdf", None)]
+    stage = spans[("analyze_pages", None)]
+    page_1, page_2 = spans[("page", 1)], spans[("page", 2)]
+
+    assert len(exporter.spans) == 6
+    assert all(s.trace_id == "task-1" for s in exporter.spans)
+    assert stage.parent_id == root.span_id
+    assert page_1.parent_id == page_2.parent_id == stage.span_id
+    assert page_1.lane != page_2.lane
+    attempts = [s for s in exporter.spans if s.name == "model_attempt"]
+    assert {a.parent_id for a in attempts} == {page_1.span_id, page_2.span_id}
+    assert all(a.depth == 3 and a.attributes["outcome"] == "success" for a in attempts)
+
+def test_error_status_and_disabled_tracer():
+    """测试异常记录在 span 上；未配置导出器时不记录"""
+    exporter = InMemoryExporter()
+    tracer = Tracer([exporter])
+    try:
+        with tracer.span("model_attempt"):
+            raise RuntimeError("429 rate limit")
+    except RuntimeError:
+        pass
+    assert exporter.spans[0].status == "error"
+    assert "429" in exporter.spans[0].attributes["error"]
+
+    with Tracer().span("noop", page_number=1) as span:
+        span.set_attribute("ignored", True)
+
+def test_json_file_exporter(tmp_path):
+    """测试导出的 Chrome Trace Event 文件（可省略结尾的 "]"）"""
+    path = tmp_path / "trace.json"
+    tracer = Tracer([JSONFileExporter(str(path))])
+    with tracer.span("process_pdf", trace_id="task-1"):
+        with tracer.span("page", page_number=1):
+            pass
+    tracer.shutdown()
+
+    events = json.loads(path.read_text(encoding="utf-8").rstrip().rstrip(",") + "]")
+    assert [e["name"] for e in events] == ["page", "process_pdf"]
+    assert all(e["ph"] == "X" and e["pid"] == 1 for e in events)
+    assert events[0]["args"]["page_number"] == 1
+    assert events[0]["args"]["parent_id"] == events[1]["args"]["span_id"]
@@ -0,0 +1,87 @@
+import sys
+import multiprocessing
+from pathlib import Path
+from types import SimpleNamespace
+
+# 添加项目根目录到 Python 路径
+project_root = str(Path(__file__).parent.parent)
+sys.path.insert(0, project_root)
+
+from api.usage import (
+    IMAGE_TOKENS, UsageTracker, add_usage, empty_usage, tenant_id, usage_from_response
+)
+
+def make_response(prompt_tokens: int, output_tokens: int, cached_tokens: int = 0):
+    return SimpleNamespace(text="ok", usage_metadata=SimpleNamespace(
+        prompt_token_count=prompt_tokens,
+        candidates_token_count=output_tokens,
+        cached_content_token_count=cached_tokens,
+        total_token_count=prompt_tokens + output_tokens
+    ))
+
+def test_usage_from_response_and_price(tmp_path):
+    """测试读取响应用量并按单价计算费用（缓存的输入 token 按缓存单价）"""
+    tracker = UsageTracker(str(tmp_path), input_price=1.0, output_price=4.0, cached_input_price=0.25)
+    usage = tracker.price(usage_from_response(make_response(1_000_000, 500_000, cached_tokens=400_000)))
+    assert usage["total_tokens"] == 1_500_000
+    assert usage["model_calls"] == 1
+    assert usage["cost"] == 0.6 + 0.1 + 2.0
+
+    # 没有 usage_metadata 的响应只记录调用次数
+    assert usage_from_response(SimpleNamespace(text="ok"))["total_tokens"] == 0
+
+def test_tracker_aggregates_per_tenant_and_persists(tmp_path):
+    """测试按租户累计用量、配额余量和持久化"""
+    tracker = UsageTracker(str(tmp_path), quota_tokens=5000)
+    tenant = tenant_id("secret-key")
+    assert "secret-key" not in tenant
+    assert tenant_id(None) == "anonymous"
+
+    for _ in range(2):
+        tracker.record(tenant, tracker.price(usage_from_response(make_response(1000, 200))))
+    assert tracker.get(tenant)["total_tokens"] == 2400
+    assert tracker.remaining(tenant) == 2600
+    assert tracker.remaining("anonymous") == 5000
+
+    tracker.save()
+    reloaded = UsageTracker(str(tmp_path))
+    assert reloaded.get(tenant) == tracker.get(tenant)
+    assert reloaded.remaining(tenant) is None
+
+def test_add_usage_and_estimate():
+    """测试用量累加和任务预估"""
+    total = add_usage(empty_usage(), {"prompt_tokens": 10, "output_tokens": 5, "total_tokens": 15,
+                                      "cached_tokens": 0, "model_calls": 1, "cost": 0.5})
+    add_usage(total, None)
+    assert total["total_tokens"] == 15 and total["cost"] == 0.5
+    assert UsageTracker.estimate_task(10, 300, 2048) == 10 * (IMAGE_TOKENS + 300 + 2048)
+
+def record_in_process(root_dir: str, tenant: str, times: int):
+    tracker = UsageTracker(root_dir)
+    for _ in range(times):
+        tracker.record(tenant, tracker.price(usage_from_response(make_response(100, 10))))
+        tracker.save()
+
+def test_usage_shared_across_processes(tmp_path):
+    """测试多个进程（API 和 worker）的用量合并保存，配额检查能看到其他进程记录的用量"""
+    api_tracker = UsageTracker(str(tmp_path), quota_tokens=10_000)
+    api_tracker.record("a", usage_from_response(make_response(1000, 0)))
+
+    processes = [
+        multiprocessing.Process(target=record_in_process, args=(str(tmp_path), tenant, 20))
+        for tenant in ("a", "a", "b")
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+        assert process.exitcode == 0
+
+    # 其他进程保存的用量加上本进程未保存的增量
+    assert api_tracker.get("a")["total_tokens"] == 2 * 20 * 110 + 1000
+    assert api_tracker.remaining("b") == 10_000 - 20 * 110
+    api_tracker.save()
+    assert UsageTracker(str(tmp_path)).all() == {
+        "a": api_tracker.get("a"), "b": api_tracker.get("b")
+    }
+    assert api_tracker.get("a")["model_calls"] == 41